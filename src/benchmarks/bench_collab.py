@@ -0,0 +1,130 @@
+"""Convergence latency and bandwidth of the collaboration relay under load.
+
+Run from ``src``:  python -m benchmarks.bench_collab [--clients 50] [--seconds 10]
+
+Starts a relay on a free local port and connects ``--clients`` replicas to
+it, all in one process. Each client draws, restyles and erases strokes at
+``--rate`` edits per second. For every new stroke the benchmark records
+when it reached each other client: delivery latency is per receiver, and
+convergence latency is when the last one had it. After the edits stop it
+waits for every replica (and the relay) to reach the same digest, and
+reports wire traffic per client and through the relay.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import numpy as np
+
+from core.collab import CollabClient, Relay
+from core.crdt import BoardCRDT, COLOR
+
+
+def percentiles(samples):
+    if not samples:
+        return "n/a"
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000.0, [50, 95, 99])
+    return f"p50 {p50:6.1f}ms  p95 {p95:6.1f}ms  p99 {p99:6.1f}ms  max {max(samples) * 1000:6.1f}ms"
+
+
+def stroke_points(rng):
+    n = rng.randint(20, 200)
+    x, y = rng.uniform(0, 5000), rng.uniform(0, 5000)
+    steps = np.cumsum(np.random.default_rng(rng.getrandbits(32)).normal(0, 3, (n, 2)), axis=0)
+    return np.column_stack((steps[:, 0] + x, steps[:, 1] + y, np.full(n, 0.5)))
+
+
+async def edit(client, rng, rate, deadline, created):
+    replica = client.replica
+    own = []
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(rng.expovariate(rate))
+        roll = rng.random()
+        if own and roll < 0.2:
+            op = replica.remove(own.pop(rng.randrange(len(own))))
+        elif own and roll < 0.4:
+            op = replica.set(rng.choice(own), COLOR, rng.getrandbits(32))
+        else:
+            op = replica.add(stroke_points(rng), rng.uniform(1, 8), 0xFF000000)
+            own.append(op.target)
+            created[op.target] = time.perf_counter()
+        client.submit(op)
+
+
+async def run(args):
+    relay = await Relay(port=0, flush_interval=args.flush).start()
+    created = {}            # Stroke id -> creation time
+    arrivals = {}           # Stroke id -> arrival times at other clients
+    clients = []
+    for site in range(1, args.clients + 1):
+        client = CollabClient(BoardCRDT(site), port=relay.port, flush_interval=args.flush)
+        await client.connect()
+
+        def on_changes(changes):
+            now = time.perf_counter()
+            for event, stroke_id in changes:
+                if event == "add" and stroke_id in created:
+                    arrivals.setdefault(stroke_id, []).append(now)
+        client.listeners.append(on_changes)
+        clients.append(client)
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    deadline = start + args.seconds
+    await asyncio.gather(*(edit(c, random.Random(rng.getrandbits(32)), args.rate, deadline, created)
+                           for c in clients))
+    elapsed = time.perf_counter() - start
+
+    quiet = time.perf_counter()
+    converged = None
+    while time.perf_counter() - quiet < args.timeout:
+        await asyncio.sleep(args.flush)
+        if len({c.replica.digest() for c in clients} | {relay.replica.digest()}) == 1:
+            converged = time.perf_counter() - quiet
+            break
+
+    delivery, convergence = [], []
+    complete = 0
+    for stroke_id, times in arrivals.items():
+        delivery.extend(t - created[stroke_id] for t in times)
+        if len(times) == args.clients - 1:
+            complete += 1
+            convergence.append(max(times) - created[stroke_id])
+
+    edits = sum(c.replica.clock.get(c.replica.site, 0) for c in clients)
+    sent = sum(c.bytes_sent for c in clients)
+    received = sum(c.bytes_received for c in clients)
+    print(f"{args.clients} clients, {edits:,d} edits in {elapsed:.1f}s "
+          f"({edits / elapsed:,.0f}/s), flush every {args.flush * 1000:.0f}ms")
+    print(f"  strokes {len(created):,d}, live {len(relay.replica):,d}, "
+          f"tombstones left {relay.replica.tombstones:,d}")
+    print(f"  delivery     {percentiles(delivery)}")
+    print(f"  convergence  {percentiles(convergence)}  ({complete:,d} strokes seen by all)")
+    if converged is None:
+        print(f"  replicas did NOT converge within {args.timeout:.0f}s of the last edit")
+    else:
+        print(f"  replicas converged {converged * 1000:.0f}ms after the last edit")
+    print(f"  per client   up {sent / args.clients / elapsed / 1024:8.1f} KiB/s  "
+          f"down {received / args.clients / elapsed / 1024:8.1f} KiB/s")
+    print(f"  relay        in {relay.bytes_in / elapsed / 1024:8.1f} KiB/s  "
+          f"out {relay.bytes_out / elapsed / 1024:8.1f} KiB/s")
+
+    for client in clients:
+        await client.close()
+    await relay.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=10.0, help="how long clients edit")
+    parser.add_argument("--rate", type=float, default=5.0, help="edits per second per client")
+    parser.add_argument("--flush", type=float, default=0.016, help="batch interval in seconds")
+    parser.add_argument("--timeout", type=float, default=10.0, help="convergence wait")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
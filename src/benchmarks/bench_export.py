@@ -0,0 +1,72 @@
+"""Peak memory and time of a streaming export far larger than any one image.
+
+Run from ``src``:  python -m benchmarks.bench_export [--size 20000] [--format png]
+
+A synthetic board is saved to a temporary .wbd file and exported at a
+scale that makes the output ``--size`` pixels square, the way
+``python -m ui.export`` would. A single 20k x 20k ARGB32 image would need
+1.6 GB; the streaming export should peak at a small fraction of that in the
+parent and in each worker process.
+"""
+import argparse
+import math
+import os
+import random
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from core.board import Board
+from core.board_file import BoardDocument
+from ui.export import export_board
+
+WORLD = 10_000.0
+
+
+def make_board(n, rng):
+    board = Board()
+    for _ in range(n):
+        x, y = rng.uniform(0, WORLD), rng.uniform(0, WORLD)
+        angle = rng.uniform(0, math.tau)
+        steps = np.arange(rng.randint(8, 60)) * 4.0
+        board.add_stroke(np.column_stack((x + steps * math.cos(angle), y + steps * math.sin(angle))),
+                         rng.uniform(1, 6), rng.choice([0xFFE0E0E0, 0xFF3A96DD, 0xC0F06040]))
+    return board
+
+
+def peak_mb(who):
+    return resource.getrusage(who).ru_maxrss / 1024.0      # kB on Linux
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=20_000, help="output pixels per side")
+    parser.add_argument("--format", choices=("png", "pdf", "svg"), default="png")
+    parser.add_argument("--strokes", type=int, default=20_000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "board.wbd")
+        BoardDocument(make_board(args.strokes, random.Random(args.seed))).save(path)
+        before = peak_mb(resource.RUSAGE_SELF)
+        output = os.path.join(folder, "export." + args.format)
+        start = time.perf_counter()
+        width, height, pages = export_board(path, output, (0, 0, WORLD, WORLD),
+                                            args.size / WORLD, args.workers)
+        seconds = time.perf_counter() - start
+        size_mb = os.path.getsize(output) / 2**20
+
+    print(f"{width:,d} x {height:,d} px {args.format}, {pages} page(s), {size_mb:.1f} MB, "
+          f"{seconds:.1f} s ({width * height / seconds / 1e6:.1f} Mpx/s)")
+    print(f"a single ARGB32 image would take {width * height * 4 / 2**20:,.0f} MB")
+    print(f"peak RSS: parent {peak_mb(resource.RUSAGE_SELF):.0f} MB "
+          f"({before:.0f} MB before exporting), "
+          f"largest worker {peak_mb(resource.RUSAGE_CHILDREN):.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Lasso and eraser cost on a dense board, batched against per-stroke loops.
+
+Run from ``src``:  python -m benchmarks.bench_selection [--strokes 20000]
+
+Strokes are scattered over a square; a circular lasso covering most of it
+selects thousands of them at once, and an eraser drag of one input event
+crosses the whole square. Each operation is timed with the board's batched
+kernels and with the stroke-by-stroke loop they replaced; the batched times
+should stay within a 60 Hz frame (16.7 ms) for large selections.
+"""
+import argparse
+import math
+import random
+import time
+
+import numpy as np
+
+from core.board import Board
+from core.geometry import points_in_polygon
+
+FRAME_MS = 1000.0 / 60
+
+
+def make_board(n, rng):
+    side = (n ** 0.5) * 20.0
+    board = Board()
+    for _ in range(n):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        count = rng.randint(8, 40)
+        angle = rng.uniform(0, math.tau)
+        steps = np.arange(count) * 1.5
+        xs = x + steps * math.cos(angle) + np.cumsum(np.array([rng.gauss(0, 0.5) for _ in range(count)]))
+        ys = y + steps * math.sin(angle)
+        board.add_stroke(np.column_stack((xs, ys)), rng.uniform(1, 4))
+    return board, side
+
+
+def lasso_loop(board, polygon):
+    """Per-stroke selection, as before the batched kernels."""
+    xs, ys = zip(*polygon)
+    x0, y0, x1, y1 = min(xs), min(ys), max(xs), max(ys)
+    selected = []
+    for i in sorted(board._index.query((x0, y0, x1, y1))):
+        stroke = board.store[i]
+        r = stroke.bounds
+        if r[0] < x0 or r[1] < y0 or r[2] > x1 or r[3] > y1:
+            continue
+        if points_in_polygon(stroke.x, stroke.y, polygon).all():
+            selected.append(i)
+    return selected
+
+
+def eraser_loop(board, x, y, radius):
+    """Per-stroke hit test at a single eraser position."""
+    candidates = board._index.query((x - radius, y - radius, x + radius, y + radius))
+    return sorted(i for i in candidates if board.distance_to(i, x, y) <= radius)
+
+
+def timed(function, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--strokes", type=int, default=20_000)
+    parser.add_argument("--vertices", type=int, default=500, help="points in the lasso")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    board, side = make_board(args.strokes, rng)
+    angles = np.linspace(0, math.tau, args.vertices, endpoint=False)
+    polygon = list(zip(side / 2 + side * 0.45 * np.cos(angles),
+                       side / 2 + side * 0.45 * np.sin(angles)))
+
+    print(f"{args.strokes:,d} strokes, {board.store.point_count:,d} points")
+    batch_ms, selected = timed(board.strokes_in_polygon, polygon)
+    loop_ms, expected = timed(lasso_loop, board, polygon, repeat=1)
+    print(f"lasso ({len(selected):,d} selected)   batched {batch_ms:8.1f} ms   "
+          f"per stroke {loop_ms:8.1f} ms")
+
+    # One eraser event that moved across the whole board
+    path = ([0.0, side], [side * 0.5, side * 0.52])
+    radius = 8.0
+    steps = np.linspace(0, 1, int(side / radius))
+    start = time.perf_counter()
+    for t in steps:
+        eraser_loop(board, path[0][0] + t * side, path[1][0] + t * (path[1][1] - path[1][0]), radius)
+    sampled_ms = (time.perf_counter() - start) * 1000.0
+    touch_ms, touched = timed(board.strokes_touching_path, *path, radius)
+    split_ms, cuts = timed(board.split_along, *path, radius)
+    print(f"eraser drag ({len(touched):,d} hit)   batched {touch_ms:8.1f} ms   "
+          f"per stroke, sampled {sampled_ms:8.1f} ms")
+    print(f"pixel erase split ({sum(len(p) for _, p in cuts):,d} pieces)   "
+          f"batched {split_ms:8.1f} ms")
+    verdict = "within" if batch_ms <= FRAME_MS else "OVER"
+    print(f"lasso {verdict} the frame budget of {FRAME_MS:.1f} ms; lasso result "
+          f"{'matches' if set(selected) <= set(expected) else 'DIFFERS FROM'} the loop "
+          f"(minus {len(set(expected) - set(selected))} strokes crossing the edge)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Frame time of the window shadow while the window is resized.
+
+Run from ``src``:  python -m benchmarks.bench_shadow [--frames 120]
+
+Replays an interactive resize (the window growing and shrinking by a few
+pixels per frame) against the old shadow, a full-window widget blurred by
+``QGraphicsDropShadowEffect``, and the nine-slice ``ShadowWindow``. Each
+frame resizes the shadow and renders it offscreen; the times are what
+the shadow adds to every frame of a resize.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QApplication, QGraphicsDropShadowEffect, QWidget
+
+from ui.widgets import shadow_window
+from ui.widgets.shadow_window import ShadowWindow
+
+
+class EffectShadow(QWidget):
+    """The shadow as it was: a black inner widget with a drop-shadow effect"""
+
+    def __init__(self, feather):
+        super().__init__(None)
+        self.feather = feather
+        self.inner = QWidget(self)
+        self.inner.setStyleSheet("background-color: black; border-radius: 0px;")
+        effect = QGraphicsDropShadowEffect(self.inner)
+        effect.setBlurRadius(feather)
+        effect.setOffset(0, 0)
+        effect.setColor(QColor(0, 0, 0, 180))
+        self.inner.setGraphicsEffect(effect)
+
+    def resizeEvent(self, event):
+        f = self.feather
+        self.inner.setGeometry(f, f, self.width() - 2 * f, self.height() - 2 * f)
+
+
+def sizes(frames, base=(1200, 800)):
+    for i in range(frames):
+        step = 4 * (i if i < frames // 2 else frames - i)
+        yield base[0] + step, base[1] + step // 2
+
+
+def run(name, widget, frames):
+    widget.resize(1200, 800)
+    widget.grab()
+    times = []
+    for w, h in sizes(frames):
+        start = time.perf_counter()
+        widget.resize(w, h)
+        widget.grab()
+        times.append((time.perf_counter() - start) * 1000.0)
+    p50, p95 = np.percentile(times, [50, 95])
+    print(f"{name:<22} mean {np.mean(times):7.2f}ms  p50 {p50:7.2f}ms  p95 {p95:7.2f}ms")
+    widget.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--feather", type=int, default=100)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    run("drop-shadow effect", EffectShadow(args.feather), args.frames)
+
+    shadow_window._slices.clear()
+    start = time.perf_counter()
+    shadow_window.shadow_slices(args.feather, shadow_window.DEFAULT_COLOR)
+    print(f"{'nine-slice blur (once)':<22} {(time.perf_counter() - start) * 1000.0:7.2f}ms")
+    run("nine-slice", ShadowWindow(args.feather), args.frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Query cost of the stroke R-tree as the board grows.
+
+Run from ``src``:  python -m benchmarks.bench_spatial_index [--max 1000000]
+
+Each size is bulk loaded with random stroke-sized rectangles spread over an
+area that grows with the item count (constant density, like a real board),
+then queried with viewport-sized windows and nearest-point lookups. Query
+time should grow roughly with log(n) plus the number of hits, not with n.
+"""
+import argparse
+import random
+import time
+
+from core.spatial_index import RTree
+
+QUERIES = 2000
+
+
+def make_items(n, rng):
+    side = (n ** 0.5) * 100.0
+    items = []
+    for i in range(n):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        items.append((i, (x, y, x + rng.uniform(5, 80), y + rng.uniform(5, 80))))
+    return items, side
+
+
+def run(size, rng, linear):
+    items, side = make_items(size, rng)
+    tree = RTree()
+    start = time.perf_counter()
+    tree.bulk_load(items)
+    build = time.perf_counter() - start
+
+    windows = []
+    for _ in range(QUERIES):
+        x, y = rng.uniform(0, side), rng.uniform(0, side)
+        windows.append((x, y, x + 400, y + 300))
+
+    hits = 0
+    start = time.perf_counter()
+    for window in windows:
+        hits += len(tree.query(window))
+    query_us = (time.perf_counter() - start) / QUERIES * 1e6
+
+    start = time.perf_counter()
+    for x0, y0, _, _ in windows[:QUERIES // 4]:
+        tree.nearest(x0, y0)
+    nearest_us = (time.perf_counter() - start) / (QUERIES // 4) * 1e6
+
+    scan_us = float("nan")
+    if linear:
+        sample = windows[:20]
+        start = time.perf_counter()
+        for x0, y0, x1, y1 in sample:
+            [i for i, r in items if r[0] <= x1 and x0 <= r[2] and r[1] <= y1 and y0 <= r[3]]
+        scan_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    print(f"{size:>9,d}  build {build:7.2f}s  query {query_us:8.1f}us  "
+          f"nearest {nearest_us:7.1f}us  hits/query {hits / QUERIES:5.1f}  "
+          f"linear scan {scan_us:10.1f}us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max", type=int, default=1_000_000, help="largest board size")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    size = 1000
+    while size <= args.max:
+        run(size, rng, linear=size <= 100_000)
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Memory footprint of the columnar StrokeStore against a naive object model.
+
+Run from ``src``:  python -m benchmarks.bench_stroke_memory [--points 2000000]
+
+The naive model is what a straightforward implementation would do: one
+Python object per stroke holding a list of one Python object per sample.
+Both models are filled with the same synthetic pen strokes and measured
+with tracemalloc.
+"""
+import argparse
+import gc
+import math
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.stroke_store import StrokeStore
+
+POINTS_PER_STROKE = 200
+
+
+class NaivePoint:
+    def __init__(self, x, y, pressure, t):
+        self.x = x
+        self.y = y
+        self.pressure = pressure
+        self.t = t
+
+
+class NaiveStroke:
+    def __init__(self, points, width, color):
+        self.points = points
+        self.width = width
+        self.color = color
+
+
+def synthetic_stroke(i):
+    t = np.linspace(0.0, 1.0, POINTS_PER_STROKE, dtype=np.float32)
+    x = (i % 1000) * 50 + 40 * np.cos(t * 6 + i)
+    y = (i // 1000) * 50 + 40 * np.sin(t * 4 + i)
+    pressure = 0.5 + 0.5 * np.sin(t * math.pi)
+    return x, y, pressure, t
+
+
+def build_naive(strokes):
+    board = []
+    for x, y, pressure, t in strokes:
+        points = [NaivePoint(*sample) for sample in zip(x.tolist(), y.tolist(),
+                                                         pressure.tolist(), t.tolist())]
+        board.append(NaiveStroke(points, 2.0, 0xFFFFFFFF))
+    return board
+
+
+def build_columnar(strokes):
+    store = StrokeStore()
+    for x, y, pressure, t in strokes:
+        store.add(x, y, pressure, t, 2.0, 0xFFFFFFFF)
+    return store
+
+
+def measure(label, build, strokes, points):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = build(strokes)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<10} {current / 2**20:9.1f} MiB retained  {peak / 2**20:9.1f} MiB peak  "
+          f"{current / points:6.1f} B/point  built in {elapsed:5.2f}s")
+    del model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--points", type=int, default=2_000_000,
+                        help="total input points on the board")
+    parser.add_argument("--skip-naive", action="store_true",
+                        help="only measure the columnar store (naive needs GBs at scale)")
+    args = parser.parse_args()
+
+    count = max(1, args.points // POINTS_PER_STROKE)
+    points = count * POINTS_PER_STROKE
+    print(f"{count:,d} strokes x {POINTS_PER_STROKE} points = {points:,d} points")
+    # Source arrays are generated lazily so they are not counted against either model
+    strokes = (synthetic_stroke(i) for i in range(count))
+    measure("columnar", build_columnar, strokes, points)
+    if not args.skip_naive:
+        strokes = (synthetic_stroke(i) for i in range(count))
+        measure("naive", build_naive, strokes, points)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""Headless end-to-end benchmarks with a regression check against a baseline.
+
+Run from ``src``:  python -m benchmarks.bench_suite [--only strokes,pan_zoom]
+                   [--baseline benchmarks/baseline.json] [--save-baseline]
+
+Everything runs under Qt's ``offscreen`` platform, so no display is needed.
+Scenarios:
+
+* ``strokes``   replays pen strokes through the canvas as mouse events,
+                painting a frame every few samples (wet ink), then pen-up;
+                ``--recording`` replays a recorded JSON stream instead
+* ``pan_zoom``  pans and zooms across a populated board, one repaint per
+                step, then waits for the background tile renders to land
+* ``drag``      drags ``MainWindow`` by its title bar
+* ``resize``    resizes ``MainWindow`` from its bottom-right handle
+* ``storage``   saves a board to a .wbd file and opens it again
+
+Each scenario reports throughput, latency percentiles and peak memory
+(the process's resident high-water mark during the scenario, reset first
+where Linux allows). Metrics are compared with the stored baseline: one
+that is more than ``--tolerance`` worse fails the run. Baselines are
+machine-specific; refresh them with ``--save-baseline`` on the release
+machine.
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import numpy as np
+from PySide6.QtCore import QEvent, QPoint, QPointF, Qt
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtWidgets import QApplication
+
+from core.board import Board
+from core.board_file import BoardDocument
+from ui.main_window import MainWindow
+from ui.widgets.canvas import Canvas
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+TOLERANCE = 0.25            # Allowed slowdown before a metric counts as regressed
+NOISE = {"_ms": 0.5, "_mb": 16.0}   # Smaller absolute changes are never regressions
+SAMPLES_PER_FRAME = 4       # 240 Hz pen against a 60 Hz display
+VIEW = (1280, 800)
+
+
+# ==========================================================
+#  Measurement Helpers
+# ==========================================================
+def percentiles(samples, prefix):
+    """{prefix_p50_ms, prefix_p95_ms, prefix_p99_ms} of durations in seconds."""
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000.0, (50, 95, 99))
+    return {f"{prefix}_p50_ms": p50, f"{prefix}_p95_ms": p95, f"{prefix}_p99_ms": p99}
+
+
+def reset_peak_rss():
+    """Restart the resident-memory high-water mark, where the kernel allows it."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024.0
+
+
+def mouse(kind, pos, global_pos, timestamp=0, button=Qt.LeftButton):
+    buttons = Qt.NoButton if kind == QEvent.MouseButtonRelease else Qt.LeftButton
+    if kind == QEvent.MouseMove:
+        button = Qt.NoButton
+    event = QMouseEvent(kind, QPointF(pos), QPointF(global_pos), button, buttons,
+                        Qt.NoModifier)
+    event.setTimestamp(int(timestamp))
+    return event
+
+
+def send(widget, event):
+    """Deliver ``event`` and return how long its handler took."""
+    start = time.perf_counter()
+    QApplication.sendEvent(widget, event)
+    return time.perf_counter() - start
+
+
+def frame():
+    """Let posted updates paint; returns the time taken."""
+    start = time.perf_counter()
+    QApplication.processEvents()
+    return time.perf_counter() - start
+
+
+# ==========================================================
+#  Inputs
+# ==========================================================
+def synthetic_strokes(count, rng):
+    """Pen strokes as lists of (t ms, x, y, pressure), sampled at 240 Hz."""
+    strokes = []
+    for _ in range(count):
+        n = int(rng.integers(40, 160))
+        t = np.arange(n) * (1000.0 / 240.0)
+        angle = np.cumsum(rng.normal(0, 0.15, n)) + rng.uniform(0, 2 * math.pi)
+        step = rng.uniform(2, 6)
+        x = rng.uniform(100, VIEW[0] - 100) + np.cumsum(np.cos(angle) * step)
+        y = rng.uniform(100, VIEW[1] - 100) + np.cumsum(np.sin(angle) * step)
+        pressure = 0.4 + 0.4 * np.sin(np.linspace(0, math.pi, n))
+        strokes.append(np.column_stack((t, np.clip(x, 0, VIEW[0] - 1),
+                                        np.clip(y, 0, VIEW[1] - 1), pressure)).tolist())
+    return strokes
+
+
+def load_recording(path):
+    """Strokes from a JSON list of strokes, each a list of [t ms, x, y, pressure]."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def populate(board, count, rng, extent=20000.0):
+    for _ in range(count):
+        n = int(rng.integers(20, 120))
+        start = rng.uniform(0, extent, 2)
+        points = start + np.cumsum(rng.normal(0, 4, (n, 2)), axis=0)
+        board.add_stroke(points, float(rng.uniform(1, 6)), int(rng.integers(0, 2**32)))
+
+
+# ==========================================================
+#  Scenarios
+# ==========================================================
+def bench_strokes(args, rng):
+    strokes = (load_recording(args.recording) if args.recording
+               else synthetic_strokes(args.strokes, rng))
+    canvas = Canvas()
+    canvas.resize(*VIEW)
+    canvas.show()
+    frame()
+    origin = canvas.mapToGlobal(QPoint(0, 0))
+    handler, frames, commits = [], [], []
+    samples = 0
+    start = time.perf_counter()
+    for stroke in strokes:
+        for i, (t, x, y, _) in enumerate(stroke):
+            pos = QPointF(x, y)
+            kind = QEvent.MouseButtonPress if i == 0 else QEvent.MouseMove
+            handler.append(send(canvas, mouse(kind, pos, pos + QPointF(origin), t)))
+            samples += 1
+            if i % SAMPLES_PER_FRAME == 0:
+                frames.append(frame())
+        t, x, y, _ = stroke[-1]
+        pos = QPointF(x, y)
+        commit = send(canvas, mouse(QEvent.MouseButtonRelease, pos, pos + QPointF(origin), t))
+        commits.append(commit + frame())
+    canvas.render_pool.wait()
+    elapsed = time.perf_counter() - start
+    canvas.close()
+    return {"samples_per_s": samples / elapsed, **percentiles(handler, "input"),
+            **percentiles(frames, "frame"), **percentiles(commits, "commit")}
+
+
+def bench_pan_zoom(args, rng):
+    board = Board()
+    populate(board, args.board_strokes, rng)
+    canvas = Canvas(board=board)
+    canvas.resize(*VIEW)
+    canvas.show()
+    frame()
+    canvas.render_pool.wait()
+    frames, settles = [], []
+    centre = QPointF(VIEW[0] / 2, VIEW[1] / 2)
+    start = time.perf_counter()
+    for step in range(args.steps):
+        phase = step % 40
+        if phase < 20:
+            canvas.pan_by(-37.0, -23.0)
+        else:
+            canvas.zoom_at(centre, 1.08 if phase < 30 else 1 / 1.08)
+        t = time.perf_counter()
+        canvas.repaint()
+        frames.append(time.perf_counter() - t)
+        t = time.perf_counter()
+        canvas.render_pool.wait()
+        canvas.repaint()
+        settles.append(time.perf_counter() - t)
+    elapsed = time.perf_counter() - start
+    canvas.close()
+    return {"steps_per_s": args.steps / elapsed, **percentiles(frames, "frame"),
+            **percentiles(settles, "settle")}
+
+
+def _window():
+    window = MainWindow()
+    window.showNormal()
+    window.setGeometry(100, 100, 1000, 700)
+    frame()
+    return window
+
+
+def bench_drag(args, rng):
+    window = _window()
+    scheduler = window.geometry_scheduler
+    local = QPoint(300, 10)         # On the title bar
+    grab = window.mapToGlobal(local)
+    handler, frames = [], []
+    start = time.perf_counter()
+    handler.append(send(window, mouse(QEvent.MouseButtonPress, local, grab)))
+    for i in range(1, args.steps + 1):
+        offset = QPoint(int(200 * math.sin(i / 25.0)), int(80 * math.sin(i / 40.0)))
+        handler.append(send(window, mouse(QEvent.MouseMove, local, grab + offset)))
+        if i % SAMPLES_PER_FRAME == 0:
+            t = time.perf_counter()
+            scheduler.flush()           # Stands in for the frame timer
+            frames.append(time.perf_counter() - t + frame())
+    handler.append(send(window, mouse(QEvent.MouseButtonRelease, local, grab)))
+    elapsed = time.perf_counter() - start
+    window.close()
+    return {"events_per_s": (args.steps + 2) / elapsed, **percentiles(handler, "input"),
+            **percentiles(frames, "frame")}
+
+
+def bench_resize(args, rng):
+    window = _window()
+    scheduler = window.geometry_scheduler
+    handle = window.resize_handles["bottomright"]
+    local = QPoint(2, 2)
+    grab = handle.mapToGlobal(local)
+    handler, frames = [], []
+    start = time.perf_counter()
+    handler.append(send(handle, mouse(QEvent.MouseButtonPress, local, grab)))
+    for i in range(1, args.steps + 1):
+        offset = QPoint(int(300 * math.sin(i / 30.0)), int(200 * math.sin(i / 45.0)))
+        handler.append(send(handle, mouse(QEvent.MouseMove, local, grab + offset)))
+        if i % SAMPLES_PER_FRAME == 0:
+            t = time.perf_counter()
+            scheduler.flush()
+            frames.append(time.perf_counter() - t + frame())
+    handler.append(send(handle, mouse(QEvent.MouseButtonRelease, local, grab)))
+    settle = frame()                    # First full frame after the resize
+    window.canvas.render_pool.wait()
+    settle += frame()
+    elapsed = time.perf_counter() - start
+    window.close()
+    return {"events_per_s": (args.steps + 2) / elapsed, **percentiles(handler, "input"),
+            **percentiles(frames, "frame"), "settle_ms": settle * 1000.0}
+
+
+def bench_storage(args, rng):
+    board = Board()
+    populate(board, args.board_strokes * 4, rng)
+    points = board.store.point_count
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "bench.wbd")
+        start = time.perf_counter()
+        BoardDocument(board).save(path)
+        save = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        start = time.perf_counter()
+        loaded = Board()
+        document = BoardDocument(loaded, path)
+        first = time.perf_counter() - start     # Header and index only
+        document.load_all()
+        load = time.perf_counter() - start
+        document.close()
+    assert len(loaded) == len(board)
+    return {"save_mb_per_s": size / 2**20 / save, "load_points_per_s": points / load,
+            "open_ms": first * 1000.0}
+
+
+SCENARIOS = {"strokes": bench_strokes, "pan_zoom": bench_pan_zoom, "drag": bench_drag,
+             "resize": bench_resize, "storage": bench_storage}
+
+
+# ==========================================================
+#  Baseline Comparison
+# ==========================================================
+def higher_is_better(metric):
+    return "_per_s" in metric
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """(scenario, metric, baseline, current) for every metric that regressed."""
+    regressions = []
+    for scenario, metrics in results.items():
+        for metric, value in metrics.items():
+            base = baseline.get(scenario, {}).get(metric)
+            if not base:
+                continue
+            ratio = base / value if higher_is_better(metric) else value / base
+            noise = next((n for suffix, n in NOISE.items() if metric.endswith(suffix)), 0.0)
+            if ratio > 1.0 + tolerance and abs(value - base) > noise:
+                regressions.append((scenario, metric, base, value))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", help="comma-separated scenarios (default: all)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--recording", help="JSON pen recording to replay")
+    parser.add_argument("--strokes", type=int, default=60)
+    parser.add_argument("--board-strokes", type=int, default=5000)
+    parser.add_argument("--steps", type=int, default=240)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    app = QApplication.instance() or QApplication([])
+    names = args.only.split(",") if args.only else list(SCENARIOS)
+    results = {}
+    for name in names:
+        reset_peak_rss()
+        metrics = SCENARIOS[name](args, np.random.default_rng(args.seed))
+        metrics["peak_rss_mb"] = peak_rss_mb()
+        results[name] = metrics
+        print(name)
+        for metric, value in metrics.items():
+            print(f"  {metric:<20} {value:12.2f}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare with (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for scenario, metric, base, value in regressions:
+        print(f"REGRESSION {scenario}.{metric}: {value:.2f} (baseline {base:.2f})")
+    if not regressions:
+        print(f"no regressions beyond {args.tolerance:.0%} of the baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
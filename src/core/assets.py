@@ -0,0 +1,320 @@
+"""Content-addressed image and PDF assets with mipmaps on disk.
+
+An asset is stored once per content: its id is the SHA-256 of its bytes,
+so pasting the same screenshot twice, or into two boards, shares one copy.
+Each asset is a directory under ``AssetStore.root``::
+
+    <id[:2]>/<id>/source            the original file, byte for byte
+    <id[:2]>/<id>/meta.json         kind and full-resolution size of each page
+    <id[:2]>/<id>/p<page>m<mip>.pix one decoded mip level of one page
+
+Mip ``m`` of a page is its full-resolution image halved ``m`` times (an
+image has a single page; a PDF page's full resolution is its size in
+points times ``PDF_SCALE``). A level file is a 16-byte header followed by
+premultiplied ARGB32 pixels, so it is memory-mapped rather than read: only
+the rows a tile actually samples are paged in, and the kernel can drop them
+again under memory pressure. Images get every level when they are
+imported; PDF pages are rasterized per page and level only when a view
+first needs them. Decoding needs Qt and lives in
+``ui.rendering.asset_loader``; this module only stores and samples pixels.
+
+``AssetCache`` keeps the levels the views are using mapped, picks the level
+that fits a zoom, and evicts the levels of assets placed far outside the
+viewport.
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_ROOT = os.environ.get("WHITEBOARD_ASSET_DIR",
+                              os.path.join(os.path.expanduser("~"), ".cache", "whiteboard", "assets"))
+DEFAULT_BUDGET = int(os.environ.get("WHITEBOARD_ASSET_CACHE_MB", "256")) * 2**20
+PDF_SCALE = 4.0         # Full-resolution pixels per PDF point (288 dpi)
+MIN_MIP_SIZE = 64       # Mips stop once both sides are this small
+LEVEL_MAGIC = b"WBPX"
+LEVEL_HEADER = struct.Struct("<4sIII")      # magic, width, height, reserved
+
+
+class AssetError(Exception):
+    """Raised for asset data that cannot be decoded"""
+
+
+def content_hash(data):
+    """Asset id for ``data``: the hex SHA-256 of its bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def sniff_kind(data):
+    """'pdf' or 'image', from the leading bytes of an asset."""
+    return "pdf" if data[:5] == b"%PDF-" else "image"
+
+
+# ==========================================================
+#  Mip Arithmetic
+# ==========================================================
+def mip_count(width, height):
+    """Number of mip levels for a full-resolution size, counting level 0."""
+    largest = max(width, height, 1)
+    return 1 + max(0, math.ceil(math.log2(largest / MIN_MIP_SIZE)))
+
+
+def mip_size(width, height, mip):
+    """Pixel size of level ``mip`` of a ``width`` x ``height`` image."""
+    return max(1, math.ceil(width / 2 ** mip)), max(1, math.ceil(height / 2 ** mip))
+
+
+def mip_for_scale(width, rect, scale, count):
+    """Coarsest level still at least as sharp as ``rect`` drawn at ``scale``.
+
+    ``width`` is the full-resolution width in pixels, ``rect`` the world
+    rectangle the image is placed in and ``scale`` pixels per world unit.
+    """
+    shown = (rect[2] - rect[0]) * scale
+    if shown <= 0:
+        return count - 1
+    return max(0, min(count - 1, math.floor(math.log2(max(width / shown, 1.0)))))
+
+
+def downsample(pixels):
+    """Next mip level of (H, W) premultiplied ARGB32 pixels: 2x2 box filter."""
+    h, w = pixels.shape
+    channels = pixels.view(np.uint8).reshape(h, w, 4)
+    if h % 2 or w % 2:
+        channels = np.pad(channels, ((0, h % 2), (0, w % 2), (0, 0)), mode="edge")
+    quads = channels.reshape(channels.shape[0] // 2, 2, channels.shape[1] // 2, 2, 4)
+    summed = quads.sum(axis=(1, 3), dtype=np.uint16)
+    return ((summed + 2) // 4).astype(np.uint8).view(np.uint32)[..., 0]
+
+
+# ==========================================================
+#  Compositing
+# ==========================================================
+def composite_image(target, pixels, rect, origin_x, origin_y, scale):
+    """Draw ``pixels`` stretched over world ``rect`` into a tile buffer.
+
+    ``target`` is an (H, W) premultiplied ARGB32 buffer whose pixel (0, 0)
+    shows world point (origin_x, origin_y) at ``scale`` pixels per world
+    unit. Pixels are sampled nearest-neighbour (the level was already
+    picked to match the scale) and composited source-over.
+    """
+    th, tw = target.shape
+    sh, sw = pixels.shape
+    x0 = max(0, math.floor((rect[0] - origin_x) * scale))
+    y0 = max(0, math.floor((rect[1] - origin_y) * scale))
+    x1 = min(tw, math.ceil((rect[2] - origin_x) * scale))
+    y1 = min(th, math.ceil((rect[3] - origin_y) * scale))
+    if x0 >= x1 or y0 >= y1:
+        return
+    # Source pixel under the centre of each target pixel
+    wx = origin_x + (np.arange(x0, x1) + 0.5) / scale
+    wy = origin_y + (np.arange(y0, y1) + 0.5) / scale
+    inside_x = (wx >= rect[0]) & (wx < rect[2])
+    inside_y = (wy >= rect[1]) & (wy < rect[3])
+    if not inside_x.any() or not inside_y.any():
+        return
+    cols = np.clip(((wx - rect[0]) * (sw / (rect[2] - rect[0]))).astype(np.int64), 0, sw - 1)
+    rows = np.clip(((wy - rect[1]) * (sh / (rect[3] - rect[1]))).astype(np.int64), 0, sh - 1)
+    xs = np.flatnonzero(inside_x)
+    ys = np.flatnonzero(inside_y)
+    source = pixels[rows[ys][:, None], cols[xs][None, :]]
+    blend_over(target[y0 + ys[0]:y0 + ys[-1] + 1, x0 + xs[0]:x0 + xs[-1] + 1], source)
+
+
+def blend_over(target, source):
+    """Composite premultiplied ARGB32 ``source`` over ``target`` in place."""
+    alpha = source >> 24
+    if (alpha == 255).all():
+        target[...] = source
+        return
+    src = source.view(np.uint8).reshape(*source.shape, 4).astype(np.uint32)
+    dst = np.ascontiguousarray(target).view(np.uint8).reshape(*target.shape, 4).astype(np.uint32)
+    out = src + (dst * (255 - alpha[..., None]) + 127) // 255
+    target[...] = out.astype(np.uint8).view(np.uint32)[..., 0]
+
+
+# ==========================================================
+#  Asset Store
+# ==========================================================
+class AssetStore:
+    """Directory of deduplicated asset sources, metadata and mip levels
+
+    Writes go to a temporary name and are renamed into place, so a reader
+    (or a crash) never sees half a file, and several threads may write
+    levels concurrently.
+    """
+
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = root
+        self._meta = {}
+        self._lock = threading.Lock()
+
+    def path(self, asset_id, name=""):
+        return os.path.join(self.root, asset_id[:2], asset_id, name)
+
+    def source_path(self, asset_id):
+        return self.path(asset_id, "source")
+
+    def level_path(self, asset_id, page, mip):
+        return self.path(asset_id, f"p{page}m{mip}.pix")
+
+    def __contains__(self, asset_id):
+        return os.path.exists(self.source_path(asset_id))
+
+    # ==========================================================
+    #  Sources & Metadata
+    # ==========================================================
+    def add(self, data):
+        """Store ``data`` unless identical content is already stored; returns its id."""
+        asset_id = content_hash(data)
+        if asset_id not in self:
+            self._write(self.source_path(asset_id), data)
+        return asset_id
+
+    def meta(self, asset_id):
+        """Metadata dict of an asset, or None until it has been probed."""
+        with self._lock:
+            meta = self._meta.get(asset_id)
+        if meta is None:
+            try:
+                with open(self.path(asset_id, "meta.json")) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._meta[asset_id] = meta
+        return meta
+
+    def set_meta(self, asset_id, kind, pages):
+        """Record ``kind`` and the full-resolution (width, height) of each page."""
+        meta = {"kind": kind, "pages": [[int(w), int(h)] for w, h in pages]}
+        self._write(self.path(asset_id, "meta.json"), json.dumps(meta).encode())
+        with self._lock:
+            self._meta[asset_id] = meta
+        return meta
+
+    def page_size(self, asset_id, page=0):
+        meta = self.meta(asset_id)
+        return None if meta is None else tuple(meta["pages"][page])
+
+    # ==========================================================
+    #  Mip Levels
+    # ==========================================================
+    def has_level(self, asset_id, page, mip):
+        return os.path.exists(self.level_path(asset_id, page, mip))
+
+    def write_level(self, asset_id, page, mip, pixels):
+        """Store (H, W) premultiplied ARGB32 ``pixels`` as one mip level."""
+        h, w = pixels.shape
+        header = LEVEL_HEADER.pack(LEVEL_MAGIC, w, h, 0)
+        self._write(self.level_path(asset_id, page, mip),
+                    header + np.ascontiguousarray(pixels, dtype="<u4").tobytes())
+
+    def open_level(self, asset_id, page, mip):
+        """Read-only memory map of a stored level as (H, W) uint32, or None."""
+        path = self.level_path(asset_id, page, mip)
+        try:
+            with open(path, "rb") as f:
+                magic, w, h, _ = LEVEL_HEADER.unpack(f.read(LEVEL_HEADER.size))
+        except (OSError, struct.error):
+            return None
+        if magic != LEVEL_MAGIC or os.path.getsize(path) < LEVEL_HEADER.size + 4 * w * h:
+            return None
+        return np.memmap(path, dtype="<u4", mode="r", offset=LEVEL_HEADER.size, shape=(h, w))
+
+    def _write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+# ==========================================================
+#  Asset Cache
+# ==========================================================
+class AssetCache:
+    """Mapped mip levels in use, LRU under a budget of mapped bytes
+
+    ``pixels`` is what the tile renderer calls: it returns the level that
+    fits the zoom if it is on disk, otherwise the nearest level that is,
+    and asks ``request(asset_id, page, mip)`` (set by the UI to its
+    decoder) for the missing one. ``retain`` unmaps the levels of every
+    asset page not in the given set, e.g. all but those placed near the
+    viewport.
+    """
+
+    def __init__(self, store, budget=DEFAULT_BUDGET, request=None):
+        self.store = store
+        self.budget = budget
+        self.request = request
+        self.nbytes = 0
+        self.evictions = 0
+        self._maps = OrderedDict()      # (asset_id, page, mip) -> memmap
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._maps)
+
+    def level(self, asset_id, page, mip):
+        """Mapped level, mapping it from disk if needed; None if not stored."""
+        key = (asset_id, page, mip)
+        with self._lock:
+            pixels = self._maps.get(key)
+            if pixels is not None:
+                self._maps.move_to_end(key)
+                return pixels
+        pixels = self.store.open_level(asset_id, page, mip)
+        if pixels is not None:
+            with self._lock:
+                if key not in self._maps:
+                    self._maps[key] = pixels
+                    self.nbytes += pixels.nbytes
+                    self._evict()
+        return pixels
+
+    def pixels(self, asset_id, page, rect, scale):
+        """Best available level for drawing a page over world ``rect`` at ``scale``."""
+        size = self.store.page_size(asset_id, page)
+        if size is None:
+            return None
+        count = mip_count(*size)
+        wanted = mip_for_scale(size[0], rect, scale, count)
+        pixels = self.level(asset_id, page, wanted)
+        if pixels is not None:
+            return pixels
+        if self.request is not None:
+            self.request(asset_id, page, wanted)
+        # The request may have been served inline; if not, a blurrier level,
+        # or failing that a sharper one, stands in meanwhile
+        for mip in [wanted] + list(range(wanted + 1, count)) + list(range(wanted - 1, -1, -1)):
+            pixels = self.level(asset_id, page, mip)
+            if pixels is not None:
+                return pixels
+        return None
+
+    def retain(self, pages):
+        """Unmap levels of asset pages not in ``pages`` ({(asset_id, page)})."""
+        with self._lock:
+            dropped = [key for key in self._maps if key[:2] not in pages]
+            for key in dropped:
+                self.nbytes -= self._maps.pop(key).nbytes
+        self.evictions += len(dropped)
+        return len(dropped)
+
+    def discard(self, asset_id):
+        """Unmap every level of an asset, e.g. after its files changed."""
+        with self._lock:
+            for key in [key for key in self._maps if key[0] == asset_id]:
+                self.nbytes -= self._maps.pop(key).nbytes
+
+    def _evict(self):
+        while self.nbytes > self.budget and len(self._maps) > 1:
+            _, pixels = self._maps.popitem(last=False)
+            self.nbytes -= pixels.nbytes
+            self.evictions += 1
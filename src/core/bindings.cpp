@@ -1,11 +1,255 @@
 // Include Pybind11 for Python-C++ bindings
-#include <pybind11/pybind11.h>  
+#include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <stdexcept>
+#include <vector>
 
 // Shorten pybind11 namespace to 'py' for easier use
-namespace py = pybind11;  
+namespace py = pybind11;
+
+// ==========================================================
+//  Stroke Tessellation
+// ==========================================================
+// Mirrors core/raster_fallback.py operation for operation so both paths
+// produce bit-identical output. Build with -ffp-contract=off so the
+// compiler does not fuse multiply-adds behind our back.
+
+namespace {
+
+// Rotation by pi / 8 per arc step (literal so both paths agree exactly)
+constexpr double COS_STEP = 0.9238795325112867;
+constexpr double SIN_STEP = 0.3826834323650898;
+constexpr int MAX_ARC_STEPS = 16;
+
+struct Strip {
+    std::vector<float> xy;
+
+    void emit(double px, double py, double ux, double uy, double r) {
+        xy.push_back(static_cast<float>(px + ux * r));
+        xy.push_back(static_cast<float>(py + uy * r));
+    }
+    void emit_point(double px, double py) {
+        xy.push_back(static_cast<float>(px));
+        xy.push_back(static_cast<float>(py));
+    }
+
+    // Fan from unit vector u to unit vector v around (px, py), turning in
+    // direction dir (+1 counter-clockwise, -1 clockwise), as strip vertices
+    // alternating arc point and pivot.
+    void arc(double px, double py, double ux, double uy, double vx, double vy,
+             double r, double dir) {
+        double cx = ux, cy = uy;
+        emit(px, py, cx, cy, r);
+        for (int i = 0; i < MAX_ARC_STEPS && cx * vx + cy * vy < COS_STEP; ++i) {
+            double nx = cx * COS_STEP - cy * SIN_STEP * dir;
+            double ny = cx * SIN_STEP * dir + cy * COS_STEP;
+            cx = nx;
+            cy = ny;
+            emit_point(px, py);
+            emit(px, py, cx, cy, r);
+        }
+        emit_point(px, py);
+        emit(px, py, vx, vy, r);
+    }
+};
+
+py::array_t<float> tessellate(py::array_t<float, py::array::c_style> x,
+                              py::array_t<float, py::array::c_style> y,
+                              py::array_t<float, py::array::c_style> radius) {
+    auto xs = x.unchecked<1>();
+    auto ys = y.unchecked<1>();
+    auto rs = radius.unchecked<1>();
+    const py::ssize_t count = xs.shape(0);
+    if (ys.shape(0) != count || rs.shape(0) != count)
+        throw std::invalid_argument("x, y and radius must have the same length");
+
+    Strip strip;
+    {
+        py::gil_scoped_release release;
+
+        // Drop consecutive duplicates; they have no direction
+        std::vector<py::ssize_t> keep;
+        for (py::ssize_t i = 0; i < count; ++i) {
+            if (keep.empty() || xs(i) != xs(keep.back()) || ys(i) != ys(keep.back()))
+                keep.push_back(i);
+        }
+
+        if (keep.size() == 1) {
+            const py::ssize_t i = keep[0];
+            const double px = xs(i), py_ = ys(i), r = rs(i);
+            strip.arc(px, py_, 0.0, -1.0, 0.0, 1.0, r, 1.0);
+            strip.emit_point(px, py_);
+            strip.arc(px, py_, 0.0, 1.0, 0.0, -1.0, r, 1.0);
+        } else if (keep.size() > 1) {
+            double prev_dx = 0.0, prev_dy = 0.0;
+            for (size_t k = 0; k + 1 < keep.size(); ++k) {
+                const py::ssize_t a = keep[k], b = keep[k + 1];
+                const double ax = xs(a), ay = ys(a), bx = xs(b), by = ys(b);
+                const double ra = rs(a), rb = rs(b);
+                double dx = bx - ax, dy = by - ay;
+                const double length = std::sqrt(dx * dx + dy * dy);
+                dx = dx / length;
+                dy = dy / length;
+                const double nx = -dy, ny = dx;
+
+                if (k == 0) {
+                    // Start cap: from the right side round the back to the left
+                    strip.arc(ax, ay, -nx, -ny, nx, ny, ra, -1.0);
+                } else {
+                    const double cross = prev_dx * dy - prev_dy * dx;
+                    const double pnx = -prev_dy, pny = prev_dx;
+                    if (cross > 0.0 || (cross == 0.0 && prev_dx * dx + prev_dy * dy < 0.0))
+                        strip.arc(ax, ay, -pnx, -pny, -nx, -ny, ra, 1.0);
+                    else if (cross < 0.0)
+                        strip.arc(ax, ay, pnx, pny, nx, ny, ra, -1.0);
+                }
+                strip.emit(ax, ay, nx, ny, ra);
+                strip.emit(ax, ay, -nx, -ny, ra);
+                strip.emit(bx, by, nx, ny, rb);
+                strip.emit(bx, by, -nx, -ny, rb);
+                strip.emit_point(bx, by);
+                prev_dx = dx;
+                prev_dy = dy;
+
+                if (k + 2 == keep.size()) {
+                    // End cap: from the left side round the front to the right
+                    strip.arc(bx, by, nx, ny, -nx, -ny, rb, -1.0);
+                }
+            }
+        }
+    }
+
+    const py::ssize_t vertices = static_cast<py::ssize_t>(strip.xy.size() / 2);
+    py::array_t<float> out({vertices, static_cast<py::ssize_t>(2)});
+    std::copy(strip.xy.begin(), strip.xy.end(), out.mutable_data());
+    return out;
+}
+
+// ==========================================================
+//  Tile Rasterizer
+// ==========================================================
+// Coverage uses a 2x2 grid of samples per pixel; a sample is covered when
+// it lies inside any triangle of the strip, so overlapping triangles of
+// one stroke never double-blend. Composition is integer source-over into
+// a premultiplied ARGB32 buffer (QImage::Format_ARGB32_Premultiplied).
+
+inline double edge(double ax, double ay, double bx, double by, double px, double py) {
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax);
+}
+
+void rasterize_strip(py::array_t<float, py::array::c_style> vertices,
+                     double origin_x, double origin_y, double scale,
+                     std::uint32_t color,
+                     py::array_t<std::uint32_t, py::array::c_style> target) {
+    if (vertices.ndim() != 2 || vertices.shape(1) != 2)
+        throw std::invalid_argument("vertices must be an (N, 2) float32 array");
+    if (target.ndim() != 2)
+        throw std::invalid_argument("target must be a 2D uint32 array");
+
+    const float* v = vertices.data();
+    const py::ssize_t n = vertices.shape(0);
+    const py::ssize_t height = target.shape(0), width = target.shape(1);
+    std::uint32_t* pixels = target.mutable_data();
+
+    py::gil_scoped_release release;
+
+    // Only the strip's pixel bounds (clipped to the tile) get a coverage mask
+    double min_x = INFINITY, min_y = INFINITY, max_x = -INFINITY, max_y = -INFINITY;
+    for (py::ssize_t i = 0; i < n; ++i) {
+        const double px = (static_cast<double>(v[2 * i]) - origin_x) * scale;
+        const double py_ = (static_cast<double>(v[2 * i + 1]) - origin_y) * scale;
+        min_x = std::min(min_x, px);
+        max_x = std::max(max_x, px);
+        min_y = std::min(min_y, py_);
+        max_y = std::max(max_y, py_);
+    }
+    if (n < 3 || max_x < 0.0 || max_y < 0.0 || min_x >= width || min_y >= height)
+        return;
+    const long left = static_cast<long>(std::max(std::floor(min_x), 0.0));
+    const long top = static_cast<long>(std::max(std::floor(min_y), 0.0));
+    const long right = static_cast<long>(std::min(std::floor(max_x), static_cast<double>(width - 1)));
+    const long bottom = static_cast<long>(std::min(std::floor(max_y), static_cast<double>(height - 1)));
+    const long mask_w = right - left + 1;
+    const long mask_h = bottom - top + 1;
+    std::vector<std::uint8_t> mask(static_cast<size_t>(mask_w * mask_h), 0);
+
+    const double sample_w = static_cast<double>(2 * width - 1);
+    const double sample_h = static_cast<double>(2 * height - 1);
+
+    for (py::ssize_t i = 0; i + 2 < n; ++i) {
+        double x0 = (static_cast<double>(v[2 * i]) - origin_x) * scale;
+        double y0 = (static_cast<double>(v[2 * i + 1]) - origin_y) * scale;
+        double x1 = (static_cast<double>(v[2 * i + 2]) - origin_x) * scale;
+        double y1 = (static_cast<double>(v[2 * i + 3]) - origin_y) * scale;
+        double x2 = (static_cast<double>(v[2 * i + 4]) - origin_x) * scale;
+        double y2 = (static_cast<double>(v[2 * i + 5]) - origin_y) * scale;
+
+        double area = edge(x0, y0, x1, y1, x2, y2);
+        if (area == 0.0)
+            continue;
+        if (area < 0.0) {
+            std::swap(x1, x2);
+            std::swap(y1, y2);
+        }
+
+        // Sample j sits at j * 0.5 + 0.25 in pixel units
+        double jx0 = std::max(std::ceil(std::min({x0, x1, x2}) * 2.0 - 0.5), 0.0);
+        double jx1 = std::min(std::floor(std::max({x0, x1, x2}) * 2.0 - 0.5), sample_w);
+        double jy0 = std::max(std::ceil(std::min({y0, y1, y2}) * 2.0 - 0.5), 0.0);
+        double jy1 = std::min(std::floor(std::max({y0, y1, y2}) * 2.0 - 0.5), sample_h);
+        if (jx0 > jx1 || jy0 > jy1)
+            continue;
+
+        for (long jy = static_cast<long>(jy0); jy <= static_cast<long>(jy1); ++jy) {
+            const double sy = static_cast<double>(jy) * 0.5 + 0.25;
+            for (long jx = static_cast<long>(jx0); jx <= static_cast<long>(jx1); ++jx) {
+                const double sx = static_cast<double>(jx) * 0.5 + 0.25;
+                if (edge(x0, y0, x1, y1, sx, sy) >= 0.0 &&
+                    edge(x1, y1, x2, y2, sx, sy) >= 0.0 &&
+                    edge(x2, y2, x0, y0, sx, sy) >= 0.0) {
+                    mask[((jy >> 1) - top) * mask_w + ((jx >> 1) - left)] |=
+                        static_cast<std::uint8_t>(1u << (((jy & 1) << 1) | (jx & 1)));
+                }
+            }
+        }
+    }
+
+    const std::uint32_t alpha = color >> 24;
+    const std::uint32_t red = (color >> 16) & 0xFF;
+    const std::uint32_t green = (color >> 8) & 0xFF;
+    const std::uint32_t blue = color & 0xFF;
+    for (long m = 0; m < mask_w * mask_h; ++m) {
+        const std::uint32_t covered = static_cast<std::uint32_t>(__builtin_popcount(mask[m]));
+        if (covered == 0)
+            continue;
+        const py::ssize_t p = (top + m / mask_w) * width + left + m % mask_w;
+        const std::uint32_t a = (alpha * covered + 2) / 4;
+        const std::uint32_t inverse = 255 - a;
+        const std::uint32_t dst = pixels[p];
+        const std::uint32_t out_a = a + (((dst >> 24) * inverse + 127) / 255);
+        const std::uint32_t out_r = (red * a + 127) / 255 + ((((dst >> 16) & 0xFF) * inverse + 127) / 255);
+        const std::uint32_t out_g = (green * a + 127) / 255 + ((((dst >> 8) & 0xFF) * inverse + 127) / 255);
+        const std::uint32_t out_b = (blue * a + 127) / 255 + (((dst & 0xFF) * inverse + 127) / 255);
+        pixels[p] = (std::min(out_a, 255u) << 24) | (std::min(out_r, 255u) << 16) |
+                    (std::min(out_g, 255u) << 8) | std::min(out_b, 255u);
+    }
+}
+
+}  // namespace
 
-// Define a Python module named 'core'
-PYBIND11_MODULE(core, m) {  
-    // Future Vulkan bindings will go here
-    // Example: m.def("render", &renderFunction);
-}  
\ No newline at end of file
+// Define the native half of the 'core' package as core._native. It cannot
+// be a top-level module named 'core' without shadowing the Python package.
+PYBIND11_MODULE(_native, m) {
+    m.doc() = "Native stroke tessellator and tile rasterizer";
+    m.def("tessellate", &tessellate,
+          py::arg("x").noconvert(), py::arg("y").noconvert(), py::arg("radius").noconvert(),
+          "Triangle strip (N, 2 float32) for a variable-width stroke with round joins and caps");
+    m.def("rasterize_strip", &rasterize_strip,
+          py::arg("vertices").noconvert(), py::arg("origin_x"), py::arg("origin_y"),
+          py::arg("scale"), py::arg("color"), py::arg("target").noconvert(),
+          "Composite a triangle strip into a premultiplied ARGB32 uint32 tile in place");
+}
@@ -0,0 +1,368 @@
+"""Retained-mode board model: every item lives in world coordinates.
+
+The board knows nothing about Qt or about zoom. Views subscribe with
+``add_listener`` and are told which world rectangle changed so they can
+invalidate only the tiles that cover it; models that track individual
+items (persistence, history) use ``add_stroke_listener`` instead. Stroke
+data lives in a columnar
+``StrokeStore``; the board adds the spatial index and notifications.
+"""
+import numpy as np
+
+from core.geometry import rect_from_points, rect_union, polyline_distance, points_in_polygon
+from core.intersect import (boxes_on_polygon_edge, capsule_hits, gather_points, gather_segments,
+                            path_distance_sq, segments_cross_polygon, split_runs)
+from core.spatial_index import RTree
+from core.stroke_store import StrokeStore
+
+DEFAULT_COLOR = 0xFFE0E0E0  # ARGB
+DEFAULT_WIDTH = 3.0
+SCAN_SHARE = 8          # Lassos over 1/SCAN_SHARE of the board scan instead of querying
+
+
+def _area(rect):
+    return (rect[2] - rect[0]) * (rect[3] - rect[1])
+
+
+class ImagePlacement:
+    """One page of an asset (see core.assets) stretched over a world rect"""
+    __slots__ = ("id", "asset", "page", "rect")
+
+    def __init__(self, image_id, asset, page, rect):
+        self.id = image_id
+        self.asset = asset
+        self.page = page
+        self.rect = rect
+
+
+class Board:
+    """Container of strokes and placed images plus change notification for views"""
+
+    def __init__(self):
+        self.store = StrokeStore()
+        self._index = RTree()
+        self._images = {}               # Image id -> ImagePlacement, in paint order
+        self._image_index = RTree()
+        self._next_image = 0
+        self._listeners = []
+        self._stroke_listeners = []
+        self._image_listeners = []
+        self._count = 0
+        self.bounds = None
+        self.version = 0
+
+    # ==========================================================
+    #  Change Notification
+    # ==========================================================
+    def add_listener(self, callback):
+        """Register ``callback(rect)`` to be called with each dirty world rect."""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def add_stroke_listener(self, callback):
+        """Register ``callback(event, stroke_id)``; event is 'add', 'remove' or 'change'."""
+        self._stroke_listeners.append(callback)
+
+    def remove_stroke_listener(self, callback):
+        if callback in self._stroke_listeners:
+            self._stroke_listeners.remove(callback)
+
+    def _notify_stroke(self, event, stroke_id):
+        for callback in list(self._stroke_listeners):
+            callback(event, stroke_id)
+
+    def add_image_listener(self, callback):
+        """Register ``callback(event, image_id)``; event is 'add' or 'remove'."""
+        self._image_listeners.append(callback)
+
+    def remove_image_listener(self, callback):
+        if callback in self._image_listeners:
+            self._image_listeners.remove(callback)
+
+    def _notify_image(self, event, image_id):
+        for callback in list(self._image_listeners):
+            callback(event, image_id)
+
+    def _notify(self, rect):
+        self.version += 1
+        if rect is None:
+            return
+        for callback in list(self._listeners):
+            callback(rect)
+
+    # ==========================================================
+    #  Editing
+    # ==========================================================
+    def add_stroke(self, points, width=DEFAULT_WIDTH, color=DEFAULT_COLOR,
+                   pressure=None, time=None):
+        """Add a stroke from world-space (x, y) points and return its id.
+
+        ``points`` may be any (N, 2) sequence or array; ``pressure`` and
+        ``time`` are optional per-point columns.
+        """
+        xy = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        stroke_id = self.store.add(xy[:, 0], xy[:, 1], pressure, time, width, color)
+        self._attach(stroke_id)
+        return stroke_id
+
+    def remove_stroke(self, stroke_id):
+        """Remove a stroke; returns the removed Stroke or None.
+
+        The points stay in the store so the stroke can be restored later.
+        """
+        stroke = self.stroke(stroke_id)
+        if stroke is not None:
+            self.store.set_alive(stroke_id, False)
+            self._index.remove(stroke_id)
+            self._count -= 1
+            self._notify_stroke("remove", stroke_id)
+            self._notify(stroke.bounds)
+        return stroke
+
+    def restore_stroke(self, stroke_id):
+        """Bring back a removed stroke; returns it, or None if it cannot be."""
+        if not 0 <= stroke_id < len(self.store):
+            return None
+        row = self.store.table[stroke_id]
+        if row["alive"] or not row["length"]:
+            return None     # Live already, or purged for good
+        self.store.set_alive(stroke_id, True)
+        self._attach(stroke_id)
+        return self.store[stroke_id]
+
+    def transform_strokes(self, ids, matrix):
+        """Apply a 2x3 affine ``matrix`` ((a, b, tx), (c, d, ty)) to strokes.
+
+        Removed strokes are transformed too (silently), so history can
+        replay edits regardless of what is visible.
+        """
+        self._change(ids, lambda i: self.store.transform(i, matrix))
+
+    def restyle_strokes(self, ids, width=None, color=None):
+        """Set the width and/or color of strokes; ``None`` keeps the old value."""
+        self._change(ids, lambda i: self.store.set_style(i, width, color))
+
+    def set_points(self, stroke_id, points, pressure=None, time=None):
+        """Replace the geometry of a stroke with new world-space points."""
+        xy = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        self._change([stroke_id], lambda i: self.store.set_points(i, xy[:, 0], xy[:, 1],
+                                                                  pressure, time))
+
+    def _change(self, ids, edit):
+        dirty = None
+        for stroke_id in ids:
+            stroke_id = int(stroke_id)
+            alive = self.stroke(stroke_id) is not None
+            if alive:
+                dirty = rect_union(dirty, self.store[stroke_id].bounds)
+            edit(stroke_id)
+            if alive:
+                bounds = self.store[stroke_id].bounds
+                self._index.remove(stroke_id)
+                self._index.insert(stroke_id, bounds)
+                self.bounds = rect_union(self.bounds, bounds)
+                dirty = rect_union(dirty, bounds)
+                self._notify_stroke("change", stroke_id)
+        self._notify(dirty)
+
+    def add_image(self, asset, rect, page=0):
+        """Place ``page`` of asset ``asset`` over world ``rect``; returns its id.
+
+        Images are drawn beneath the strokes, in the order they were added.
+        """
+        image_id = self._next_image
+        self._next_image += 1
+        rect = tuple(float(v) for v in rect)
+        self._images[image_id] = ImagePlacement(image_id, asset, page, rect)
+        self._image_index.insert(image_id, rect)
+        self.bounds = rect_union(self.bounds, rect)
+        self._notify_image("add", image_id)
+        self._notify(rect)
+        return image_id
+
+    def remove_image(self, image_id):
+        """Take an image off the board; returns its placement or None."""
+        image = self._images.pop(image_id, None)
+        if image is not None:
+            self._image_index.remove(image_id)
+            self._notify_image("remove", image_id)
+            self._notify(image.rect)
+        return image
+
+    def restore_image(self, image):
+        """Put a removed placement back, under its id and in its paint order.
+
+        Returns it, or None if an image with its id is on the board already.
+        """
+        if image.id in self._images:
+            return None
+        later = self._images and image.id < next(reversed(self._images))
+        self._images[image.id] = image
+        if later:
+            self._images = dict(sorted(self._images.items()))
+        self._image_index.insert(image.id, image.rect)
+        self.bounds = rect_union(self.bounds, image.rect)
+        self._notify_image("add", image.id)
+        self._notify(image.rect)
+        return image
+
+    def _attach(self, stroke_id):
+        bounds = self.store[stroke_id].bounds
+        self._index.insert(stroke_id, bounds)
+        self._count += 1
+        self.bounds = rect_union(self.bounds, bounds)
+        self._notify_stroke("add", stroke_id)
+        self._notify(bounds)
+
+    # ==========================================================
+    #  Queries
+    # ==========================================================
+    def __len__(self):
+        return self._count
+
+    def stroke(self, stroke_id):
+        """Handle for a live stroke, or None."""
+        if 0 <= stroke_id < len(self.store) and self.store.table["alive"][stroke_id]:
+            return self.store[stroke_id]
+        return None
+
+    def strokes(self):
+        """All live strokes in insertion (paint) order."""
+        return [self.store[int(i)] for i in self.store.alive_ids()]
+
+    def image(self, image_id):
+        """The placed image with this id, or None if it is not on the board."""
+        return self._images.get(image_id)
+
+    def images(self):
+        """All placed images in paint order."""
+        return list(self._images.values())
+
+    def images_in_rect(self, rect):
+        """Placed images whose rect touches ``rect``, in paint order."""
+        return [self._images[i] for i in sorted(self._image_index.query(rect))]
+
+    def ids_in_rect(self, rect):
+        """Ids of strokes whose bounds touch ``rect``, in paint order."""
+        return sorted(self._index.query(rect))
+
+    def strokes_in_rect(self, rect):
+        """Strokes whose bounds touch ``rect``, in paint order."""
+        return [self.store[i] for i in self.ids_in_rect(rect)]
+
+    def distance_to(self, stroke_id, x, y):
+        """Distance from (x, y) to the painted edge of a stroke."""
+        stroke = self.store[stroke_id]
+        return max(0.0, polyline_distance(stroke.x, stroke.y, x, y) - stroke.width / 2)
+
+    def hit_test(self, x, y, radius=0.0):
+        """Ids of strokes whose painted area lies within ``radius`` of (x, y)."""
+        return self.strokes_touching_path([x], [y], radius)
+
+    def strokes_touching_path(self, xs, ys, radius=0.0):
+        """Ids of strokes whose painted area comes within ``radius`` of a path.
+
+        The path is a polyline of world points (xs, ys), e.g. the eraser's
+        previous and current position, so a fast drag leaves no gaps.
+        """
+        ids = self._ids_near_path(xs, ys, radius)
+        if not len(ids):
+            return []
+        ax, ay, bx, by, owner = gather_segments(self.store, ids)
+        reach = radius + self.store.table["width"][owner].astype(np.float64) / 2
+        return np.unique(owner[capsule_hits(ax, ay, bx, by, xs, ys, reach)]).tolist()
+
+    def split_along(self, xs, ys, radius=0.0):
+        """What a pixel eraser of ``radius`` dragged along a path leaves behind.
+
+        Returns (stroke_id, [(start, end), ...]) for every stroke the path
+        touches: the sample ranges that survive, each becoming a stroke of
+        its own. Samples within reach are dropped, and so is any segment the
+        path crosses between two surviving samples.
+        """
+        ids = self.strokes_touching_path(xs, ys, radius)
+        if not ids:
+            return []
+        index, starts, lengths = gather_points(self.store, ids)
+        px = self.store.x[index].astype(np.float64)
+        py = self.store.y[index].astype(np.float64)
+        half = self.store.table["width"][ids].astype(np.float64) / 2
+        reach = radius + np.repeat(half, lengths)
+        keep = path_distance_sq(px, py, xs, ys) > reach * reach
+        cut = np.zeros(len(index), dtype=bool)
+        cut[:-1] = capsule_hits(px[:-1], py[:-1], px[1:], py[1:], xs, ys, reach[:-1])
+        plan = {stroke_id: [] for stroke_id in ids}
+        for k, start, end in zip(*(a.tolist() for a in split_runs(keep, starts, lengths, cut))):
+            plan[ids[k]].append((start, end))
+        return list(plan.items())
+
+    def _ids_near_path(self, xs, ys, radius):
+        bounds = rect_from_points(list(zip(xs, ys)), radius)
+        return sorted(self._index.query(bounds)) if bounds is not None else []
+
+    def nearest_stroke(self, x, y, max_distance=float("inf")):
+        """Id of the stroke closest to (x, y), or None if none is in range."""
+        found = self._index.nearest(x, y, 1, max_distance,
+                                    lambda i: self.distance_to(i, x, y))
+        return found[0] if found else None
+
+    def strokes_in_polygon(self, polygon):
+        """Ids of strokes lying entirely inside a lasso ``polygon``.
+
+        Strokes clear of the lasso's edge are decided by their first point.
+        The rest have all their samples tested in one batch, and are left
+        out if a segment crosses the edge even with every sample inside.
+        """
+        bounds = rect_from_points(polygon)
+        if bounds is None or self.bounds is None:
+            return []
+        if _area(bounds) * SCAN_SHARE < _area(self.bounds):
+            ids = np.array(sorted(self._index.query(bounds)), dtype=np.int64)
+        else:
+            # A lasso over much of the board: one pass over the bounds
+            # columns is cheaper than walking the tree to most of its leaves
+            ids = self.store.alive_ids()
+        table = self.store.table
+        x0, y0, x1, y1 = (table[c][ids].astype(np.float64) for c in ("x0", "y0", "x1", "y1"))
+        within = (x0 >= bounds[0]) & (y0 >= bounds[1]) & (x1 <= bounds[2]) & (y1 <= bounds[3])
+        ids = ids[within]
+        if not len(ids):
+            return []
+        on_edge = boxes_on_polygon_edge(x0[within], y0[within], x1[within], y1[within], polygon)
+        first = table["offset"][ids[~on_edge]]
+        clear = ids[~on_edge][points_in_polygon(self.store.x[first], self.store.y[first], polygon)]
+        ids = ids[on_edge]
+        if len(ids):
+            index, starts, lengths = gather_points(self.store, ids)
+            inside = points_in_polygon(self.store.x[index], self.store.y[index], polygon)
+            ids = ids[np.logical_and.reduceat(inside, starts)]
+        if len(ids):
+            ax, ay, bx, by, owner = gather_segments(self.store, ids)
+            crossing = np.unique(owner[segments_cross_polygon(ax, ay, bx, by, polygon)])
+            ids = ids[~np.isin(ids, crossing)]
+        return np.sort(np.concatenate((clear, ids))).tolist()
+
+    def images_in_polygon(self, polygon):
+        """Ids of placed images lying entirely inside a lasso ``polygon``.
+
+        An image is inside when its four corners are and none of its sides
+        crosses the lasso's edge.
+        """
+        bounds = rect_from_points(polygon)
+        if bounds is None:
+            return []
+        images = [image for image in self.images_in_rect(bounds)
+                  if image.rect[0] >= bounds[0] and image.rect[1] >= bounds[1] and
+                  image.rect[2] <= bounds[2] and image.rect[3] <= bounds[3]]
+        if not images:
+            return []
+        x0, y0, x1, y1 = np.array([image.rect for image in images], dtype=np.float64).T
+        # Corners clockwise, each paired with the next one as a side
+        ax, ay = np.concatenate((x0, x1, x1, x0)), np.concatenate((y0, y0, y1, y1))
+        bx, by = np.concatenate((x1, x1, x0, x0)), np.concatenate((y0, y1, y1, y0))
+        inside = points_in_polygon(ax, ay, polygon).reshape(4, -1).all(axis=0)
+        crossing = segments_cross_polygon(ax, ay, bx, by, polygon).reshape(4, -1).any(axis=0)
+        return [image.id for image, keep in zip(images, inside & ~crossing) if keep]
@@ -0,0 +1,499 @@
+"""Chunked, lazily loaded on-disk board format (``.wbd``).
+
+The world is cut into square chunks of ``chunk_size`` world units and each
+stroke belongs to the chunk holding the centre of its bounds. A file is::
+
+    header   64 bytes: magic, version, chunk size, where the index lives,
+             generation (bumped by every write), where the images live
+    payload  one blob per chunk, in any order, possibly with dead space
+    images   one IMAGE_DTYPE record per placed image, in paint order
+    index    one INDEX_DTYPE record per chunk: key, offset, size, bounds
+
+A chunk payload is the stroke table and point columns of its strokes as
+little-endian 4-byte arrays, so it can be read straight out of the
+memory-mapped file with ``np.frombuffer``. Image placements are few and
+small, so they are not chunked: every write stores the whole table again
+(under the ``IMAGES`` key of an update) or carries the last one over, and
+a document loads them all when it opens. They name their pixels by asset
+id; the pixels themselves live in the ``core.assets`` store.
+
+Opening reads only the header and index. ``BoardDocument`` then pulls in
+chunks whose bounds meet the viewport, and saves append just the dirty
+chunks plus a fresh index before flipping the header to point at it, so
+an interrupted save leaves the previous version intact. Dead payload space
+is reclaimed by rewriting the file once it outweighs the live data.
+``snapshot`` and ``write_chunks`` split a save in two, so the encoding
+happens on the thread editing the board and the writing on any other
+(``core.journal`` does that to autosave).
+
+A stroke in a file is addressed by its chunk key and its position in that
+chunk's payload; ``file_ref`` and ``stroke_at`` translate between those
+and stroke ids.
+"""
+import math
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from core.geometry import rect_intersects, rect_union
+
+MAGIC = b"WBRD"
+VERSION = 2             # 2 added images
+FILE_EXTENSION = ".wbd"
+DEFAULT_CHUNK_SIZE = 2048.0
+HEADER = struct.Struct("<4sHHdQQQQQ")
+HEADER_SIZE = 64
+PAYLOAD_HEADER = struct.Struct("<II")
+COMPACT_GARBAGE_RATIO = 1.0
+
+INDEX_DTYPE = np.dtype([
+    ("cx", "<i4"), ("cy", "<i4"),
+    ("offset", "<u8"), ("length", "<u8"),
+    ("strokes", "<u4"),
+    ("x0", "<f4"), ("y0", "<f4"), ("x1", "<f4"), ("y1", "<f4"),
+])
+
+IMAGE_DTYPE = np.dtype([
+    ("asset", "S64"),
+    ("page", "<u4"),
+    ("x0", "<f8"), ("y0", "<f8"), ("x1", "<f8"), ("y1", "<f8"),
+])
+IMAGES = "images"       # Update key of the image table, next to the chunk keys
+
+
+class BoardFileError(Exception):
+    """Raised for files that are not boards or are damaged"""
+
+
+# ==========================================================
+#  Stroke Payload Encoding
+# ==========================================================
+def encode_strokes(store, ids):
+    """Serialize strokes ``ids`` of a StrokeStore into one payload."""
+    ids = np.asarray(ids, dtype=np.int64)
+    rows = store.table[ids]
+    runs = [slice(int(o), int(o) + int(n)) for o, n in zip(rows["offset"], rows["length"])]
+    parts = [PAYLOAD_HEADER.pack(len(ids), int(rows["length"].sum())),
+             rows["length"].astype("<i4").tobytes(),
+             rows["width"].astype("<f4").tobytes(),
+             rows["color"].astype("<u4").tobytes()]
+    for column in (store.x, store.y, store.pressure, store.time):
+        if runs:
+            parts.append(np.concatenate([column[r] for r in runs]).astype("<f4").tobytes())
+    return b"".join(parts)
+
+
+def decode_strokes(buffer, offset=0):
+    """Inverse of ``encode_strokes``; arrays are views into ``buffer``."""
+    count, points = PAYLOAD_HEADER.unpack_from(buffer, offset)
+    offset += PAYLOAD_HEADER.size
+    decoded = {}
+    for name, dtype, n in (("length", "<i4", count), ("width", "<f4", count),
+                           ("color", "<u4", count), ("x", "<f4", points),
+                           ("y", "<f4", points), ("pressure", "<f4", points),
+                           ("time", "<f4", points)):
+        decoded[name] = np.frombuffer(buffer, dtype=dtype, count=n, offset=offset)
+        offset += 4 * n
+    return decoded
+
+
+def encode_images(images):
+    """Serialize ImagePlacements into an IMAGE_DTYPE table."""
+    table = np.zeros(len(images), dtype=IMAGE_DTYPE)
+    for row, image in zip(table, images):
+        row["asset"] = image.asset.encode("ascii")
+        row["page"] = image.page
+        row["x0"], row["y0"], row["x1"], row["y1"] = image.rect
+    return table.tobytes()
+
+
+def decode_images(table):
+    """Yield (asset, page, rect) per placement of an image table."""
+    for row in np.frombuffer(table, dtype=IMAGE_DTYPE):
+        yield (row["asset"].decode("ascii"), int(row["page"]),
+               (float(row["x0"]), float(row["y0"]), float(row["x1"]), float(row["y1"])))
+
+
+def iter_decoded(decoded):
+    """Yield (x, y, pressure, time, width, color) per stroke of a payload."""
+    start = 0
+    for length, width, color in zip(decoded["length"].tolist(), decoded["width"].tolist(),
+                                    decoded["color"].tolist()):
+        end = start + length
+        yield (decoded["x"][start:end], decoded["y"][start:end],
+               decoded["pressure"][start:end], decoded["time"][start:end], width, color)
+        start = end
+
+
+# ==========================================================
+#  Board File
+# ==========================================================
+class BoardFile:
+    """Header, chunk index and memory-mapped payloads of one .wbd file"""
+
+    def __init__(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.chunks = {}            # (cx, cy) -> index record
+        self.images = b""           # Image table
+        self.generation = 0
+        self._mmap = None
+        if os.path.exists(path):
+            self._read()
+        else:
+            self._rewrite({})
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def chunk_key(self, x, y):
+        return (math.floor(x / self.chunk_size), math.floor(y / self.chunk_size))
+
+    def chunks_in_rect(self, rect):
+        """Keys of stored chunks whose content bounds meet ``rect``."""
+        return [key for key, rec in self.chunks.items()
+                if rect_intersects((float(rec["x0"]), float(rec["y0"]),
+                                    float(rec["x1"]), float(rec["y1"])), rect)]
+
+    def reload(self):
+        """Pick up a version of the file written through another BoardFile."""
+        self._read()
+
+    def read_chunk(self, key):
+        """Decoded payload of a stored chunk (views into the mapping)."""
+        rec = self.chunks[key]
+        return decode_strokes(self._mmap, int(rec["offset"]))
+
+    # ==========================================================
+    #  Reading
+    # ==========================================================
+    def _read(self):
+        with open(self.path, "rb") as f:
+            head = f.read(HEADER_SIZE)
+        if len(head) < HEADER_SIZE:
+            raise BoardFileError(f"{self.path}: truncated header")
+        magic, version, _, chunk_size, index_offset, index_count, generation, \
+            images_offset, images_count = HEADER.unpack_from(head)
+        if magic != MAGIC:
+            raise BoardFileError(f"{self.path}: not a board file")
+        if version > VERSION:
+            raise BoardFileError(f"{self.path}: format version {version} is too new")
+        self.chunk_size = chunk_size
+        self.generation = generation
+
+        self.close()
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index = np.frombuffer(self._mmap, dtype=INDEX_DTYPE, count=index_count,
+                              offset=index_offset).copy()
+        self.chunks = {(int(r["cx"]), int(r["cy"])): r for r in index}
+        self.images = bytes(self._mmap[images_offset:
+                                       images_offset + images_count * IMAGE_DTYPE.itemsize])
+
+    # ==========================================================
+    #  Writing
+    # ==========================================================
+    def write_chunks(self, updates):
+        """Persist ``updates`` ({key: (payload, count, bounds) or None}).
+
+        Only the given chunks are written; None deletes a chunk. An
+        ``IMAGES`` entry replaces the image table. Returns the number of
+        payload bytes written.
+        """
+        images = updates.get(IMAGES, self.images)
+        updates = {k: u for k, u in updates.items() if k != IMAGES}
+        file_size = os.path.getsize(self.path)
+        live = sum(int(r["length"]) for k, r in self.chunks.items() if k not in updates)
+        live += sum(len(u[0]) for u in updates.values() if u is not None) + len(images)
+        if file_size - HEADER_SIZE > (1 + COMPACT_GARBAGE_RATIO) * live + 4096:
+            return self._rewrite(updates, images)
+
+        chunks = dict(self.chunks)
+        written = 0
+        with open(self.path, "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            for key, update in updates.items():
+                if update is None:
+                    chunks.pop(key, None)
+                    continue
+                payload, count, bounds = update
+                chunks[key] = self._record(key, f.tell(), payload, count, bounds)
+                f.write(payload)
+                written += len(payload)
+            images_offset = f.tell()
+            f.write(images)
+            index_offset = f.tell()
+            f.write(self._index_bytes(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+            # The header flip is the commit point
+            f.seek(0)
+            f.write(self._header(index_offset, len(chunks), images_offset, images))
+            f.flush()
+            os.fsync(f.fileno())
+        self._read()
+        return written
+
+    def _rewrite(self, updates, images=b""):
+        """Write a compact copy with ``updates`` applied and swap it in."""
+        chunks = {}
+        written = 0
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * HEADER_SIZE)
+            for key, rec in self.chunks.items():
+                if key in updates:
+                    continue
+                payload = self._mmap[int(rec["offset"]):int(rec["offset"]) + int(rec["length"])]
+                chunks[key] = self._record(key, f.tell(), payload, int(rec["strokes"]),
+                                           (rec["x0"], rec["y0"], rec["x1"], rec["y1"]))
+                f.write(payload)
+            for key, update in updates.items():
+                if update is None:
+                    continue
+                payload, count, bounds = update
+                chunks[key] = self._record(key, f.tell(), payload, count, bounds)
+                f.write(payload)
+                written += len(payload)
+            images_offset = f.tell()
+            f.write(images)
+            index_offset = f.tell()
+            f.write(self._index_bytes(chunks))
+            f.seek(0)
+            f.write(self._header(index_offset, len(chunks), images_offset, images))
+            f.flush()
+            os.fsync(f.fileno())
+        self.close()
+        os.replace(tmp_path, self.path)
+        self._read()
+        return written
+
+    def _header(self, index_offset, index_count, images_offset, images):
+        head = HEADER.pack(MAGIC, VERSION, 0, self.chunk_size, index_offset, index_count,
+                           self.generation + 1, images_offset, len(images) // IMAGE_DTYPE.itemsize)
+        return head.ljust(HEADER_SIZE, b"\0")
+
+    @staticmethod
+    def _record(key, offset, payload, count, bounds):
+        rec = np.zeros((), dtype=INDEX_DTYPE)
+        rec["cx"], rec["cy"] = key
+        rec["offset"] = offset
+        rec["length"] = len(payload)
+        rec["strokes"] = count
+        rec["x0"], rec["y0"], rec["x1"], rec["y1"] = bounds
+        return rec
+
+    @staticmethod
+    def _index_bytes(chunks):
+        index = np.zeros(len(chunks), dtype=INDEX_DTYPE)
+        for i, rec in enumerate(chunks.values()):
+            index[i] = rec
+        return index.tobytes()
+
+
+# ==========================================================
+#  Board Document
+# ==========================================================
+class BoardDocument:
+    """A Board backed by a BoardFile: lazy chunk loading and dirty tracking
+
+    Edit listeners, ``callback(event, stroke_id)``, hear the board's stroke
+    events except those of chunks being loaded, before the document
+    updates its own bookkeeping: ``file_ref`` still answers for the stroke
+    as it was. Images placed or removed are reported as ``("image", image_id)``.
+    """
+
+    def __init__(self, board, path=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.board = board
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = None
+        self.loaded = set()
+        self.dirty = set()
+        self.images_dirty = bool(board.images())
+        self._members = {}          # chunk key -> set of stroke ids
+        self._chunk_of = {}         # stroke id -> chunk key
+        self._file_ids = {}         # chunk key -> stroke ids in stored order (sorted)
+        self._loading = None        # Chunk key being loaded, if any
+        self._edit_listeners = []
+        board.add_image_listener(self._on_image)
+        if path is not None and os.path.exists(path):
+            self.file = BoardFile(path)
+            self.chunk_size = self.file.chunk_size
+            self._load_images()
+        # Strokes already on the board belong to the document too
+        for stroke in board.strokes():
+            self._track("add", stroke.id)
+        board.add_stroke_listener(self._on_stroke)
+
+    @property
+    def modified(self):
+        return bool(self.dirty) or self.images_dirty
+
+    def chunk_key(self, x, y):
+        return (math.floor(x / self.chunk_size), math.floor(y / self.chunk_size))
+
+    def _key_for(self, stroke_id):
+        x0, y0, x1, y1 = self.board.store[stroke_id].bounds
+        return self.chunk_key((x0 + x1) / 2, (y0 + y1) / 2)
+
+    def add_edit_listener(self, callback):
+        self._edit_listeners.append(callback)
+
+    def remove_edit_listener(self, callback):
+        if callback in self._edit_listeners:
+            self._edit_listeners.remove(callback)
+
+    def _on_stroke(self, event, stroke_id):
+        if self._loading is None:
+            for callback in list(self._edit_listeners):
+                callback(event, stroke_id)
+        self._track(event, stroke_id)
+
+    def _on_image(self, event, image_id):
+        if self._loading is None:
+            for callback in list(self._edit_listeners):
+                callback("image", image_id)
+            self.images_dirty = True
+
+    def _track(self, event, stroke_id):
+        if event == "change":
+            # Edited in place: dirty its chunk, moving it if its centre moved
+            if stroke_id in self._chunk_of:
+                self._track("remove", stroke_id)
+                self._track("add", stroke_id)
+            return
+        if event == "add":
+            key = self._loading if self._loading is not None else self._key_for(stroke_id)
+            self._chunk_of[stroke_id] = key
+            self._members.setdefault(key, set()).add(stroke_id)
+        else:
+            key = self._chunk_of.pop(stroke_id, None)
+            if key is None:
+                return
+            self._members[key].discard(stroke_id)
+        if self._loading is None:
+            self.dirty.add(key)
+
+    # ==========================================================
+    #  Lazy Loading
+    # ==========================================================
+    def ensure_region(self, rect):
+        """Load every stored chunk meeting ``rect``; returns how many were loaded."""
+        if self.file is None:
+            return 0
+        pending = [k for k in self.file.chunks_in_rect(rect) if k not in self.loaded]
+        for key in pending:
+            self._load_chunk(key)
+        return len(pending)
+
+    def load_all(self):
+        if self.file is not None:
+            for key in list(self.file.chunks):
+                if key not in self.loaded:
+                    self._load_chunk(key)
+
+    def _load_images(self):
+        self._loading = IMAGES
+        try:
+            for asset, page, rect in decode_images(self.file.images):
+                self.board.add_image(asset, rect, page)
+        finally:
+            self._loading = None
+
+    def _load_chunk(self, key):
+        self.loaded.add(key)
+        self._loading = key
+        ids = []
+        try:
+            for x, y, pressure, time, width, color in iter_decoded(self.file.read_chunk(key)):
+                ids.append(self.board.add_stroke(np.column_stack((x, y)), width, color,
+                                                 pressure, time))
+        finally:
+            self._loading = None
+            self._file_ids[key] = np.asarray(ids, dtype=np.int64)
+
+    def file_ref(self, stroke_id):
+        """(chunk key, position) of a stroke in the file as last read or written.
+
+        None for strokes the file does not hold, such as ones added since.
+        """
+        key = self._chunk_of.get(stroke_id)
+        ids = self._file_ids.get(key)
+        if ids is None:
+            return None
+        i = int(np.searchsorted(ids, stroke_id))
+        return (key, i) if i < len(ids) and ids[i] == stroke_id else None
+
+    def stroke_at(self, key, position):
+        """Id of the stroke at ``position`` in stored chunk ``key``, loading it if needed."""
+        if key not in self.loaded and self.file is not None and key in self.file.chunks:
+            self._load_chunk(key)
+        ids = self._file_ids.get(key)
+        if ids is None or not 0 <= position < len(ids):
+            return None
+        return int(ids[position])
+
+    # ==========================================================
+    #  Saving
+    # ==========================================================
+    def save(self, path=None):
+        """Write dirty chunks (everything, for a new path); returns bytes written."""
+        if path is not None and path != self.path:
+            # Saving under a new name writes a full copy
+            self.load_all()
+            if self.file is not None:
+                self.file.close()
+            if os.path.exists(path):
+                os.remove(path)
+            self.path = path
+            self.file = BoardFile(path, self.chunk_size)
+            self.dirty = set(self._members)
+            self.images_dirty = True
+        if self.path is None:
+            raise ValueError("the board has no file name yet")
+        if self.file is None:
+            self.file = BoardFile(self.path, self.chunk_size)
+
+        return self.file.write_chunks(self.snapshot())
+
+    def snapshot(self):
+        """Encode the dirty chunks as ``write_chunks`` updates and mark them clean.
+
+        Positions reported by ``file_ref`` refer to the file with these
+        updates written from now on, whoever writes them and when.
+        """
+        for key in self.dirty:
+            # A chunk edited before it was loaded must not lose its stored strokes
+            if self.file is not None and key in self.file.chunks and key not in self.loaded:
+                self._load_chunk(key)
+
+        updates = {}
+        store = self.board.store
+        for key in self.dirty:
+            ids = sorted(self._members.get(key, ()))
+            if not ids:
+                updates[key] = None
+                self._file_ids.pop(key, None)
+                continue
+            bounds = None
+            for i in ids:
+                bounds = rect_union(bounds, store[i].bounds)
+            updates[key] = (encode_strokes(store, ids), len(ids), bounds)
+            self._file_ids[key] = np.asarray(ids, dtype=np.int64)
+        self.loaded.update(k for k, u in updates.items() if u is not None)
+        self.dirty.clear()
+        if self.images_dirty:
+            updates[IMAGES] = encode_images(self.board.images())
+            self.images_dirty = False
+        return updates
+
+    def close(self):
+        self.board.remove_stroke_listener(self._on_stroke)
+        self.board.remove_image_listener(self._on_image)
+        if self.file is not None:
+            self.file.close()
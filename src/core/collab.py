@@ -0,0 +1,366 @@
+"""Real-time collaboration transport: a local asyncio relay and its clients.
+
+The relay is a star hub. Clients send batches of ``BoardCRDT`` ops; the
+relay applies them to its own replica (so late joiners get a snapshot)
+and fans them out to every other client. Nothing is sent per op: both
+sides queue ops and flush once per ``flush_interval``, the client after
+``coalesce`` and the relay as one frame per recipient, sharing the
+encoding between recipients that get the same ops.
+
+Clients acknowledge their version vector; the relay broadcasts the
+component-wise minimum over connected clients as the *stable* clock, at
+which point everyone may collect tombstones.
+
+Wire format: every message is a little-endian u32 length, a u8 type and a
+payload (see the ``HELLO``..``STABLE`` constants).
+
+Run a relay from ``src``:  python -m core.collab [--port 8765]
+"""
+import argparse
+import asyncio
+import struct
+
+import numpy as np
+
+from core.crdt import (BoardCRDT, COLOR, POINTS, WIDTH, coalesce, decode_clock,
+                       decode_ops, encode_clock, encode_ops)
+
+HELLO, SNAPSHOT, OPS, ACK, STABLE = range(1, 6)
+MESSAGE = struct.Struct("<IB")
+SITE = struct.Struct("<I")
+FLUSH_INTERVAL = 0.016      # Seconds: one batch per frame at 60 Hz
+DEFAULT_PORT = 8765
+
+
+async def read_message(reader):
+    """(type, payload) of the next message, or (None, None) at end of stream."""
+    try:
+        length, kind = MESSAGE.unpack(await reader.readexactly(MESSAGE.size))
+        return kind, await reader.readexactly(length - 1)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None, None
+
+
+def message(kind, payload):
+    return MESSAGE.pack(len(payload) + 1, kind) + payload
+
+
+class _Peer:
+    """Relay-side state of one connected client"""
+
+    def __init__(self, site, writer, acked):
+        self.site = site
+        self.writer = writer
+        self.acked = acked      # Clock the client last acknowledged
+
+
+# ==========================================================
+#  Relay
+# ==========================================================
+class Relay:
+    """Asyncio relay that batches and fans out ops between clients"""
+
+    def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, flush_interval=FLUSH_INTERVAL):
+        self.host = host
+        self.port = port
+        self.flush_interval = flush_interval
+        self.replica = BoardCRDT(site=0)
+        self.peers = {}             # site -> _Peer
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._batches = []          # (sender site, ops) since the last flush
+        self._stable = {}
+        self._server = None
+        self._flusher = None
+        self._handlers = set()      # Tasks serving a connection
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._flusher = asyncio.create_task(self._flush_loop())
+        return self
+
+    async def close(self):
+        self._flusher.cancel()
+        self._server.close()
+        for peer in list(self.peers.values()):
+            peer.writer.close()
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            await self._session(reader, writer)
+        finally:
+            self._handlers.discard(task)
+
+    async def _session(self, reader, writer):
+        kind, payload = await read_message(reader)
+        if kind != HELLO:
+            writer.close()
+            return
+        (site,) = SITE.unpack(payload)
+        self.bytes_in += len(payload) + MESSAGE.size
+        # Queued ops are in the snapshot already; send them on before the
+        # newcomer joins so it does not receive them twice
+        self.flush()
+        ops, clock = self.replica.snapshot()
+        peer = self.peers[site] = _Peer(site, writer, clock)
+        self._send(peer, SNAPSHOT, encode_clock(clock) + encode_ops(ops))
+        try:
+            while True:
+                kind, payload = await read_message(reader)
+                if kind is None:
+                    break
+                self.bytes_in += len(payload) + MESSAGE.size
+                if kind == OPS:
+                    ops = decode_ops(payload)
+                    for op in ops:
+                        self.replica.apply(op)
+                    self._batches.append((site, ops))
+                elif kind == ACK:
+                    peer.acked = decode_clock(payload)[0]
+        finally:
+            if self.peers.get(site) is peer:
+                del self.peers[site]
+            writer.close()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    def flush(self):
+        """Send every client the ops others sent since the last flush."""
+        batches, self._batches = self._batches, []
+        if batches:
+            senders = {site for site, _ in batches}
+            frames = {}         # Excluded sender -> encoded frame
+            for peer in self.peers.values():
+                exclude = peer.site if peer.site in senders else None
+                if exclude not in frames:
+                    ops = [op for site, batch in batches if site != exclude for op in batch]
+                    frames[exclude] = encode_ops(ops) if ops else None
+                if frames[exclude] is not None:
+                    self._send(peer, OPS, frames[exclude])
+
+        stable = self.stable_clock()
+        if stable != self._stable:
+            self._stable = stable
+            self.replica.collect(stable)
+            payload = encode_clock(stable)
+            for peer in self.peers.values():
+                self._send(peer, STABLE, payload)
+
+    def stable_clock(self):
+        """Per site, the highest counter every connected client has applied."""
+        if not self.peers:
+            return {}
+        return {site: min(peer.acked.get(site, 0) for peer in self.peers.values())
+                for site in self.replica.clock}
+
+    def _send(self, peer, kind, payload):
+        data = message(kind, payload)
+        self.bytes_out += len(data)
+        peer.writer.write(data)
+
+
+# ==========================================================
+#  Client
+# ==========================================================
+class CollabClient:
+    """Connects one replica to a relay
+
+    Local ops go in through ``submit`` and are sent in coalesced batches.
+    Remote ops are applied to the replica and the resulting changes are
+    passed to each ``listeners`` callback as a list of (event, stroke id).
+    """
+
+    def __init__(self, replica, host="127.0.0.1", port=DEFAULT_PORT,
+                 flush_interval=FLUSH_INTERVAL):
+        self.replica = replica
+        self.host = host
+        self.port = port
+        self.flush_interval = flush_interval
+        self.listeners = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._outbox = []
+        self._acked = None
+        self._writer = None
+        self._tasks = []
+
+    async def connect(self):
+        reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._write(HELLO, SITE.pack(self.replica.site))
+        kind, payload = await read_message(reader)
+        if kind != SNAPSHOT:
+            raise ConnectionError("relay did not send a snapshot")
+        self.bytes_received += len(payload) + MESSAGE.size
+        clock, offset = decode_clock(payload)
+        before = set(self.replica.ids())
+        self.replica.load_snapshot(decode_ops(payload[offset:]), clock)
+        self._notify([("add", i) for i in self.replica.ids() if i not in before])
+        self._tasks = [asyncio.create_task(self._read_loop(reader)),
+                       asyncio.create_task(self._flush_loop())]
+        return self
+
+    async def close(self):
+        self.flush()
+        for task in self._tasks:
+            task.cancel()
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+    def submit(self, op):
+        """Queue a local op (already applied to the replica) for broadcast."""
+        self._outbox.append(op)
+
+    def flush(self):
+        """Send queued ops as one batch, and acknowledge what we have applied."""
+        if self._outbox:
+            ops, self._outbox = coalesce(self._outbox), []
+            if ops:
+                self._write(OPS, encode_ops(ops))
+        if self.replica.clock != self._acked:
+            self._acked = dict(self.replica.clock)
+            self._write(ACK, encode_clock(self._acked))
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def _read_loop(self, reader):
+        while True:
+            kind, payload = await read_message(reader)
+            if kind is None:
+                return
+            self.bytes_received += len(payload) + MESSAGE.size
+            if kind == OPS:
+                changes = [self.replica.apply(op) for op in decode_ops(payload)]
+                self._notify([c for c in changes if c is not None])
+            elif kind == STABLE:
+                self.replica.collect(decode_clock(payload)[0])
+
+    def _notify(self, changes):
+        if changes:
+            for callback in list(self.listeners):
+                callback(changes)
+
+    def _write(self, kind, payload):
+        data = message(kind, payload)
+        self.bytes_sent += len(data)
+        self._writer.write(data)
+
+
+# ==========================================================
+#  Board Binding
+# ==========================================================
+class BoardBinding:
+    """Keeps a ``Board`` and a ``BoardCRDT`` replica in step
+
+    Local board edits become replica ops handed to ``submit`` (typically
+    ``CollabClient.submit``); ``apply_remote`` (a ``CollabClient``
+    listener) mirrors remote changes onto the board. Removal is final in
+    the replica, so a locally restored stroke (undo) is shared as new.
+    Strokes on the board before binding are not shared. For a board backed
+    by a ``BoardDocument`` pass the ``document``: its edit events leave out
+    the strokes it pages in from the file, which are not edits either.
+    Placed images are not shared (the replica holds strokes only).
+    """
+
+    def __init__(self, board, replica, submit, document=None):
+        self.board = board
+        self.replica = replica
+        self.submit = submit
+        self.document = document
+        self._to_board = {}         # Replica stroke id -> board stroke id
+        self._to_replica = {}
+        self._applying = False
+        if document is not None:
+            document.add_edit_listener(self._on_local)
+        else:
+            board.add_stroke_listener(self._on_local)
+
+    def close(self):
+        if self.document is not None:
+            self.document.remove_edit_listener(self._on_local)
+        else:
+            self.board.remove_stroke_listener(self._on_local)
+
+    def _on_local(self, event, board_id):
+        if self._applying or event == "image":
+            return
+        stroke = self.board.store[board_id]
+        if event == "add":
+            points = np.column_stack((stroke.x, stroke.y, stroke.pressure))
+            op = self.replica.add(points, stroke.width, stroke.color)
+            self._to_replica[board_id] = op.target
+            self._to_board[op.target] = board_id
+            self.submit(op)
+            return
+        target = self._to_replica.get(board_id)
+        if target is None or target not in self.replica:
+            return
+        if event == "remove":
+            self.submit(self.replica.remove(target))
+            return
+        points = np.column_stack((stroke.x, stroke.y, stroke.pressure))
+        for field, value in ((POINTS, points), (WIDTH, stroke.width), (COLOR, stroke.color)):
+            current = self.replica.get(target, field)
+            same = np.array_equal(current, value) if field == POINTS else current == value
+            if not same:
+                self.submit(self.replica.set(target, field, value))
+
+    def apply_remote(self, changes):
+        self._applying = True
+        try:
+            for event, target in changes:
+                if event == "add":
+                    points = self.replica.get(target, POINTS)
+                    board_id = self.board.add_stroke(points[:, :2], self.replica.get(target, WIDTH),
+                                                     self.replica.get(target, COLOR), points[:, 2])
+                    self._to_board[target] = board_id
+                    self._to_replica[board_id] = target
+                    continue
+                board_id = self._to_board.get(target)
+                if board_id is None:
+                    continue
+                if event == "remove":
+                    self.board.remove_stroke(board_id)
+                    continue
+                points = self.replica.get(target, POINTS)
+                stroke = self.board.store[board_id]
+                if not np.array_equal(points, np.column_stack((stroke.x, stroke.y, stroke.pressure))):
+                    self.board.set_points(board_id, points[:, :2], points[:, 2])
+                self.board.restyle_strokes([board_id], self.replica.get(target, WIDTH),
+                                           self.replica.get(target, COLOR))
+        finally:
+            self._applying = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local collaboration relay")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    async def serve():
+        relay = await Relay(args.host, args.port).start()
+        print(f"relay listening on {relay.host}:{relay.port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""Conflict-free replicated board model for real-time collaboration.
+
+Every replica (each client, and the relay) holds a ``BoardCRDT``. A stroke
+is identified by ``(site, counter)`` of the operation that created it. Its
+properties (points, width, color) form a last-writer-wins map: each write
+carries a ``(lamport, site)`` stamp and the highest stamp wins everywhere.
+Paint order is a sequence keyed by the creation stamp, so strokes added
+concurrently on different sites end up in the same order on all of them.
+Only strokes are replicated so far: placed images (``Board.add_image``)
+stay local to the site that placed them.
+
+Removing a stroke drops its data but keeps a tombstone (id and stamp) so
+that late writes to it are recognised and ignored. Tombstones are garbage
+collected once the removal is causally stable, i.e. every site has applied
+it; the relay works that out as the minimum of the clients' version
+vectors and hands it to ``collect``.
+
+Operations travel as binary deltas: ``encode_ops`` packs them into
+little-endian records with float32 point columns, zlib-compressed when
+that pays, and ``coalesce`` drops writes a later op in the same batch
+makes redundant.
+"""
+import struct
+import zlib
+from bisect import bisect_left, insort
+
+import numpy as np
+
+ADD, REMOVE, SET = 1, 2, 3
+FIELDS = ("points", "width", "color")
+POINTS, WIDTH, COLOR = range(3)
+
+OP_HEADER = struct.Struct("<BIIQ")          # kind, site, counter, lamport
+TARGET = struct.Struct("<II")               # site, counter of the stroke
+STYLE = struct.Struct("<fI")                # width, color
+FIELD = struct.Struct("<B")
+COUNT = struct.Struct("<I")
+COMPRESS_OVER = 512                         # Bytes; smaller frames go raw
+
+
+def _wire_float(value):
+    """Round to float32 up front so every replica holds the same width."""
+    return float(np.float32(value))
+
+
+class Op:
+    """One replicated operation
+
+    ``target`` is the stroke id an op acts on (its own id for ADD). ADD
+    carries ``value`` = (points, width, color) where points is an (N, 3)
+    float32 array of x, y, pressure; SET carries the new field value.
+    """
+    __slots__ = ("kind", "site", "counter", "lamport", "target", "field", "value")
+
+    def __init__(self, kind, site, counter, lamport, target=None, field=None, value=None):
+        self.kind = kind
+        self.site = site
+        self.counter = counter
+        self.lamport = lamport
+        self.target = (site, counter) if target is None else target
+        self.field = field
+        self.value = value
+
+    @property
+    def id(self):
+        return (self.site, self.counter)
+
+    @property
+    def stamp(self):
+        return (self.lamport, self.site)
+
+
+class _Stroke:
+    """Replica state of one stroke: LWW fields, or a tombstone"""
+    __slots__ = ("key", "fields", "removed")
+
+    def __init__(self, key):
+        self.key = key              # (lamport, site, counter): position in paint order
+        self.fields = {}            # field -> (stamp, value)
+        self.removed = None         # (site, counter) of the removal, once removed
+
+
+# ==========================================================
+#  Replica
+# ==========================================================
+class BoardCRDT:
+    """A replica of the shared board
+
+    Local edits (``add``, ``remove``, ``set``) return the op to broadcast;
+    ops from elsewhere go through ``apply``, which is idempotent and
+    returns what changed as ('add' | 'remove' | 'change', stroke id).
+    Ops must arrive causally: those from one site in the order they were
+    made, and an edit after the ADD of its stroke. The relay's FIFO star
+    topology gives both.
+    """
+
+    def __init__(self, site):
+        self.site = site
+        self.lamport = 0
+        self.clock = {}             # site -> highest counter applied
+        self.order = []             # Sorted keys of live strokes and tombstones
+        self._strokes = {}          # Stroke id -> _Stroke
+        self._counter = 0
+
+    def __len__(self):
+        return sum(1 for s in self._strokes.values() if s.removed is None)
+
+    def __contains__(self, stroke_id):
+        stroke = self._strokes.get(stroke_id)
+        return stroke is not None and stroke.removed is None
+
+    @property
+    def tombstones(self):
+        return sum(1 for s in self._strokes.values() if s.removed is not None)
+
+    def ids(self):
+        """Live stroke ids in paint order."""
+        return [key[1:] for key in self.order if self._strokes[key[1:]].removed is None]
+
+    def get(self, stroke_id, field):
+        return self._strokes[stroke_id].fields[field][1]
+
+    def digest(self):
+        """Hash of the visible state; equal on replicas that have converged."""
+        parts = []
+        for stroke_id in self.ids():
+            fields = self._strokes[stroke_id].fields
+            parts.append(repr((stroke_id, fields[WIDTH][1], fields[COLOR][1])).encode())
+            parts.append(fields[POINTS][1].tobytes())
+        return zlib.crc32(b"".join(parts))
+
+    # ==========================================================
+    #  Local Edits
+    # ==========================================================
+    def add(self, points, width, color):
+        """Create a stroke from (N, 2) or (N, 3) points; returns the ADD op."""
+        points = np.asarray(points, dtype=np.float32)
+        if points.shape[1] == 2:
+            points = np.column_stack((points, np.ones(len(points), dtype=np.float32)))
+        value = (np.ascontiguousarray(points), _wire_float(width), int(color))
+        return self._local(ADD, value=value)
+
+    def remove(self, stroke_id):
+        return self._local(REMOVE, target=stroke_id)
+
+    def set(self, stroke_id, field, value):
+        if field == POINTS:
+            value = np.ascontiguousarray(value, dtype=np.float32)
+        elif field == WIDTH:
+            value = _wire_float(value)
+        return self._local(SET, target=stroke_id, field=field, value=value)
+
+    def _local(self, kind, target=None, field=None, value=None):
+        self._counter = max(self._counter, self.clock.get(self.site, 0)) + 1
+        op = Op(kind, self.site, self._counter, self.lamport + 1, target, field, value)
+        self.apply(op)
+        return op
+
+    # ==========================================================
+    #  Applying Operations
+    # ==========================================================
+    def apply(self, op, check=True):
+        """Apply one op; returns (event, stroke id) or None if nothing changed."""
+        if check and op.counter <= self.clock.get(op.site, 0):
+            return None     # Already applied
+        if op.counter > self.clock.get(op.site, 0):
+            self.clock[op.site] = op.counter
+        self.lamport = max(self.lamport, op.lamport)
+
+        if op.kind == ADD:
+            if op.target in self._strokes:
+                return None
+            stroke = self._strokes[op.target] = _Stroke((op.lamport, op.site, op.counter))
+            for field, value in enumerate(op.value):
+                stroke.fields[field] = (op.stamp, value)
+            insort(self.order, stroke.key)
+            return ("add", op.target)
+
+        stroke = self._strokes.get(op.target)
+        if stroke is None or stroke.removed is not None:
+            return None     # Removed (and maybe collected) already
+        if op.kind == REMOVE:
+            stroke.removed = op.id
+            stroke.fields = {}
+            return ("remove", op.target)
+        current = stroke.fields.get(op.field)
+        if current is not None and current[0] >= op.stamp:
+            return None     # A later write already won
+        stroke.fields[op.field] = (op.stamp, op.value)
+        return ("change", op.target)
+
+    def collect(self, stable):
+        """Drop tombstones whose removal every site has applied.
+
+        ``stable`` maps site -> counter that all replicas have reached.
+        Returns how many tombstones were dropped.
+        """
+        dropped = []
+        for stroke_id, stroke in self._strokes.items():
+            if stroke.removed is not None:
+                site, counter = stroke.removed
+                if counter <= stable.get(site, 0):
+                    dropped.append(stroke_id)
+        for stroke_id in dropped:
+            key = self._strokes.pop(stroke_id).key
+            del self.order[bisect_left(self.order, key)]
+        return len(dropped)
+
+    def snapshot(self):
+        """Ops that rebuild the live state on an empty replica, plus the clock."""
+        ops = []
+        for key in self.order:
+            stroke = self._strokes[key[1:]]
+            if stroke.removed is not None:
+                continue
+            lamport, site, counter = key
+            fields = stroke.fields
+            value = (fields[POINTS][1], fields[WIDTH][1], fields[COLOR][1])
+            ops.append(Op(ADD, site, counter, lamport, value=value))
+            for field, (stamp, value) in fields.items():
+                if stamp != (lamport, site):
+                    ops.append(Op(SET, stamp[1], 0, stamp[0], (site, counter), field, value))
+        return ops, dict(self.clock)
+
+    def load_snapshot(self, ops, clock):
+        for op in ops:
+            self.apply(op, check=False)
+        for site, counter in clock.items():
+            self.clock[site] = max(self.clock.get(site, 0), counter)
+
+
+# ==========================================================
+#  Batching & Binary Encoding
+# ==========================================================
+def coalesce(ops):
+    """Drop ops of a local batch that later ops in it make redundant.
+
+    A SET is superseded by a later SET of the same field on the same
+    stroke, and a stroke added and removed within the batch is never sent.
+    Op counters may then skip; receivers only need them to increase.
+    """
+    removed = {op.target for op in ops if op.kind == REMOVE}
+    born_and_gone = {op.target for op in ops if op.kind == ADD and op.target in removed}
+    last_set = {}
+    for i, op in enumerate(ops):
+        if op.kind == SET:
+            last_set[(op.target, op.field)] = i
+    kept = []
+    for i, op in enumerate(ops):
+        if op.target in born_and_gone:
+            continue
+        if op.kind == SET and last_set[(op.target, op.field)] != i:
+            continue
+        kept.append(op)
+    return kept
+
+
+def _pack_points(points):
+    return COUNT.pack(len(points)) + np.ascontiguousarray(points, dtype="<f4").tobytes()
+
+
+def _unpack_points(data, offset):
+    (n,), offset = COUNT.unpack_from(data, offset), offset + COUNT.size
+    end = offset + n * 12
+    return np.frombuffer(data[offset:end], dtype="<f4").reshape(n, 3).copy(), end
+
+
+def encode_ops(ops):
+    """Pack ops into one binary delta frame."""
+    parts = [COUNT.pack(len(ops))]
+    for op in ops:
+        parts.append(OP_HEADER.pack(op.kind, op.site, op.counter, op.lamport))
+        if op.kind == ADD:
+            points, width, color = op.value
+            parts.append(STYLE.pack(width, color))
+            parts.append(_pack_points(points))
+            continue
+        parts.append(TARGET.pack(*op.target))
+        if op.kind == SET:
+            parts.append(FIELD.pack(op.field))
+            if op.field == POINTS:
+                parts.append(_pack_points(op.value))
+            elif op.field == WIDTH:
+                parts.append(struct.pack("<f", op.value))
+            else:
+                parts.append(COUNT.pack(op.value))
+    body = b"".join(parts)
+    if len(body) > COMPRESS_OVER:
+        packed = zlib.compress(body, 1)
+        if len(packed) < len(body):
+            return b"\x01" + packed
+    return b"\x00" + body
+
+
+def decode_ops(frame):
+    """Inverse of ``encode_ops``."""
+    data = zlib.decompress(frame[1:]) if frame[0] == 1 else bytes(frame[1:])
+    (count,), offset = COUNT.unpack_from(data, 0), COUNT.size
+    ops = []
+    for _ in range(count):
+        kind, site, counter, lamport = OP_HEADER.unpack_from(data, offset)
+        offset += OP_HEADER.size
+        if kind == ADD:
+            width, color = STYLE.unpack_from(data, offset)
+            points, offset = _unpack_points(data, offset + STYLE.size)
+            ops.append(Op(kind, site, counter, lamport, value=(points, width, color)))
+            continue
+        target = TARGET.unpack_from(data, offset)
+        offset += TARGET.size
+        field = value = None
+        if kind == SET:
+            (field,) = FIELD.unpack_from(data, offset)
+            offset += FIELD.size
+            if field == POINTS:
+                value, offset = _unpack_points(data, offset)
+            elif field == WIDTH:
+                (value,) = struct.unpack_from("<f", data, offset)
+                offset += 4
+            else:
+                (value,) = COUNT.unpack_from(data, offset)
+                offset += COUNT.size
+        ops.append(Op(kind, site, counter, lamport, target, field, value))
+    return ops
+
+
+def encode_clock(clock):
+    return COUNT.pack(len(clock)) + b"".join(TARGET.pack(site, counter)
+                                             for site, counter in clock.items())
+
+
+def decode_clock(data, offset=0):
+    """(clock dict, offset after it)."""
+    (count,), offset = COUNT.unpack_from(data, offset), offset + COUNT.size
+    clock = {}
+    for _ in range(count):
+        site, counter = TARGET.unpack_from(data, offset)
+        clock[site] = counter
+        offset += TARGET.size
+    return clock, offset
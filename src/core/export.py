@@ -0,0 +1,297 @@
+"""Streaming PNG, PDF and SVG writers for exporting huge board regions.
+
+An export of any size is cut into strips: bands of at most ``STRIP_ROWS``
+pixel rows, no wider than a page. Each strip is rendered, converted to
+PNG-filtered scanlines and deflated on its own, typically in a worker
+process (see ``ui.export``), into an ``EncodedStrip``. The writers below
+only stitch compressed strips together in order, so exporting 20k x 20k
+pixels holds a handful of compressed strips in memory, never the image.
+
+Strips are raw deflate streams ending in a sync flush, so concatenating
+them is itself a valid deflate stream (the trick pigz uses); wrapping it
+in a zlib header, an empty final block and the combined Adler-32 gives the
+zlib stream PNG ``IDAT`` chunks and PDF ``FlateDecode`` images expect. A
+PDF page is one image, drawn with the PNG predictor; an SVG is a column
+of embedded PNG strips. This module is Qt-free.
+"""
+import base64
+import math
+import struct
+import zlib
+
+import numpy as np
+
+STRIP_ROWS = 256                # Pixel rows per strip: one tile row of the canvas
+COMPRESSION = 6
+FORMATS = ("png", "pdf", "svg")
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+ZLIB_HEADER = b"\x78\x9c"
+DEFLATE_END = b"\x03\x00"       # An empty, final fixed-Huffman block
+ADLER_BASE = 65521
+PNG_FILTER_SUB = 1
+
+
+def format_for_path(path):
+    """Export format named by the extension of ``path``."""
+    extension = path.rsplit(".", 1)[-1].lower() if "." in path else ""
+    if extension not in FORMATS:
+        raise ValueError(f"cannot export to {path!r}: expected one of "
+                         + ", ".join("." + f for f in FORMATS))
+    return extension
+
+
+# ==========================================================
+#  Layout
+# ==========================================================
+def export_size(rect, scale):
+    """Pixel size of world ``rect`` rendered at ``scale`` pixels per unit."""
+    return (max(1, math.ceil((rect[2] - rect[0]) * scale)),
+            max(1, math.ceil((rect[3] - rect[1]) * scale)))
+
+
+def page_grid(width, height, page_width=None, page_height=None):
+    """(x, y, w, h) pixel rectangles of the pages, row by row.
+
+    Without a page size the whole export is one page.
+    """
+    page_width = page_width or width
+    page_height = page_height or height
+    return [(x, y, min(page_width, width - x), min(page_height, height - y))
+            for y in range(0, height, page_height)
+            for x in range(0, width, page_width)]
+
+
+def page_strips(page):
+    """(x, y, w, h) pixel rectangles of the strips filling ``page``, top down."""
+    x, y, width, height = page
+    return [(x, sy, width, min(STRIP_ROWS, y + height - sy))
+            for sy in range(y, y + height, STRIP_ROWS)]
+
+
+# ==========================================================
+#  Strip Encoding
+# ==========================================================
+class EncodedStrip:
+    """One strip as a sync-flushed raw deflate stream plus its checksum"""
+    __slots__ = ("rect", "data", "adler", "length")
+
+    def __init__(self, rect, data, adler, length):
+        self.rect = rect
+        self.data = data            # Raw deflate, ends on a byte boundary
+        self.adler = adler          # Adler-32 of the uncompressed scanlines
+        self.length = length        # Uncompressed scanline bytes
+
+
+def channels(pixels, alpha):
+    """(H, W, 3 or 4) straight RGB(A) bytes of premultiplied ARGB32 ``pixels``.
+
+    Without ``alpha`` the pixels are taken as already opaque.
+    """
+    argb = pixels.view(np.uint8).reshape(*pixels.shape, 4)     # B, G, R, A in memory
+    if not alpha:
+        return argb[..., 2::-1]
+    rgba = argb[..., [2, 1, 0, 3]].copy()
+    a = rgba[..., 3:].astype(np.uint32)
+    partial = (a > 0) & (a < 255)
+    if partial.any():
+        straight = (rgba[..., :3].astype(np.uint32) * 255 + a // 2) // np.maximum(a, 1)
+        rgba[..., :3] = np.where(partial, np.minimum(straight, 255), rgba[..., :3])
+    return rgba
+
+
+def scanlines(rows):
+    """PNG scanlines (filter byte + Sub-filtered bytes) of (H, W, C) ``rows``."""
+    height, width, depth = rows.shape
+    flat = rows.reshape(height, width * depth)
+    out = np.empty((height, 1 + width * depth), dtype=np.uint8)
+    out[:, 0] = PNG_FILTER_SUB
+    out[:, 1:1 + depth] = flat[:, :depth]
+    np.subtract(flat[:, depth:], flat[:, :-depth], out=out[:, 1 + depth:])
+    return out
+
+
+def deflate_strip(rect, lines, level=COMPRESSION):
+    """Compress the scanlines of one strip into an ``EncodedStrip``."""
+    raw = memoryview(np.ascontiguousarray(lines)).cast("B")
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = compressor.compress(raw) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    return EncodedStrip(rect, data, zlib.adler32(raw), len(raw))
+
+
+def adler32_combine(adler1, adler2, length2):
+    """Adler-32 of A + B from the checksums of A and B (zlib's adler32_combine)."""
+    rem = length2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = rem * sum1 % ADLER_BASE
+    sum1 = (sum1 + (adler2 & 0xFFFF) + ADLER_BASE - 1) % ADLER_BASE
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + ADLER_BASE - rem) % ADLER_BASE
+    return sum1 | (sum2 << 16)
+
+
+class ZlibJoin:
+    """Stitches encoded strips into one zlib stream, piece by piece"""
+
+    def __init__(self):
+        self.adler = 1              # Adler-32 of no data
+        self.started = False
+
+    def add(self, strip):
+        """Bytes to emit for ``strip``, the zlib header included the first time."""
+        self.adler = adler32_combine(self.adler, strip.adler, strip.length)
+        head = b"" if self.started else ZLIB_HEADER
+        self.started = True
+        return head + strip.data
+
+    def finish(self):
+        return (b"" if self.started else ZLIB_HEADER) + DEFLATE_END + struct.pack(">I", self.adler)
+
+
+def _png_chunk(kind, data):
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+def _png_header(width, height, alpha):
+    return PNG_SIGNATURE + _png_chunk(b"IHDR", struct.pack(
+        ">IIBBBBB", width, height, 8, 6 if alpha else 2, 0, 0, 0))
+
+
+def png_bytes(strip, alpha):
+    """A standalone PNG file holding a single encoded strip."""
+    join = ZlibJoin()
+    data = join.add(strip) + join.finish()
+    return (_png_header(strip.rect[2], strip.rect[3], alpha)
+            + _png_chunk(b"IDAT", data) + _png_chunk(b"IEND", b""))
+
+
+# ==========================================================
+#  Writers
+# ==========================================================
+# Each takes a binary file and receives, in order, begin_page(w, h), the
+# page's strips top down through add(strip), end_page(), ... and close().
+class PngWriter:
+    """One-page PNG, one IDAT chunk per strip"""
+    pages = False
+
+    def __init__(self, f, alpha=False):
+        self.f = f
+        self.alpha = alpha
+        self._join = None
+
+    def begin_page(self, width, height):
+        self.f.write(_png_header(width, height, self.alpha))
+        self._join = ZlibJoin()
+
+    def add(self, strip):
+        self.f.write(_png_chunk(b"IDAT", self._join.add(strip)))
+
+    def end_page(self):
+        self.f.write(_png_chunk(b"IDAT", self._join.finish()))
+
+    def close(self):
+        self.f.write(_png_chunk(b"IEND", b""))
+
+
+class SvgWriter:
+    """One-page SVG of PNG strips embedded as data URLs"""
+    pages = False
+
+    def __init__(self, f, alpha=False):
+        self.f = f
+        self.alpha = alpha
+
+    def begin_page(self, width, height):
+        self.f.write(
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}">\n'.encode())
+
+    def add(self, strip):
+        x, y, width, height = strip.rect
+        self.f.write(f'<image x="{x}" y="{y}" width="{width}" height="{height}" '
+                     f'href="data:image/png;base64,'.encode())
+        self.f.write(base64.b64encode(png_bytes(strip, self.alpha)))
+        self.f.write(b'"/>\n')
+
+    def end_page(self):
+        pass
+
+    def close(self):
+        self.f.write(b"</svg>\n")
+
+
+class PdfWriter:
+    """Multi-page PDF, one opaque RGB image per page, written as it arrives
+
+    Objects are streamed out in order; only their offsets are kept for the
+    cross-reference table at the end. ``dpi`` sets the printed size of a
+    page's pixels.
+    """
+    pages = True
+    _CATALOG, _PAGES = 1, 2
+
+    def __init__(self, f, alpha=False, dpi=300.0):
+        if alpha:
+            raise ValueError("PDF export is always opaque")
+        self.f = f
+        self.dpi = dpi
+        self._offsets = {}
+        self._next = 3
+        self._page_ids = []
+        self._page = None
+        self._join = None
+        self._start = 0
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, body, number=None):
+        if number is None:
+            number = self._next
+            self._next += 1
+        self._offsets[number] = self.f.tell()
+        self.f.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+        return number
+
+    def begin_page(self, width, height):
+        self._page = (width, height, self._next, self._next + 1)    # Image and its length
+        self._next += 2
+        self._join = ZlibJoin()
+        self._offsets[self._page[2]] = self.f.tell()
+        self.f.write(
+            f"{self._page[2]} 0 obj\n<< /Type /XObject /Subtype /Image /Width {width} "
+            f"/Height {height} /ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /FlateDecode "
+            f"/DecodeParms << /Predictor 15 /Colors 3 /BitsPerComponent 8 /Columns {width} >> "
+            f"/Length {self._page[3]} 0 R >>\nstream\n".encode())
+        self._start = self.f.tell()
+
+    def add(self, strip):
+        self.f.write(self._join.add(strip))
+
+    def end_page(self):
+        width, height, image, length = self._page
+        self.f.write(self._join.finish())
+        size = self.f.tell() - self._start
+        self.f.write(b"\nendstream\nendobj\n")
+        self._object(str(size).encode(), length)
+        points_w, points_h = width * 72.0 / self.dpi, height * 72.0 / self.dpi
+        content = f"q {points_w:.4f} 0 0 {points_h:.4f} 0 0 cm /Im Do Q".encode()
+        contents = self._object(f"<< /Length {len(content)} >>\nstream\n".encode()
+                                + content + b"\nendstream")
+        self._page_ids.append(self._object(
+            f"<< /Type /Page /Parent {self._PAGES} 0 R /MediaBox [0 0 {points_w:.4f} "
+            f"{points_h:.4f}] /Resources << /XObject << /Im {image} 0 R >> >> "
+            f"/Contents {contents} 0 R >>".encode()))
+
+    def close(self):
+        kids = " ".join(f"{page} 0 R" for page in self._page_ids)
+        self._object(f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode(),
+                     self._PAGES)
+        self._object(f"<< /Type /Catalog /Pages {self._PAGES} 0 R >>".encode(), self._CATALOG)
+        xref = self.f.tell()
+        count = self._next
+        lines = [f"xref\n0 {count}\n", "0000000000 65535 f \n"]
+        lines += [f"{self._offsets[n]:010d} 00000 n \n" for n in range(1, count)]
+        lines.append(f"trailer\n<< /Size {count} /Root {self._CATALOG} 0 R >>\n"
+                     f"startxref\n{xref}\n%%EOF\n")
+        self.f.write("".join(lines).encode())
+
+
+WRITERS = {"png": PngWriter, "pdf": PdfWriter, "svg": SvgWriter}
@@ -0,0 +1,93 @@
+"""Small helpers for axis-aligned rectangles in world coordinates.
+
+Rectangles are plain ``(x0, y0, x1, y1)`` tuples with ``x0 <= x1`` and
+``y0 <= y1`` so they can be shared freely between the model, the spatial
+structures and the renderers without pulling in Qt.
+"""
+import numpy as np
+
+EMPTY_RECT = None
+CHUNK_PAIRS = 1 << 20   # Edge/point pairs expanded at once by the polygon tests
+
+
+def rect_from_points(points, pad=0.0):
+    """Bounding rectangle of an iterable of (x, y) pairs, grown by ``pad``."""
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    if not xs:
+        return EMPTY_RECT
+    return (min(xs) - pad, min(ys) - pad, max(xs) + pad, max(ys) + pad)
+
+
+def rect_union(a, b):
+    """Smallest rectangle containing both ``a`` and ``b`` (either may be None)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def rect_intersects(a, b):
+    """True if the two rectangles overlap or touch."""
+    return a[0] <= b[2] and b[0] <= a[2] and a[1] <= b[3] and b[1] <= a[3]
+
+
+def rect_contains_point(rect, x, y):
+    """True if (x, y) lies inside ``rect`` (edges included)."""
+    return rect[0] <= x <= rect[2] and rect[1] <= y <= rect[3]
+
+
+def rect_inflate(rect, amount):
+    """Grow ``rect`` by ``amount`` on every side."""
+    return (rect[0] - amount, rect[1] - amount, rect[2] + amount, rect[3] + amount)
+
+
+def polyline_distance(xs, ys, x, y):
+    """Distance from (x, y) to the nearest point of the polyline (xs, ys)."""
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    if len(xs) == 1:
+        return float(np.hypot(xs[0] - x, ys[0] - y))
+    ax, ay = xs[:-1], ys[:-1]
+    dx, dy = xs[1:] - ax, ys[1:] - ay
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length_sq > 0, ((x - ax) * dx + (y - ay) * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    return float(np.sqrt(np.min((ax + t * dx - x) ** 2 + (ay + t * dy - y) ** 2)))
+
+
+def points_in_polygon(xs, ys, polygon):
+    """Even-odd test of every point (xs[i], ys[i]) against a closed polygon.
+
+    Points are sorted by y once, so each edge is only paired with the
+    points in its own y band; the pairs for all edges are expanded at once,
+    at most ``CHUNK_PAIRS`` at a time.
+    """
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    poly = np.asarray(polygon, dtype=np.float64)
+    xi, yi = poly[:, 0], poly[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    sloped = np.flatnonzero(yi != yj)
+    xi, yi, xj, yj = xi[sloped], yi[sloped], xj[sloped], yj[sloped]
+    order = np.argsort(ys)
+    sorted_y = ys[order]
+    # Edge crosses the horizontal through y when min(yi, yj) <= y < max(yi, yj)
+    lo = np.searchsorted(sorted_y, np.minimum(yi, yj), side="left")
+    counts = np.searchsorted(sorted_y, np.maximum(yi, yj), side="left") - lo
+    crossings = np.zeros(len(xs), dtype=np.int64)
+    ends = np.cumsum(counts)
+    first = 0
+    while first < len(counts):
+        last = max(first + 1, int(np.searchsorted(ends, ends[first] - counts[first] + CHUNK_PAIRS,
+                                                  side="right")))
+        chunk = counts[first:last]
+        edge = np.repeat(np.arange(first, last), chunk)
+        point = order[np.arange(int(chunk.sum())) +
+                      np.repeat(lo[first:last] - (np.cumsum(chunk) - chunk), chunk)]
+        x_cross = (xj[edge] - xi[edge]) * (ys[point] - yi[edge]) / (yj[edge] - yi[edge]) + xi[edge]
+        crossings += np.bincount(point[xs[point] < x_cross], minlength=len(xs))
+        first = last
+    return crossings % 2 == 1
@@ -0,0 +1,596 @@
+"""Undo/redo as a log of invertible operations.
+
+Every edit is recorded as an operation that can apply and revert itself:
+adding strokes (reverted by removing them), erasing (reverted by restoring
+them; erased points stay in the store meanwhile), transforming (reverted
+with the inverse matrix, so coordinates round-trip to float32 precision)
+and restyling (reverted from the saved per-stroke styles). Placing and
+removing images keep the placements, to put them back under the same ids.
+One user action is one *step*, a group of operations.
+
+Undoing or redoing a step touches only what that step changed, never the
+whole board. To keep long jumps cheap too, each completed block of
+``checkpoint_every`` steps is compacted into a ``Delta``: net liveness
+flips, composed transforms and first/last styles per stroke. Crossing a
+whole block applies its delta, so the cost is the number of distinct
+strokes the block touched rather than the number of steps in it.
+
+History memory is capped at ``limit`` bytes, counting the operations and
+the points that erased strokes keep alive. Past the cap the oldest steps
+are forgotten (purging strokes only they could bring back) or, with a
+spill file, pickled to disk together with their erased points and read
+back if undo ever reaches them.
+"""
+import os
+import pickle
+import tempfile
+from contextlib import contextmanager
+
+import numpy as np
+
+from core.board import DEFAULT_COLOR, DEFAULT_WIDTH
+
+DEFAULT_LIMIT = int(os.environ.get("WHITEBOARD_HISTORY_MB", "64")) * 2**20
+DEFAULT_CHECKPOINT_EVERY = 64
+POINT_BYTES = 16        # x, y, pressure and time as float32
+IMAGE_BYTES = 160       # One ImagePlacement with its asset id and rect
+
+
+def _id_array(ids):
+    return np.asarray([int(i) for i in ids], dtype=np.int64)
+
+
+def _matrix3(matrix):
+    """3x3 float64 form of a 2x3 affine ((a, b, tx), (c, d, ty))."""
+    m = np.eye(3)
+    m[:2] = np.asarray(matrix, dtype=np.float64)
+    return m
+
+
+def _affine(m):
+    return tuple(tuple(float(v) for v in row) for row in m[:2])
+
+
+# ==========================================================
+#  Operations
+# ==========================================================
+class AddStrokes:
+    """Strokes that were added; reverted by removing them"""
+    __slots__ = ("ids",)
+    liveness = (False, True)    # Alive before, alive after
+
+    def __init__(self, ids):
+        self.ids = _id_array(ids)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes
+
+    def apply(self, board):
+        for stroke_id in self.ids.tolist():
+            board.restore_stroke(stroke_id)
+
+    def revert(self, board):
+        for stroke_id in reversed(self.ids.tolist()):
+            board.remove_stroke(stroke_id)
+
+
+class EraseStrokes:
+    """Strokes that were removed; reverted by restoring them
+
+    While the step is in memory the erased points stay in the store. When
+    it is spilled they move into ``stash`` and the store purges them.
+    """
+    __slots__ = ("ids", "points", "stash")
+    liveness = (True, False)
+
+    def __init__(self, ids, points=0):
+        self.ids = _id_array(ids)
+        self.points = points        # Point count kept alive for undo
+        self.stash = None
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.points * POINT_BYTES
+
+    def apply(self, board):
+        for stroke_id in self.ids.tolist():
+            board.remove_stroke(stroke_id)
+
+    def revert(self, board):
+        for stroke_id in self.ids.tolist():
+            board.restore_stroke(stroke_id)
+
+    def spill(self, store):
+        """Move the erased points out of the store, ready for pickling."""
+        self.stash = []
+        for stroke_id in self.ids.tolist():
+            stroke = store[stroke_id]
+            self.stash.append((np.array(stroke.x), np.array(stroke.y),
+                               np.array(stroke.pressure), np.array(stroke.time)))
+            store.purge(stroke_id)
+
+    def unspill(self, store):
+        for stroke_id, (x, y, pressure, time) in zip(self.ids.tolist(), self.stash):
+            store.set_points(stroke_id, x, y, pressure, time)
+        self.stash = None
+
+
+class TransformStrokes:
+    """An affine transform of strokes; reverted with its inverse"""
+    __slots__ = ("ids", "matrix")
+    liveness = None
+
+    def __init__(self, ids, matrix):
+        self.ids = _id_array(ids)
+        self.matrix = _matrix3(matrix)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.matrix.nbytes
+
+    def apply(self, board):
+        board.transform_strokes(self.ids.tolist(), _affine(self.matrix))
+
+    def revert(self, board):
+        board.transform_strokes(self.ids.tolist(), _affine(np.linalg.inv(self.matrix)))
+
+
+class RestyleStrokes:
+    """A width and/or color change; reverted from the saved old styles"""
+    __slots__ = ("ids", "old_widths", "old_colors", "width", "color")
+    liveness = None
+
+    def __init__(self, ids, old_widths, old_colors, width=None, color=None):
+        self.ids = _id_array(ids)
+        self.old_widths = np.asarray(old_widths, dtype=np.float32)
+        self.old_colors = np.asarray(old_colors, dtype=np.uint32)
+        self.width = width
+        self.color = color
+
+    @classmethod
+    def capture(cls, store, ids, width=None, color=None):
+        """Record the current styles of ``ids`` before restyling them."""
+        ids = _id_array(ids)
+        rows = store.table[ids]
+        return cls(ids, rows["width"], rows["color"], width, color)
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes + self.old_widths.nbytes + self.old_colors.nbytes
+
+    def new_styles(self):
+        """Per-stroke (widths, colors) after the restyle."""
+        widths = self.old_widths if self.width is None else np.full_like(self.old_widths, self.width)
+        colors = self.old_colors if self.color is None else np.full_like(self.old_colors, self.color)
+        return widths, colors
+
+    def apply(self, board):
+        board.restyle_strokes(self.ids.tolist(), self.width, self.color)
+
+    def revert(self, board):
+        _restyle_each(board, self.ids, self.old_widths, self.old_colors)
+
+
+class AddImages:
+    """Images that were placed; reverted by taking them off the board"""
+    __slots__ = ("images",)
+    liveness = None
+    image_liveness = (False, True)      # Placed before, placed after
+
+    def __init__(self, images):
+        self.images = list(images)      # ImagePlacement
+
+    @property
+    def nbytes(self):
+        return IMAGE_BYTES * len(self.images)
+
+    def apply(self, board):
+        for image in self.images:
+            board.restore_image(image)
+
+    def revert(self, board):
+        for image in reversed(self.images):
+            board.remove_image(image.id)
+
+
+class RemoveImages(AddImages):
+    """Images that were taken off the board; reverted by putting them back"""
+    __slots__ = ()
+    image_liveness = (True, False)
+
+    def apply(self, board):
+        AddImages.revert(self, board)
+
+    def revert(self, board):
+        AddImages.apply(self, board)
+
+
+def _restyle_each(board, ids, widths, colors):
+    """Restyle strokes to per-stroke styles, one board call per distinct style."""
+    groups = {}
+    for stroke_id, width, color in zip(ids.tolist(), widths.tolist(), colors.tolist()):
+        groups.setdefault((width, color), []).append(stroke_id)
+    for (width, color), group in groups.items():
+        board.restyle_strokes(group, width, color)
+
+
+# ==========================================================
+#  Checkpoints
+# ==========================================================
+class Delta:
+    """Net effect of a block of steps, applied or reverted in one go"""
+
+    def __init__(self):
+        self.before = {}        # Stroke id -> alive before the block
+        self.after = {}         # Stroke id -> alive after the block
+        self.matrices = {}      # Stroke id -> composed 3x3 transform
+        self.styles = {}        # Stroke id -> (old width, old color, new width, new color)
+        self.images = {}        # Image id -> [placement, placed before, placed after]
+
+    @classmethod
+    def compact(cls, steps):
+        delta = cls()
+        for step in steps:
+            for op in step:
+                delta._fold(op)
+        # Strokes that ended the block as they started need no flip
+        for stroke_id in [i for i in delta.after if delta.after[i] == delta.before[i]]:
+            del delta.before[stroke_id], delta.after[stroke_id]
+        for image_id in [i for i, (_, before, after) in delta.images.items() if before == after]:
+            del delta.images[image_id]
+        return delta
+
+    def _fold(self, op):
+        if isinstance(op, AddImages):
+            before, after = op.image_liveness
+            for image in op.images:
+                self.images.setdefault(image.id, [image, before, after])[2] = after
+        elif op.liveness is not None:
+            before, after = op.liveness
+            for stroke_id in op.ids.tolist():
+                self.before.setdefault(stroke_id, before)
+                self.after[stroke_id] = after
+        elif isinstance(op, TransformStrokes):
+            for stroke_id in op.ids.tolist():
+                previous = self.matrices.get(stroke_id)
+                self.matrices[stroke_id] = op.matrix if previous is None else op.matrix @ previous
+        else:
+            widths, colors = op.new_styles()
+            for i, stroke_id in enumerate(op.ids.tolist()):
+                old = self.styles.get(stroke_id)
+                first = (old[0], old[1]) if old else (op.old_widths[i], op.old_colors[i])
+                self.styles[stroke_id] = first + (widths[i], colors[i])
+
+    @property
+    def nbytes(self):
+        return (64 * (len(self.after) + len(self.matrices) + len(self.styles)) +
+                IMAGE_BYTES * len(self.images))
+
+    def apply(self, board):
+        self._transform(board, lambda m: m)
+        self._restyle(board, 2)
+        for stroke_id, alive in self.after.items():
+            if alive:
+                board.restore_stroke(stroke_id)
+            else:
+                board.remove_stroke(stroke_id)
+        self._place(board, 2)
+
+    def revert(self, board):
+        self._place(board, 1)
+        for stroke_id, alive in self.before.items():
+            if alive:
+                board.restore_stroke(stroke_id)
+            else:
+                board.remove_stroke(stroke_id)
+        self._restyle(board, 0)
+        self._transform(board, np.linalg.inv)
+
+    def _place(self, board, column):
+        for entry in self.images.values():
+            if entry[column]:
+                board.restore_image(entry[0])
+            else:
+                board.remove_image(entry[0].id)
+
+    def _transform(self, board, prepare):
+        groups = {}
+        for stroke_id, matrix in self.matrices.items():
+            groups.setdefault(_affine(prepare(matrix)), []).append(stroke_id)
+        for matrix, ids in groups.items():
+            board.transform_strokes(ids, matrix)
+
+    def _restyle(self, board, column):
+        if self.styles:
+            ids = _id_array(self.styles)
+            styles = list(self.styles.values())
+            _restyle_each(board, ids,
+                          np.array([s[column] for s in styles], dtype=np.float32),
+                          np.array([s[column + 1] for s in styles], dtype=np.uint32))
+
+
+class _Spilled:
+    """Placeholder for a step pickled to the spill file"""
+    __slots__ = ("offset", "length")
+
+    def __init__(self, offset, length):
+        self.offset = offset
+        self.length = length
+
+
+# ==========================================================
+#  History
+# ==========================================================
+class History:
+    """Undo/redo log for one board
+
+    Edits made through ``add_stroke``, ``erase``, ``split``, ``transform``,
+    ``restyle``, ``add_image`` and ``remove_images`` are applied to the
+    board and recorded; ``begin_group`` / ``end_group`` (or ``group``)
+    fold several into one step. ``spill`` is a file path, or True for an
+    anonymous temporary file.
+    """
+
+    def __init__(self, board, limit=DEFAULT_LIMIT,
+                 checkpoint_every=DEFAULT_CHECKPOINT_EVERY, spill=None):
+        self.board = board
+        self.limit = limit
+        self.checkpoint_every = checkpoint_every
+        self.spill = spill
+        self.nbytes = 0
+        self._steps = []            # Lists of ops, or _Spilled
+        self._sizes = []            # Bytes counted for each in-memory step
+        self._base = 0              # Absolute number of _steps[0]
+        self._cursor = 0            # Absolute number of steps currently done
+        self._deltas = {}           # Block number -> Delta
+        self._group = None
+        self._spill_file = None
+
+    @property
+    def can_undo(self):
+        return self._cursor > self._base
+
+    @property
+    def can_redo(self):
+        return self._cursor < self._base + len(self._steps)
+
+    @property
+    def undo_depth(self):
+        return self._cursor - self._base
+
+    # ==========================================================
+    #  Recording
+    # ==========================================================
+    def add_stroke(self, points, width=DEFAULT_WIDTH, color=DEFAULT_COLOR,
+                   pressure=None, time=None):
+        stroke_id = self.board.add_stroke(points, width, color, pressure, time)
+        self.record(AddStrokes([stroke_id]))
+        return stroke_id
+
+    def erase(self, ids):
+        """Remove the live strokes among ``ids``."""
+        ids = [int(i) for i in ids if self.board.stroke(int(i)) is not None]
+        if ids:
+            points = int(self.board.store.table["length"][ids].sum())
+            for stroke_id in ids:
+                self.board.remove_stroke(stroke_id)
+            self.record(EraseStrokes(ids, points))
+
+    def split(self, cuts):
+        """Replace strokes by the pieces of them listed in ``cuts``.
+
+        ``cuts`` holds (stroke_id, [(start, end), ...]) pairs as returned by
+        ``Board.split_along``; each piece keeps its stroke's style and
+        samples. The pieces are new strokes, so they paint above the rest.
+        """
+        if not cuts:
+            return
+        with self.group():
+            for stroke_id, pieces in cuts:
+                stroke = self.board.store[stroke_id]
+                x, y, pressure, time = stroke.x, stroke.y, stroke.pressure, stroke.time
+                for start, end in pieces:
+                    self.add_stroke(np.column_stack((x[start:end], y[start:end])),
+                                    stroke.width, stroke.color,
+                                    pressure[start:end], time[start:end])
+            self.erase([stroke_id for stroke_id, _ in cuts])
+
+    def transform(self, ids, matrix):
+        ids = list(ids)
+        if ids:
+            self.board.transform_strokes(ids, matrix)
+            self.record(TransformStrokes(ids, matrix))
+
+    def restyle(self, ids, width=None, color=None):
+        ids = list(ids)
+        if ids:
+            op = RestyleStrokes.capture(self.board.store, ids, width, color)
+            self.board.restyle_strokes(ids, width, color)
+            self.record(op)
+
+    def add_image(self, asset, rect, page=0):
+        image_id = self.board.add_image(asset, rect, page)
+        self.record(AddImages([self.board.image(image_id)]))
+        return image_id
+
+    def remove_images(self, ids):
+        """Take the placed images among ``ids`` off the board."""
+        images = [self.board.remove_image(int(i)) for i in ids]
+        images = [image for image in images if image is not None]
+        if images:
+            self.record(RemoveImages(images))
+
+    def record(self, op):
+        """Log an operation that has already been applied to the board."""
+        if self._group is not None:
+            self._group.append(op)
+        else:
+            self._push([op])
+
+    def begin_group(self):
+        if self._group is None:
+            self._group = []
+
+    def end_group(self):
+        ops, self._group = self._group, None
+        if ops:
+            self._push(ops)
+
+    @contextmanager
+    def group(self):
+        """Record everything done inside the block as one step."""
+        if self._group is not None:
+            yield
+            return
+        self.begin_group()
+        try:
+            yield
+        finally:
+            self.end_group()
+
+    # ==========================================================
+    #  Undo & Redo
+    # ==========================================================
+    def undo(self, steps=1):
+        """Undo up to ``steps`` steps; returns how many were undone."""
+        self.end_group()
+        done = 0
+        every = self.checkpoint_every
+        while done < steps and self.can_undo:
+            block = self._cursor // every - 1
+            if (self._cursor % every == 0 and steps - done >= every and
+                    block in self._deltas and block * every >= self._base):
+                self._deltas[block].revert(self.board)
+                self._cursor -= every
+                done += every
+                continue
+            for op in reversed(self._step(self._cursor - 1)):
+                op.revert(self.board)
+            self._cursor -= 1
+            done += 1
+        return done
+
+    def redo(self, steps=1):
+        """Redo up to ``steps`` undone steps; returns how many were redone."""
+        self.end_group()
+        done = 0
+        every = self.checkpoint_every
+        while done < steps and self.can_redo:
+            block = self._cursor // every
+            if self._cursor % every == 0 and steps - done >= every and block in self._deltas:
+                self._deltas[block].apply(self.board)
+                self._cursor += every
+                done += every
+                continue
+            for op in self._step(self._cursor):
+                op.apply(self.board)
+            self._cursor += 1
+            done += 1
+        return done
+
+    def clear(self):
+        """Forget all history (e.g. after loading a new board)."""
+        self._group = None
+        self._truncate()
+        while self._steps:
+            self._forget_oldest()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    # ==========================================================
+    #  Internals
+    # ==========================================================
+    def _push(self, ops):
+        self._truncate()
+        self._steps.append(ops)
+        size = sum(op.nbytes for op in ops)
+        self._sizes.append(size)
+        self.nbytes += size
+        self._cursor += 1
+        every = self.checkpoint_every
+        if self._cursor % every == 0:
+            block = self._cursor // every - 1
+            start = block * every - self._base
+            if start >= 0 and not any(isinstance(s, _Spilled)
+                                      for s in self._steps[start:start + every]):
+                delta = self._deltas[block] = Delta.compact(self._steps[start:start + every])
+                self.nbytes += delta.nbytes
+        self._enforce_limit()
+
+    def _step(self, number):
+        """Ops of absolute step ``number``, reading it back from disk if spilled."""
+        i = number - self._base
+        step = self._steps[i]
+        if isinstance(step, _Spilled):
+            self._spill_file.seek(step.offset)
+            step = pickle.loads(self._spill_file.read(step.length))
+            for op in step:
+                if isinstance(op, EraseStrokes):
+                    op.unspill(self.board.store)
+            self._steps[i] = step
+            self._sizes[i] = sum(op.nbytes for op in step)
+            self.nbytes += self._sizes[i]
+        return step
+
+    def _truncate(self):
+        """Drop the redo branch; strokes only it could bring back are purged."""
+        end = self._cursor - self._base
+        for step in self._steps[end:]:
+            for op in step:
+                if isinstance(op, AddStrokes):
+                    self._purge(op.ids)
+        self.nbytes -= sum(self._sizes[end:])
+        del self._steps[end:], self._sizes[end:]
+        for block in [b for b in self._deltas if (b + 1) * self.checkpoint_every > self._cursor]:
+            self.nbytes -= self._deltas.pop(block).nbytes
+
+    def _enforce_limit(self):
+        # The newest step always stays in memory
+        first = 0
+        while self.nbytes > self.limit and first < self._cursor - self._base - 1:
+            if self.spill:
+                if not isinstance(self._steps[first], _Spilled):
+                    self._spill_step(first)
+                first += 1
+            else:
+                self._forget_oldest()
+
+    def _spill_step(self, i):
+        if self._spill_file is None:
+            self._spill_file = (tempfile.TemporaryFile() if self.spill is True
+                                else open(self.spill, "w+b"))
+        step = self._steps[i]
+        for op in step:
+            if isinstance(op, EraseStrokes):
+                op.spill(self.board.store)
+        data = pickle.dumps(step, pickle.HIGHEST_PROTOCOL)
+        self._spill_file.seek(0, os.SEEK_END)
+        self._steps[i] = _Spilled(self._spill_file.tell(), len(data))
+        self._spill_file.write(data)
+        self.nbytes -= self._sizes[i]
+        self._sizes[i] = 0
+        self._drop_delta(self._base + i)
+
+    def _forget_oldest(self):
+        step = self._steps.pop(0)
+        self.nbytes -= self._sizes.pop(0)
+        if not isinstance(step, _Spilled):
+            for op in step:
+                if isinstance(op, EraseStrokes):
+                    self._purge(op.ids)
+        self._drop_delta(self._base)
+        self._base += 1
+        self._cursor = max(self._cursor, self._base)
+
+    def _drop_delta(self, number):
+        delta = self._deltas.pop(number // self.checkpoint_every, None)
+        if delta is not None:
+            self.nbytes -= delta.nbytes
+
+    def _purge(self, ids):
+        store = self.board.store
+        for stroke_id in ids.tolist():
+            if self.board.stroke(stroke_id) is None:
+                store.purge(stroke_id)
@@ -0,0 +1,196 @@
+"""Streaming simplification and smoothing of raw pen input.
+
+Samples go through three stages as they arrive, each doing a bounded
+amount of work per event:
+
+1. Radial decimation drops samples closer than the tolerance to the last
+   kept one (tablets report many near-duplicates at 200+ Hz).
+2. A sliding-window Douglas-Peucker step keeps a run of candidates since
+   the last vertex and only commits a new vertex once the chord from that
+   vertex to the newest sample no longer covers the run within tolerance.
+   The run is capped at ``window`` samples, so the check is O(window).
+3. Committed vertices are joined with centripetal Catmull-Rom curves, one
+   segment behind the newest vertex. Each segment is subdivided just
+   enough for the curve to stay within tolerance of its chords (capped),
+   so straight runs cost a single point.
+
+Tolerances are expressed in screen pixels and converted to world units
+with the zoom at pen-down, so a stroke drawn zoomed in keeps proportionally
+more detail.
+
+For the live preview, ``predict`` extrapolates the newest raw samples a
+short time ahead so the drawn ink can keep up with the pen tip.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+from core.stroke_store import StrokeBuilder
+
+DEFAULT_TOLERANCE = 0.75    # Screen pixels
+DEFAULT_WINDOW = 32
+MAX_SUBDIVISIONS = 8
+PREDICTION_SAMPLES = 4      # Raw samples the velocity estimate looks back over
+MAX_PREDICTION = 24.0       # Screen pixels
+
+
+class InkPipeline:
+    """Turns raw (x, y, pressure, time) samples into a smoothed stroke
+
+    ``tolerance`` is either a number of screen pixels or a callable taking
+    the zoom factor and returning one, for per-zoom tuning.
+    """
+
+    def __init__(self, tolerance=DEFAULT_TOLERANCE, window=DEFAULT_WINDOW):
+        self.tolerance = tolerance
+        self.window = window
+        self.output = None
+        self._world_tolerance = 0.0
+        self._world_pixel = 1.0
+        self._vertices = []         # Committed (x, y, pressure, time) vertices
+        self._run = []              # Candidates since the last vertex
+        self._last_kept = None
+        self._latest = None         # Newest raw sample, so pen-up lands exactly
+        self._recent = deque(maxlen=PREDICTION_SAMPLES)
+
+    # ==========================================================
+    #  Stroke Lifecycle
+    # ==========================================================
+    def begin(self, zoom=1.0):
+        """Start a new stroke drawn at ``zoom`` screen pixels per world unit."""
+        pixels = self.tolerance(zoom) if callable(self.tolerance) else self.tolerance
+        self._world_tolerance = pixels / zoom
+        self._world_pixel = 1.0 / zoom
+        self.output = StrokeBuilder()
+        self._vertices = []
+        self._run = []
+        self._last_kept = None
+        self._latest = None
+        self._recent.clear()
+
+    def add(self, x, y, pressure=1.0, time=0.0):
+        """Feed one raw sample; returns how many smoothed points were emitted."""
+        sample = (x, y, pressure, time)
+        self._latest = sample
+        self._recent.append(sample)
+        if not self._vertices:
+            self._commit(sample)
+            self._last_kept = sample
+            return len(self.output)
+
+        # Stage 1: radial decimation
+        last = self._last_kept
+        if math.hypot(x - last[0], y - last[1]) < self._world_tolerance:
+            return 0
+        self._last_kept = sample
+
+        # Stage 2: sliding-window Douglas-Peucker
+        emitted_before = len(self.output)
+        if self._run and (len(self._run) >= self.window or
+                          self._run_deviation(sample) > self._world_tolerance):
+            self._commit(self._run[-1])
+            self._run = []
+        self._run.append(sample)
+        return len(self.output) - emitted_before
+
+    def finish(self):
+        """Flush the tail and return the smoothed StrokeBuilder."""
+        if self._latest is not None and self._latest is not self._last_kept:
+            self._run.append(self._latest)
+        if self._run:
+            self._commit(self._run[-1])
+            self._run = []
+        v = self._vertices
+        if len(v) >= 2:
+            # Emit the last segment using a duplicated end point as lookahead
+            self._emit_segment(v[-3] if len(v) >= 3 else v[-2], v[-2], v[-1], v[-1])
+        output, self.output = self.output, None
+        return output
+
+    def tail(self):
+        """Raw samples not yet covered by smoothed output, for live preview."""
+        pending = self._vertices[-2:] if len(self._vertices) >= 2 else self._vertices[-1:]
+        pending = pending + self._run
+        if self._latest is not None and pending and self._latest is not pending[-1]:
+            pending.append(self._latest)     # Decimated, but it is where the pen is
+        return pending
+
+    def predict(self, horizon):
+        """Points the pen is expected to reach ``horizon`` seconds from now.
+
+        Linear extrapolation of the newest raw samples, clamped to
+        ``MAX_PREDICTION`` screen pixels. Predictions are for display only
+        and never enter the stroke.
+        """
+        if len(self._recent) < 2:
+            return []
+        x0, y0, _, t0 = self._recent[0]
+        x1, y1, _, t1 = self._recent[-1]
+        if t1 <= t0:
+            return []
+        dx = (x1 - x0) / (t1 - t0) * horizon
+        dy = (y1 - y0) / (t1 - t0) * horizon
+        length = math.hypot(dx, dy)
+        limit = MAX_PREDICTION * self._world_pixel
+        if length > limit:
+            dx, dy = dx * limit / length, dy * limit / length
+        return [(x1 + dx, y1 + dy)]
+
+    # ==========================================================
+    #  Internals
+    # ==========================================================
+    def _run_deviation(self, sample):
+        """Largest distance from the pending run to the chord vertex -> sample."""
+        ax, ay = self._vertices[-1][0], self._vertices[-1][1]
+        run = np.asarray(self._run, dtype=np.float64)
+        dx, dy = sample[0] - ax, sample[1] - ay
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return float(np.hypot(run[:, 0] - ax, run[:, 1] - ay).max())
+        return float(np.abs((run[:, 0] - ax) * dy - (run[:, 1] - ay) * dx).max() / length)
+
+    def _commit(self, vertex):
+        v = self._vertices
+        v.append(vertex)
+        if len(v) == 1:
+            self.output.append(*vertex)
+        elif len(v) >= 3:
+            # The segment v[-3] -> v[-2] now has its lookahead point
+            self._emit_segment(v[-4] if len(v) >= 4 else v[-3], v[-3], v[-2], v[-1])
+
+    def _emit_segment(self, p0, p1, p2, p3):
+        """Append centripetal Catmull-Rom points from p1 (exclusive) to p2."""
+        # Chord error shrinks with the square of the subdivision count
+        mx, my = _catmull_rom(p0, p1, p2, p3, 0.5)
+        sag = math.hypot(mx - (p1[0] + p2[0]) / 2, my - (p1[1] + p2[1]) / 2)
+        ratio = sag / self._world_tolerance if self._world_tolerance else MAX_SUBDIVISIONS ** 2
+        steps = max(1, min(MAX_SUBDIVISIONS, math.ceil(math.sqrt(ratio))))
+        for i in range(1, steps + 1):
+            t = i / steps
+            x, y = _catmull_rom(p0, p1, p2, p3, t)
+            self.output.append(x, y,
+                               p1[2] + (p2[2] - p1[2]) * t,
+                               p1[3] + (p2[3] - p1[3]) * t)
+
+
+def _catmull_rom(p0, p1, p2, p3, t):
+    """Point at ``t`` in [0, 1] between p1 and p2 on a centripetal Catmull-Rom spline."""
+    def knot(a, b):
+        return max(math.hypot(b[0] - a[0], b[1] - a[1]) ** 0.5, 1e-9)
+
+    t1 = knot(p0, p1)
+    t2 = t1 + knot(p1, p2)
+    t3 = t2 + knot(p2, p3)
+    u = t1 + (t2 - t1) * t
+
+    def lerp(a, b, ta, tb):
+        w = (u - ta) / (tb - ta)
+        return (a[0] + (b[0] - a[0]) * w, a[1] + (b[1] - a[1]) * w)
+
+    a1 = lerp(p0, p1, 0.0, t1)
+    a2 = lerp(p1, p2, t1, t2)
+    a3 = lerp(p2, p3, t2, t3)
+    b1 = lerp(a1, a2, 0.0, t2)
+    b2 = lerp(a2, a3, t1, t3)
+    return lerp(b1, b2, t1, t2)
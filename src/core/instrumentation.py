@@ -0,0 +1,139 @@
+"""Hot-path timers for finding where frame time goes.
+
+Code on a hot path wraps its work in ``instruments.span(name)``. While
+instrumentation is disabled (the default) ``span`` hands back a shared
+do-nothing context manager, so the cost is one attribute test and no
+allocation. Once enabled, each span adds its duration to a rolling
+histogram named after it (summarized as p50/p95/p99, see ``summary``) and,
+if tracing, to a list of Chrome trace events that ``export_trace`` writes
+out as JSON for chrome://tracing or Perfetto.
+
+Spans may be recorded from any thread; trace events carry the thread id so
+worker activity shows up on its own track.
+
+Set ``WHITEBOARD_INSTRUMENT=1`` to enable at startup, or ``=trace`` to
+record trace events as well.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from core.latency import summarize
+
+DEFAULT_CAPACITY = 4096     # Samples kept per timer
+MAX_TRACE_EVENTS = 1_000_000
+
+# Names used by the app, in display order
+INPUT = "input"
+CACHE_LOOKUP = "cache lookup"
+TILE_RENDER = "tile render"
+COMPOSITE = "composite"
+WET_INK = "wet ink"
+
+
+class _Disabled:
+    """Stand-in span while instrumentation is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_DISABLED = _Disabled()
+
+
+class _Span:
+    __slots__ = ("owner", "name", "start")
+
+    def __init__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.owner.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class Instrumentation:
+    """Named timers with rolling histograms and an optional event trace"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.enabled = False
+        self.tracing = False
+        self.timers = {}            # Name -> deque of durations in ms
+        self.events = []            # (name, start s, end s, thread id) while tracing
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self, trace=False):
+        self.enabled = True
+        self.tracing = trace
+
+    def disable(self):
+        self.enabled = False
+        self.tracing = False
+
+    def reset(self):
+        """Forget every sample and trace event."""
+        with self._lock:
+            self.timers = {}
+            self.events = []
+            self._origin = time.perf_counter()
+
+    # ==========================================================
+    #  Recording
+    # ==========================================================
+    def span(self, name):
+        """Context manager timing its block under ``name``."""
+        if not self.enabled:
+            return _DISABLED
+        return _Span(self, name)
+
+    def record(self, name, start, end):
+        """Add a span measured elsewhere (``perf_counter`` seconds)."""
+        samples = self.timers.get(name)
+        if samples is None:
+            with self._lock:
+                samples = self.timers.setdefault(name, deque(maxlen=self.capacity))
+        samples.append((end - start) * 1000.0)
+        if self.tracing and len(self.events) < MAX_TRACE_EVENTS:
+            self.events.append((name, start, end, threading.get_ident()))
+
+    # ==========================================================
+    #  Reporting
+    # ==========================================================
+    def summary(self):
+        """Name -> count, mean, p50/p95/p99 and max in ms, for every timer."""
+        with self._lock:
+            timers = list(self.timers.items())
+        return {name: summarize(list(samples)) for name, samples in timers}
+
+    def trace_events(self):
+        """Recorded spans as Chrome trace events (complete events, in us)."""
+        pid = os.getpid()
+        return [{"name": name, "cat": "whiteboard", "ph": "X", "pid": pid, "tid": tid,
+                 "ts": round((start - self._origin) * 1e6, 3),
+                 "dur": round((end - start) * 1e6, 3)}
+                for name, start, end, tid in list(self.events)]
+
+    def export_trace(self, path):
+        """Write the trace as Chrome trace-event JSON; returns the event count."""
+        events = self.trace_events()
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+instruments = Instrumentation()
+if os.environ.get("WHITEBOARD_INSTRUMENT", "0") not in ("", "0"):
+    instruments.enable(trace=os.environ["WHITEBOARD_INSTRUMENT"] == "trace")
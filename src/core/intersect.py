@@ -0,0 +1,257 @@
+"""Batched intersection kernels for the eraser and lasso tools.
+
+Erasing or lassoing across a dense area tests a path or polygon against
+every segment of every nearby stroke. Instead of a Python loop per stroke,
+the candidates' points and segments are gathered from the store's columns
+into flat arrays once (``gather_points``, ``gather_segments``) and tested
+in a handful of NumPy passes:
+
+* ``capsule_hits``: segments that come within a distance of an eraser
+  path, i.e. intersect the capsules a round eraser sweeps between samples
+* ``path_distance_sq``: the same distance per point, for pixel erase
+* ``boxes_on_polygon_edge``: stroke bounds a lasso's boundary may pass
+  through; strokes clear of it are decided by a single point
+* ``segments_cross_polygon``: segments crossing a lasso's boundary
+
+The polygon kernels pair each polygon edge only with the boxes in its own
+x band, found by binary search in a sorted array, so the work grows with
+the band sizes rather than edges x boxes.
+
+``split_runs`` turns a per-point keep mask into the pieces a pixel eraser
+leaves of each stroke.
+"""
+import numpy as np
+
+from core.geometry import CHUNK_PAIRS
+
+EDGE_GRID = 128         # Cells per side of the grid that finds boxes near a lasso's edge
+
+
+# ==========================================================
+#  Gathering
+# ==========================================================
+def gather_points(store, ids):
+    """Flat indices into the store's point columns for ``ids``, plus run starts.
+
+    Returns (index, starts, lengths): stroke ``ids[k]`` owns
+    ``index[starts[k]:starts[k] + lengths[k]]``.
+    """
+    rows = store.table[np.asarray(ids, dtype=np.int64)]
+    offsets = rows["offset"].astype(np.int64)
+    lengths = rows["length"].astype(np.int64)
+    starts = np.cumsum(lengths) - lengths
+    index = np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(offsets - starts, lengths)
+    return index, starts, lengths
+
+
+def gather_segments(store, ids):
+    """Segments of strokes ``ids`` as float64 arrays (ax, ay, bx, by, owner).
+
+    A stroke of n points contributes n - 1 segments; a single point
+    contributes one zero-length segment so it can still be hit.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    rows = store.table[ids]
+    offsets = rows["offset"].astype(np.int64)
+    lengths = rows["length"].astype(np.int64)
+    counts = np.maximum(lengths - 1, 1)
+    firsts = np.cumsum(counts) - counts
+    start = (np.arange(int(counts.sum()), dtype=np.int64) +
+             np.repeat(offsets - firsts, counts))
+    end = start + np.repeat(lengths > 1, counts)
+    # Index before widening: converting the whole columns would copy every point
+    x, y = store.x, store.y
+    return (x[start].astype(np.float64), y[start].astype(np.float64),
+            x[end].astype(np.float64), y[end].astype(np.float64), np.repeat(ids, counts))
+
+
+# ==========================================================
+#  Distance Kernels
+# ==========================================================
+def _point_segment_sq(px, py, ax, ay, bx, by):
+    """Squared distance from points to segments (all broadcast together)."""
+    dx, dy = bx - ax, by - ay
+    length_sq = dx * dx + dy * dy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(length_sq > 0, ((px - ax) * dx + (py - ay) * dy) / length_sq, 0.0)
+    t = np.clip(t, 0.0, 1.0)
+    ex, ey = ax + t * dx - px, ay + t * dy - py
+    return ex * ex + ey * ey
+
+
+def _cross(ox, oy, ax, ay, bx, by):
+    return (ax - ox) * (by - oy) - (ay - oy) * (bx - ox)
+
+
+def _segments_cross(ax, ay, bx, by, cx, cy, dx, dy):
+    """True where segment ab properly crosses segment cd."""
+    d1 = _cross(ax, ay, bx, by, cx, cy)
+    d2 = _cross(ax, ay, bx, by, dx, dy)
+    d3 = _cross(cx, cy, dx, dy, ax, ay)
+    d4 = _cross(cx, cy, dx, dy, bx, by)
+    return (d1 * d2 < 0) & (d3 * d4 < 0)
+
+
+def segment_distance_sq(ax, ay, bx, by, cx, cy, dx, dy):
+    """Squared distance between segments ab and cd (broadcast together)."""
+    dist = np.minimum(
+        np.minimum(_point_segment_sq(ax, ay, cx, cy, dx, dy),
+                   _point_segment_sq(bx, by, cx, cy, dx, dy)),
+        np.minimum(_point_segment_sq(cx, cy, ax, ay, bx, by),
+                   _point_segment_sq(dx, dy, ax, ay, bx, by)))
+    return np.where(_segments_cross(ax, ay, bx, by, cx, cy, dx, dy), 0.0, dist)
+
+
+def _path_segments(path_x, path_y):
+    px = np.asarray(path_x, dtype=np.float64)
+    py = np.asarray(path_y, dtype=np.float64)
+    if len(px) == 1:
+        return px, py, px, py
+    return px[:-1], py[:-1], px[1:], py[1:]
+
+
+def capsule_hits(ax, ay, bx, by, path_x, path_y, radius):
+    """Mask of segments within ``radius`` (scalar or per segment) of a path.
+
+    The path is the eraser's centre line, one or more points; it sweeps a
+    capsule of ``radius`` around each of its segments.
+    """
+    hit = np.zeros(len(ax), dtype=bool)
+    limit = np.asarray(radius, dtype=np.float64) ** 2
+    for cx, cy, dx, dy in zip(*_path_segments(path_x, path_y)):
+        hit |= segment_distance_sq(ax, ay, bx, by, cx, cy, dx, dy) <= limit
+    return hit
+
+
+def path_distance_sq(xs, ys, path_x, path_y):
+    """Squared distance from each point to the nearest part of a path."""
+    best = np.full(len(xs), np.inf)
+    for cx, cy, dx, dy in zip(*_path_segments(path_x, path_y)):
+        np.minimum(best, _point_segment_sq(xs, ys, cx, cy, dx, dy), out=best)
+    return best
+
+
+# ==========================================================
+#  Polygon Kernels
+# ==========================================================
+def _edge_pairs(x0, y0, x1, y1, polygon):
+    """Yield (cx, cy, dx, dy, box): polygon edges cd paired with boxes they may touch.
+
+    Boxes are sorted by x0 once; each edge's candidates are a contiguous
+    run of that order, found by binary search and expanded for all edges
+    at once, in chunks of at most ``CHUNK_PAIRS`` pairs to bound memory.
+    """
+    poly = np.asarray(polygon, dtype=np.float64)
+    cx, cy = poly[:, 0], poly[:, 1]
+    dx, dy = np.roll(cx, -1), np.roll(cy, -1)
+    ex0, ey0 = np.minimum(cx, dx), np.minimum(cy, dy)
+    ex1, ey1 = np.maximum(cx, dx), np.maximum(cy, dy)
+    order = np.argsort(x0)
+    sorted_x0 = x0[order]
+    reach = float(np.max(x1 - x0))      # Widest box: how far left of an edge to look
+    lo = np.searchsorted(sorted_x0, ex0 - reach, side="left")
+    counts = np.searchsorted(sorted_x0, ex1, side="right") - lo
+    ends = np.cumsum(counts)
+    first = 0
+    while first < len(poly):
+        last = max(first + 1, int(np.searchsorted(ends, ends[first] - counts[first] + CHUNK_PAIRS,
+                                                  side="right")))
+        chunk = counts[first:last]
+        edge = np.repeat(np.arange(first, last), chunk)
+        box = order[np.arange(int(chunk.sum())) +
+                    np.repeat(lo[first:last] - (np.cumsum(chunk) - chunk), chunk)]
+        near = (x1[box] >= ex0[edge]) & (y0[box] <= ey1[edge]) & (y1[box] >= ey0[edge])
+        edge, box = edge[near], box[near]
+        yield cx[edge], cy[edge], dx[edge], dy[edge], box
+        first = last
+
+
+def _near_edges(x0, y0, x1, y1, polygon):
+    """Conservative mask of boxes sharing a grid cell with some edge's bounds.
+
+    The edges' bounds are painted into a coarse grid over the boxes and each
+    box sums its cells in a summed-area table: O(1) per box, where pairing
+    every edge with its whole x band of boxes costs band x edges.
+    """
+    poly = np.asarray(polygon, dtype=np.float64)
+    cx, cy = poly[:, 0], poly[:, 1]
+    dx, dy = np.roll(cx, -1), np.roll(cy, -1)
+    left, top = min(float(x0.min()), cx.min()), min(float(y0.min()), cy.min())
+    cell = max(float(x1.max()) - left, float(y1.max()) - top, cx.max() - left,
+               cy.max() - top) / EDGE_GRID or 1.0
+
+    def cells(values, origin):
+        return np.clip(((values - origin) / cell).astype(np.int64), 0, EDGE_GRID - 1)
+
+    # Difference array of the edges' cell rectangles, integrated twice
+    paint = np.zeros((EDGE_GRID + 1, EDGE_GRID + 1), dtype=np.int32)
+    r0, r1 = cells(np.minimum(cy, dy), top), cells(np.maximum(cy, dy), top) + 1
+    c0, c1 = cells(np.minimum(cx, dx), left), cells(np.maximum(cx, dx), left) + 1
+    for rows, cols, sign in ((r0, c0, 1), (r0, c1, -1), (r1, c0, -1), (r1, c1, 1)):
+        np.add.at(paint, (rows, cols), sign)
+    painted = paint.cumsum(axis=0).cumsum(axis=1)[:EDGE_GRID, :EDGE_GRID] > 0
+    area = np.zeros((EDGE_GRID + 1, EDGE_GRID + 1), dtype=np.int32)
+    area[1:, 1:] = painted.cumsum(axis=0).cumsum(axis=1)
+
+    r0, r1 = cells(y0, top), cells(y1, top) + 1
+    c0, c1 = cells(x0, left), cells(x1, left) + 1
+    return area[r1, c1] - area[r0, c1] - area[r1, c0] + area[r0, c0] > 0
+
+
+def boxes_on_polygon_edge(x0, y0, x1, y1, polygon):
+    """Mask of boxes touched by the bounding box of some edge of ``polygon``.
+
+    Every other box lies wholly inside or wholly outside the polygon, so
+    one point of it decides for everything it contains. A coarse grid pass
+    first drops the boxes nowhere near the boundary.
+    """
+    touched = np.zeros(len(x0), dtype=bool)
+    if len(x0):
+        near = np.flatnonzero(_near_edges(x0, y0, x1, y1, polygon))
+        if len(near):
+            for _, _, _, _, box in _edge_pairs(x0[near], y0[near], x1[near], y1[near], polygon):
+                touched[near[box]] = True
+    return touched
+
+
+def segments_cross_polygon(ax, ay, bx, by, polygon):
+    """Mask of segments that cross the boundary of a closed ``polygon``."""
+    crossed = np.zeros(len(ax), dtype=bool)
+    if not len(ax):
+        return crossed
+    boxes = (np.minimum(ax, bx), np.minimum(ay, by), np.maximum(ax, bx), np.maximum(ay, by))
+    for cx, cy, dx, dy, seg in _edge_pairs(*boxes, polygon):
+        crossed[seg[_segments_cross(ax[seg], ay[seg], bx[seg], by[seg], cx, cy, dx, dy)]] = True
+    return crossed
+
+
+# ==========================================================
+#  Splitting
+# ==========================================================
+def split_runs(keep, starts, lengths, cut=None, min_points=2):
+    """Runs of kept points within each stroke of a flat per-point mask.
+
+    ``keep`` covers the strokes back to back (as from ``gather_points``);
+    ``cut[i]``, if given, removes the segment from point i to point i + 1
+    even when both ends are kept. Returns (stroke, start, end) arrays: run
+    ``k`` is points ``start[k]:end[k]`` (relative to its stroke) of stroke
+    number ``stroke[k]``. Runs shorter than ``min_points`` are dropped, so
+    an eraser does not leave stray dots behind.
+    """
+    keep = np.asarray(keep, dtype=bool)
+    n = len(keep)
+    breaks = np.zeros(n, dtype=bool)            # No segment from point i to i + 1
+    breaks[(starts + lengths - 1)[lengths > 0]] = True
+    if cut is not None:
+        breaks |= cut
+    following = np.concatenate((keep[1:], [False]))
+    previous = np.concatenate(([False], keep[:-1]))
+    broken_before = np.concatenate(([True], breaks[:-1]))
+    run_begins = np.flatnonzero(keep & (~previous | broken_before))
+    run_ends = np.flatnonzero(keep & (~following | breaks)) + 1
+    # First stroke ending past the run's start (skips strokes with no points)
+    stroke = np.searchsorted(starts + lengths, run_begins, side="right")
+    long_enough = run_ends - run_begins >= min_points
+    stroke = stroke[long_enough]
+    begin, end = run_begins[long_enough], run_ends[long_enough]
+    return stroke, begin - starts[stroke], end - starts[stroke]
@@ -0,0 +1,453 @@
+"""Crash-safe autosave: a write-ahead journal of board edits plus checkpoints.
+
+Every edit of a ``BoardDocument`` is appended to ``<board>.journal`` and,
+every so often, the document's dirty chunks are checkpointed into the
+board file itself, after which the journal starts over. Opening a board
+whose journal survived a crash replays it (``recover``), so at most the
+last ``sync_interval`` of work is lost, and replay never has more than one
+checkpoint's worth of journal to read, however long the session was.
+
+The GUI thread only encodes: edits collect into a transaction that
+``commit`` turns into one record (the autosave commits once per pass of
+the event loop, so a user action is never half replayed), and
+``checkpoint`` encodes the dirty chunks. A background thread does all the
+I/O. It writes whatever records queued up while it was busy in one go and
+fsyncs once per batch, at most every ``sync_interval`` seconds.
+
+A journal file is::
+
+    header   JOURNAL_HEADER: magic, version, base generation
+    records  RECORD (payload length, CRC-32) + one transaction each
+
+The base generation is the board file's generation the records apply on
+top of. A checkpoint writes the board file (bumping its generation) before
+it deletes the journal, so a journal left behind by a crash in between no
+longer matches the file and is ignored rather than applied twice. Replay
+stops at the first torn or corrupt record.
+
+A transaction lists the strokes it added (with their data), changed (with
+their new data) and removed. Strokes are referenced by their position in
+the board file (``BoardDocument.file_ref``) or, when added since the last
+checkpoint, by their add's sequence number in the journal. A transaction
+that placed or removed images carries the board's whole image table.
+"""
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from core.board_file import (BoardFile, decode_images, decode_strokes, encode_images,
+                             encode_strokes, iter_decoded)
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_MAGIC = b"WBJL"
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct("<4sHHQ")        # magic, version, reserved, base generation
+RECORD = struct.Struct("<II")                   # payload length, CRC-32 of the payload
+TRANSACTION = struct.Struct("<IIII")            # strokes added, changed, removed; flags
+BLOB = struct.Struct("<I")
+SYNC_INTERVAL = 0.05        # Seconds between fsyncs; records in between share one
+CHECKPOINT_BYTES = 8 * 2**20
+STOP_TIMEOUT = 10.0         # Seconds close waits for the I/O thread
+FILE_REF, NEW_REF = 0, 1
+TXN_IMAGES = 1              # Flag: the image table follows the strokes
+
+
+def journal_path(board_path):
+    return board_path + JOURNAL_SUFFIX
+
+
+def _fsync_dir(path):
+    """Make a file's creation or removal durable (where directories can be opened)."""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class _Transaction:
+    """Edits since the last commit, already netted out per stroke"""
+    __slots__ = ("adds", "changes", "removes", "images")
+
+    def __init__(self):
+        self.adds = {}              # stroke id -> sequence number
+        self.changes = {}           # stroke id -> reference
+        self.removes = []           # references
+        self.images = False         # Whether images were placed or removed
+
+    def __bool__(self):
+        return bool(self.adds or self.changes or self.removes or self.images)
+
+
+def encode_transaction(board, txn):
+    """One journal record payload for ``txn``, with the data read from ``board``."""
+    adds, changes = list(txn.adds), list(txn.changes)
+    flags = TXN_IMAGES if txn.images else 0
+    parts = [TRANSACTION.pack(len(adds), len(changes), len(txn.removes), flags),
+             np.asarray(list(txn.adds.values()), dtype="<i4").tobytes(),
+             np.asarray(list(txn.changes.values()), dtype="<i4").reshape(-1, 4).tobytes(),
+             np.asarray(txn.removes, dtype="<i4").reshape(-1, 4).tobytes()]
+    for ids in (adds, changes):
+        if ids:
+            blob = encode_strokes(board.store, ids)
+            parts += [BLOB.pack(len(blob)), blob]
+    if txn.images:
+        blob = encode_images(board.images())
+        parts += [BLOB.pack(len(blob)), blob]
+    return b"".join(parts)
+
+
+def decode_transaction(payload):
+    """(add numbers, change refs, remove refs, added strokes, changed strokes, images).
+
+    Strokes are lists of (x, y, pressure, time, width, color); images is
+    a list of (asset, page, rect), or None when they did not change.
+    """
+    adds, changes, removes, flags = TRANSACTION.unpack_from(payload)
+    offset = TRANSACTION.size
+    numbers = np.frombuffer(payload, "<i4", adds, offset)
+    offset += 4 * adds
+    change_refs = np.frombuffer(payload, "<i4", 4 * changes, offset).reshape(-1, 4)
+    offset += 16 * changes
+    remove_refs = np.frombuffer(payload, "<i4", 4 * removes, offset).reshape(-1, 4)
+    offset += 16 * removes
+    strokes = []
+    for count in (adds, changes):
+        if not count:
+            strokes.append([])
+            continue
+        (length,) = BLOB.unpack_from(payload, offset)
+        offset += BLOB.size
+        strokes.append(list(iter_decoded(decode_strokes(payload, offset))))
+        offset += length
+    images = None
+    if flags & TXN_IMAGES:
+        (length,) = BLOB.unpack_from(payload, offset)
+        offset += BLOB.size
+        images = list(decode_images(payload[offset:offset + length]))
+    return numbers, change_refs, remove_refs, strokes[0], strokes[1], images
+
+
+def read_journal(path):
+    """(base generation, [transaction payloads]) of a journal file, or None."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < JOURNAL_HEADER.size:
+        return None
+    magic, version, _, base = JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC or version > JOURNAL_VERSION:
+        return None
+    payloads = []
+    offset = JOURNAL_HEADER.size
+    while offset + RECORD.size <= len(data):
+        length, crc = RECORD.unpack_from(data, offset)
+        start = offset + RECORD.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break       # Torn tail of a crash
+        payloads.append(payload)
+        offset = start + length
+    return base, payloads
+
+
+def recover(document, path=None):
+    """Replay the journal of ``document``'s board file onto it.
+
+    Returns the number of transactions replayed; 0 when there is no
+    journal or it was already checkpointed into the file. The replayed
+    edits leave the document modified, to be checkpointed again.
+    """
+    path = path or journal_path(document.path)
+    journal = read_journal(path)
+    generation = document.file.generation if document.file is not None else 0
+    if journal is None or journal[0] != generation:
+        return 0
+    board = document.board
+    added = {}
+
+    def resolve(ref):
+        kind, a, b, c = (int(v) for v in ref)
+        if kind == NEW_REF:
+            return added.get(a)
+        return document.stroke_at((a, b), c)
+
+    for payload in journal[1]:
+        numbers, change_refs, remove_refs, new, changed, images = decode_transaction(payload)
+        for number, (x, y, pressure, t, width, color) in zip(numbers.tolist(), new):
+            added[number] = board.add_stroke(np.column_stack((x, y)), width, color, pressure, t)
+        for ref, (x, y, pressure, t, width, color) in zip(change_refs, changed):
+            stroke_id = resolve(ref)
+            if stroke_id is not None:
+                board.set_points(stroke_id, np.column_stack((x, y)), pressure, t)
+                board.restyle_strokes([stroke_id], width, color)
+        for ref in remove_refs:
+            stroke_id = resolve(ref)
+            if stroke_id is not None:
+                board.remove_stroke(stroke_id)
+        if images is not None:
+            for image in board.images():
+                board.remove_image(image.id)
+            for asset, page, rect in images:
+                board.add_image(asset, rect, page)
+    return len(journal[1])
+
+
+# ==========================================================
+#  Journal
+# ==========================================================
+class Journal:
+    """Write-ahead log and checkpoints of one BoardDocument, written off-thread
+
+    ``target`` is the board file checkpoints go to, by default the
+    document's own. All methods are for the thread that edits the board;
+    they only encode and queue. ``on_pending`` is called when the first
+    edit of a new transaction comes in (to schedule ``commit``) and
+    ``on_checkpoint`` from the I/O thread once a checkpoint is on disk.
+
+    ``error`` holds the I/O thread's last error, if any. A checkpoint that
+    fails is folded into the next one, and until one succeeds nothing more is
+    journaled: the old journal still recovers up to the failure, and
+    later records would refer to a board file that never got written.
+    """
+
+    def __init__(self, document, target=None, sync_interval=SYNC_INTERVAL,
+                 checkpoint_bytes=CHECKPOINT_BYTES, on_pending=None, on_checkpoint=None):
+        self.document = document
+        self.target = target or document.path
+        self.path = journal_path(self.target)
+        self.sync_interval = sync_interval
+        self.checkpoint_bytes = checkpoint_bytes
+        self.on_pending = on_pending
+        self.on_checkpoint = on_checkpoint
+        self.size = 0               # Record bytes queued since the last checkpoint
+        self.syncs = 0              # fsyncs of the journal so far
+        self.checkpoints = 0
+        self.error = None
+        self._txn = _Transaction()
+        self._refs = {}             # stroke id -> reference, for strokes touched since
+        self._numbers = 0           # Adds journaled since the last checkpoint
+        self._queue = queue.SimpleQueue()
+
+        # I/O thread state
+        self._base = 0
+        self._file = None
+        self._new_file = False
+        self._synced = 0.0
+        self._synced_size = 0
+        self._board_file = None
+        self._unwritten = {}        # Updates of a failed checkpoint
+        self._thread = threading.Thread(target=self._run, name="journal", daemon=True)
+
+        current = document.file is not None and document.file.path == self.target
+        if current:
+            self._base = document.file.generation
+        self._thread.start()
+        document.add_edit_listener(self._on_edit)
+        if not current or document.modified:
+            # Edits not in the target yet have nothing to be journaled against
+            self.checkpoint()
+
+    # ==========================================================
+    #  Recording
+    # ==========================================================
+    def _on_edit(self, event, stroke_id):
+        txn = self._txn
+        first = not txn
+        if event == "image":
+            txn.images = True
+        elif event == "add":
+            number = self._numbers
+            self._numbers += 1
+            self._refs[stroke_id] = (NEW_REF, number, 0, 0)
+            txn.adds[stroke_id] = number
+        else:
+            ref = self._refs.get(stroke_id)
+            if ref is None:
+                place = self.document.file_ref(stroke_id)
+                if place is None:
+                    return
+                (cx, cy), position = place
+                ref = self._refs[stroke_id] = (FILE_REF, cx, cy, position)
+            if event == "change":
+                if stroke_id not in txn.adds:
+                    txn.changes[stroke_id] = ref
+            else:
+                del self._refs[stroke_id]
+                txn.changes.pop(stroke_id, None)
+                if txn.adds.pop(stroke_id, None) is None:
+                    txn.removes.append(ref)
+        if first and txn and self.on_pending is not None:
+            self.on_pending()
+
+    @property
+    def pending(self):
+        return bool(self._txn)
+
+    @property
+    def failed(self):
+        """Whether the last checkpoint did not make it to disk."""
+        return bool(self._unwritten)
+
+    def commit(self):
+        """Queue the edits made since the last commit as one record."""
+        if not self._txn:
+            return
+        payload = encode_transaction(self.document.board, self._txn)
+        self._txn = _Transaction()
+        self._queue.put(("record", payload))
+        self.size += RECORD.size + len(payload)
+        if self.size >= self.checkpoint_bytes:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Queue the document's dirty chunks to be written into the target."""
+        self.commit()
+        self._queue.put(("checkpoint", self.document.snapshot(), self.document.chunk_size))
+        # File positions now refer to the checkpoint; the next journal starts afresh
+        self._refs = {}
+        self._numbers = 0
+        self.size = 0
+
+    def flush(self, timeout=None):
+        """Commit and wait until everything queued so far is on disk.
+
+        Returns False on timeout, or at once if the I/O thread has stopped.
+        """
+        self.commit()
+        if not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        self._queue.put(("sync", done))
+        return done.wait(timeout)
+
+    def close(self, discard=False, timeout=STOP_TIMEOUT):
+        """Checkpoint, stop the I/O thread and remove the journal.
+
+        With ``discard`` nothing more is written and the target file goes
+        too (an untitled board closed for good). Waits at most ``timeout``
+        seconds for the last writes; returns whether they finished.
+        """
+        self.document.remove_edit_listener(self._on_edit)
+        if discard:
+            self._txn = _Transaction()
+        elif self.document.modified or self.pending or self.size:
+            self.checkpoint()
+        self._queue.put(("stop", discard))
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    # ==========================================================
+    #  I/O Thread
+    # ==========================================================
+    def _run(self):
+        try:
+            self._loop()
+        finally:
+            # Nobody is left to sync for whoever still waits
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] == "sync":
+                    item[1].set()
+
+    def _loop(self):
+        while True:
+            batch = [self._queue.get()]
+            # Group commit: records arriving while the last fsync settles share the next
+            wait = self._synced + self.sync_interval - time.monotonic()
+            if wait > 0 and batch[0][0] == "record":
+                time.sleep(wait)
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for item in batch:
+                # Any failure is kept for the GUI to see; the thread must live
+                # on to retry, and always leave on "stop" so close returns
+                try:
+                    if item[0] == "record":
+                        self._append(item[1])
+                    elif item[0] == "checkpoint":
+                        self._checkpoint(*item[1:])
+                    elif item[0] == "sync":
+                        self._sync()
+                    else:
+                        self._stop(item[1])
+                except Exception as error:
+                    self.error = error
+                if item[0] == "sync":
+                    item[1].set()
+                elif item[0] == "stop":
+                    return
+            try:
+                self._sync()
+            except Exception as error:
+                self.error = error
+
+    def _append(self, payload):
+        if self._unwritten:
+            return
+        if self._file is None:
+            self._file = open(self.path, "wb")
+            self._file.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, 0, self._base))
+            self._new_file = True
+        self._file.write(RECORD.pack(len(payload), zlib.crc32(payload)) + payload)
+
+    def _sync(self):
+        if self._file is None or self._synced_size == self._file.tell():
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        if self._new_file:
+            _fsync_dir(self.path)
+            self._new_file = False
+        self._synced_size = self._file.tell()
+        self._synced = time.monotonic()
+        self.syncs += 1
+
+    def _checkpoint(self, updates, chunk_size):
+        # Until the board file is written the journal is what holds these edits
+        self._sync()
+        self._unwritten = {**self._unwritten, **updates}
+        if self._board_file is None:
+            self._board_file = BoardFile(self.target, chunk_size)
+        self._board_file.write_chunks(self._unwritten)
+        self._unwritten = {}
+        self._base = self._board_file.generation
+        self._remove_journal()
+        self.checkpoints += 1
+        if self.on_checkpoint is not None:
+            self.on_checkpoint()
+
+    def _remove_journal(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._synced_size = 0
+        if os.path.exists(self.path):
+            os.remove(self.path)
+            _fsync_dir(self.path)
+
+    def _stop(self, discard):
+        # After the final checkpoint the journal is gone already, unless it failed
+        if discard:
+            self._remove_journal()
+        elif self._file is not None:
+            self._file.close()
+        if self._board_file is not None:
+            self._board_file.close()
+        if discard and os.path.exists(self.target):
+            os.remove(self.target)
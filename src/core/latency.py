@@ -0,0 +1,66 @@
+"""Event-timestamp-to-paint latency bookkeeping.
+
+Input events carry a window-system timestamp in milliseconds whose epoch is
+unknown, so each one is mapped onto ``time.perf_counter`` by assuming the
+quickest delivery seen so far took no time: the offset between the clocks
+is the minimum of (arrival - timestamp). A sample's latency is the time
+from its mapped timestamp to the end of the first paint that showed it.
+Queueing in the event loop is included; compositing and scan-out after the
+paint returns are not.
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+
+def now_ms():
+    return time.perf_counter() * 1000.0
+
+
+def summarize(samples):
+    """Count, mean, p50/p95/p99 and max of ``samples`` (ms)."""
+    if not len(samples):
+        return {"count": 0}
+    values = np.fromiter(samples, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, (50, 95, 99))
+    return {"count": len(values), "mean": float(values.mean()),
+            "p50": float(p50), "p95": float(p95), "p99": float(p99),
+            "max": float(values.max())}
+
+
+class LatencyMeter:
+    """Rolling window of event-to-paint latencies in milliseconds"""
+
+    def __init__(self, capacity=4096):
+        self.samples = deque(maxlen=capacity)
+        self._offset = None     # perf_counter ms minus event timestamp ms
+        self._pending = []      # Mapped timestamps not painted yet
+
+    def __len__(self):
+        return len(self.samples)
+
+    def event(self, timestamp, now=None):
+        """Note an input event stamped ``timestamp`` ms, arriving ``now``."""
+        now = now_ms() if now is None else now
+        offset = now - timestamp
+        if self._offset is None or offset < self._offset:
+            # Earlier pending samples keep the estimate they were taken with
+            self._offset = offset
+        self._pending.append(timestamp + self._offset)
+
+    def painted(self, now=None):
+        """A frame showing every pending event has just been painted."""
+        if not self._pending:
+            return
+        now = now_ms() if now is None else now
+        self.samples.extend(now - stamp for stamp in self._pending)
+        self._pending = []
+
+    def discard(self):
+        """Forget events that will not be painted (e.g. the stroke ended)."""
+        self._pending = []
+
+    def summary(self):
+        """Count, mean, p50/p95/p99 and max of the window, in ms."""
+        return summarize(self.samples)
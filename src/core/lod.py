@@ -0,0 +1,177 @@
+"""Level-of-detail data for drawing strokes zoomed far out.
+
+Each stroke gets a lazily built pyramid of simplified polylines, one per
+tile level it is drawn at, where level L keeps just enough vertices to stay
+within half a pixel (``0.5 / 2 ** L`` world units) of the full stroke.
+Coarser levels are simplified from the next finer one, so the pyramid is
+nested and each level is cheap to add. Levels are stored as index arrays
+into the stroke's own points rather than as copies.
+
+Strokes that shrink below ``BLOB_PIXELS`` on screen are not tessellated at
+all: ``blob_layer`` splats them into per-pixel colour/coverage
+accumulators in one vectorised pass.
+"""
+import numpy as np
+
+PIXEL_TOLERANCE = 0.5
+BLOB_PIXELS = 2.0
+
+
+def simplify_indices(x, y, tolerance):
+    """Indices of the Douglas-Peucker simplification of (x, y) at ``tolerance``."""
+    n = len(x)
+    if n <= 2:
+        return np.arange(n, dtype=np.int32)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        ax, ay = x[first], y[first]
+        dx, dy = x[last] - ax, y[last] - ay
+        px, py = x[first + 1:last] - ax, y[first + 1:last] - ay
+        length = np.hypot(dx, dy)
+        if length > 0:
+            dist = np.abs(px * dy - py * dx) / length
+        else:
+            dist = np.hypot(px, py)
+        worst = int(np.argmax(dist))
+        if dist[worst] > tolerance:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep).astype(np.int32)
+
+
+class _Pyramid:
+    """Simplified index arrays for one stroke, keyed by tile level"""
+    __slots__ = ("key", "levels", "full_from")
+
+    def __init__(self, key):
+        self.key = key
+        self.levels = {}
+        self.full_from = None   # Levels >= this need every point
+
+
+class LodCache:
+    """Per-stroke LOD pyramids, built on demand
+
+    Whoever edits strokes must ``discard`` their pyramids; ``TileRenderer``
+    does so for every change and removal the board reports.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._pyramids = {}
+
+    def __len__(self):
+        return len(self._pyramids)
+
+    def discard(self, stroke_id):
+        """Forget the pyramid of a changed or removed stroke."""
+        self._pyramids.pop(stroke_id, None)
+
+    def indices(self, stroke_id, level):
+        """Point indices to draw stroke ``stroke_id`` at ``level``, or None for all."""
+        stroke = self.store[stroke_id]
+        # Only a cheap guard for edits made on the store behind the board's back:
+        # a point edit that keeps the count and bounds still needs ``discard``
+        key = (len(stroke), stroke.bounds)
+        pyramid = self._pyramids.get(stroke_id)
+        if pyramid is None or pyramid.key != key:
+            pyramid = self._pyramids[stroke_id] = _Pyramid(key)
+        if pyramid.full_from is not None and level >= pyramid.full_from:
+            return None
+        found = pyramid.levels.get(level)
+        if found is not None:
+            return found
+
+        # Start from the nearest finer level we already have
+        finer = [l for l in pyramid.levels if l > level]
+        base = pyramid.levels[min(finer)] if finer else None
+        x, y = stroke.x, stroke.y
+        if base is not None:
+            x, y = x[base], y[base]
+        tolerance = PIXEL_TOLERANCE / 2.0 ** level
+        kept = simplify_indices(x, y, tolerance)
+        if base is not None:
+            kept = base[kept]
+        elif len(kept) == len(stroke):
+            pyramid.full_from = level if pyramid.full_from is None else min(pyramid.full_from, level)
+            return None
+        pyramid.levels[level] = kept
+        return kept
+
+    def polyline(self, stroke_id, level):
+        """(x, y, pressure) arrays of stroke ``stroke_id`` simplified for ``level``."""
+        kept = self.indices(stroke_id, level)
+        x, y, pressure = self.store[stroke_id].arrays()
+        if kept is None:
+            return x, y, pressure
+        return x[kept], y[kept], pressure[kept]
+
+
+def split_tiny(store, ids, scale):
+    """Split ``ids`` into (tiny, regular) by on-screen size at ``scale``."""
+    ids = np.asarray(ids, dtype=np.int64)
+    if not len(ids):
+        return ids, ids
+    bounds = store.bounds_of(ids)
+    extent = np.maximum(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]) * scale
+    tiny = extent < BLOB_PIXELS
+    return ids[tiny], ids[~tiny]
+
+
+def blob_layer(store, ids, origin_x, origin_y, scale, shape):
+    """Aggregate tiny strokes into premultiplied ARGB32 pixels.
+
+    Each stroke adds its ink area (in pixels, capped at one pixel) as
+    coverage at its centre pixel; strokes sharing a pixel average their
+    colours. Returns an (H, W) uint32 layer to composite under the rest.
+    """
+    return blob_pixels(store.table[ids], origin_x, origin_y, scale, shape)
+
+
+def blob_pixels(rows, origin_x, origin_y, scale, shape):
+    """``blob_layer`` for a snapshot of stroke table rows rather than ids."""
+    height, width = shape
+    layer = np.zeros(shape, dtype=np.uint32)
+    if not len(rows):
+        return layer
+    cx = ((rows["x0"] + rows["x1"]) / 2 - origin_x) * scale
+    cy = ((rows["y0"] + rows["y1"]) / 2 - origin_y) * scale
+    px = np.floor(cx).astype(np.int64)
+    py = np.floor(cy).astype(np.int64)
+    inside = (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    if not inside.any():
+        return layer
+    rows, px, py = rows[inside], px[inside], py[inside]
+
+    # Ink area ~ path length x width; the bounding box bounds the length
+    span = np.maximum(rows["x1"] - rows["x0"], rows["y1"] - rows["y0"]).astype(np.float64)
+    ink = np.minimum(span * rows["width"] * scale * scale, 1.0)
+    colors = rows["color"].astype(np.int64)
+    weight = ink * ((colors >> 24) & 0xFF) / 255.0
+
+    pixel = py * width + px
+    coverage = np.zeros(height * width)
+    np.add.at(coverage, pixel, weight)
+    channels = []
+    for shift in (16, 8, 0):
+        acc = np.zeros(height * width)
+        np.add.at(acc, pixel, weight * ((colors >> shift) & 0xFF))
+        channels.append(acc)
+
+    hit = np.flatnonzero(coverage)
+    alpha = np.minimum(coverage[hit], 1.0)
+    out = np.round(alpha * 255).astype(np.uint32) << 24
+    for acc, shift in zip(channels, (16, 8, 0)):
+        average = acc[hit] / coverage[hit]
+        out |= np.round(average * alpha).astype(np.uint32) << shift
+    layer.reshape(-1)[hit] = out
+    return layer
@@ -0,0 +1,58 @@
+"""Stroke tessellation and tile rasterization with an optional native engine.
+
+``core._native`` is the pybind11 module built from bindings.cpp (see
+CMakeLists.txt next to it). When it is missing, or WHITEBOARD_NATIVE=0 is
+set, the pure-Python twin in ``core.raster_fallback`` is used instead and
+renders exactly the same pixels.
+
+Arrays are handed over without copies as long as they are already
+contiguous float32 (point columns) / uint32 (tile buffers).
+"""
+import os
+
+import numpy as np
+
+from core import raster_fallback
+
+try:
+    from core import _native
+except ImportError:
+    _native = None
+
+if os.environ.get("WHITEBOARD_NATIVE", "1") == "0":
+    _native = None
+
+NATIVE = _native is not None
+_engine = _native if NATIVE else raster_fallback
+
+
+def _f32(array):
+    return np.ascontiguousarray(array, dtype=np.float32)
+
+
+def tessellate(x, y, radius):
+    """Triangle strip (N, 2 float32) for a stroke with per-point radii."""
+    return _engine.tessellate(_f32(x), _f32(y), _f32(radius))
+
+
+def rasterize_strip(vertices, origin_x, origin_y, scale, color, target):
+    """Composite ``vertices`` in ``color`` (ARGB) into the uint32 ``target``.
+
+    ``target`` is an (H, W) premultiplied ARGB32 buffer, typically a view
+    of a QImage's bits; pixel (0, 0) shows world point (origin_x, origin_y)
+    and one world unit spans ``scale`` pixels.
+    """
+    if target.dtype != np.uint32 or not target.flags.c_contiguous:
+        raise ValueError("target must be a C-contiguous uint32 array")
+    _engine.rasterize_strip(_f32(vertices), float(origin_x), float(origin_y),
+                            float(scale), int(color) & 0xFFFFFFFF, target)
+
+
+def stroke_radii(width, pressure, min_radius=0.0):
+    """Per-point radii for a stroke of nominal ``width`` and pen ``pressure``."""
+    return np.maximum(np.float32(width / 2) * _f32(pressure), np.float32(min_radius))
+
+
+def render_stroke(target, x, y, radius, color, origin_x, origin_y, scale):
+    """Tessellate one stroke and composite it into ``target``."""
+    rasterize_strip(tessellate(x, y, radius), origin_x, origin_y, scale, color, target)
@@ -0,0 +1,183 @@
+"""Pure-Python twin of the native tessellator and rasterizer in bindings.cpp.
+
+Every arithmetic step matches the C++ code (same operations, same order,
+double precision, float32 only where the C++ stores floats), so both paths
+produce bit-identical strips and tiles. Change one, change the other.
+"""
+import numpy as np
+
+COS_STEP = 0.9238795325112867
+SIN_STEP = 0.3826834323650898
+MAX_ARC_STEPS = 16
+MAX_BATCH_SAMPLES = 1 << 20
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(16)], dtype=np.int64)
+
+
+# ==========================================================
+#  Stroke Tessellation
+# ==========================================================
+class _Strip:
+    def __init__(self):
+        self.xy = []
+
+    def emit(self, px, py, ux, uy, r):
+        self.xy.append(px + ux * r)
+        self.xy.append(py + uy * r)
+
+    def emit_point(self, px, py):
+        self.xy.append(px)
+        self.xy.append(py)
+
+    def arc(self, px, py, ux, uy, vx, vy, r, direction):
+        cx, cy = ux, uy
+        self.emit(px, py, cx, cy, r)
+        i = 0
+        while i < MAX_ARC_STEPS and cx * vx + cy * vy < COS_STEP:
+            cx, cy = (cx * COS_STEP - cy * SIN_STEP * direction,
+                      cx * SIN_STEP * direction + cy * COS_STEP)
+            self.emit_point(px, py)
+            self.emit(px, py, cx, cy, r)
+            i += 1
+        self.emit_point(px, py)
+        self.emit(px, py, vx, vy, r)
+
+
+def tessellate(x, y, radius):
+    """Triangle strip (N, 2 float32) for a variable-width round-capped stroke."""
+    xs, ys, rs = x.tolist(), y.tolist(), radius.tolist()
+    if not len(xs) == len(ys) == len(rs):
+        raise ValueError("x, y and radius must have the same length")
+
+    keep = []
+    for i in range(len(xs)):
+        if not keep or xs[i] != xs[keep[-1]] or ys[i] != ys[keep[-1]]:
+            keep.append(i)
+
+    strip = _Strip()
+    if len(keep) == 1:
+        px, py, r = xs[keep[0]], ys[keep[0]], rs[keep[0]]
+        strip.arc(px, py, 0.0, -1.0, 0.0, 1.0, r, 1.0)
+        strip.emit_point(px, py)
+        strip.arc(px, py, 0.0, 1.0, 0.0, -1.0, r, 1.0)
+    elif len(keep) > 1:
+        prev_dx = prev_dy = 0.0
+        for k in range(len(keep) - 1):
+            a, b = keep[k], keep[k + 1]
+            ax, ay, bx, by = xs[a], ys[a], xs[b], ys[b]
+            ra, rb = rs[a], rs[b]
+            dx, dy = bx - ax, by - ay
+            length = (dx * dx + dy * dy) ** 0.5
+            dx = dx / length
+            dy = dy / length
+            nx, ny = -dy, dx
+
+            if k == 0:
+                strip.arc(ax, ay, -nx, -ny, nx, ny, ra, -1.0)
+            else:
+                cross = prev_dx * dy - prev_dy * dx
+                pnx, pny = -prev_dy, prev_dx
+                if cross > 0.0 or (cross == 0.0 and prev_dx * dx + prev_dy * dy < 0.0):
+                    strip.arc(ax, ay, -pnx, -pny, -nx, -ny, ra, 1.0)
+                elif cross < 0.0:
+                    strip.arc(ax, ay, pnx, pny, nx, ny, ra, -1.0)
+            strip.emit(ax, ay, nx, ny, ra)
+            strip.emit(ax, ay, -nx, -ny, ra)
+            strip.emit(bx, by, nx, ny, rb)
+            strip.emit(bx, by, -nx, -ny, rb)
+            strip.emit_point(bx, by)
+            prev_dx, prev_dy = dx, dy
+
+            if k + 2 == len(keep):
+                strip.arc(bx, by, nx, ny, -nx, -ny, rb, -1.0)
+
+    return np.array(strip.xy, dtype=np.float64).astype(np.float32).reshape(-1, 2)
+
+
+# ==========================================================
+#  Tile Rasterizer
+# ==========================================================
+def _edge(ax, ay, bx, by, px, py):
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+
+
+def rasterize_strip(vertices, origin_x, origin_y, scale, color, target):
+    """Composite a triangle strip into a premultiplied ARGB32 tile in place."""
+    if vertices.ndim != 2 or vertices.shape[1] != 2:
+        raise ValueError("vertices must be an (N, 2) float32 array")
+    height, width = target.shape
+    mask = np.zeros(height * width, dtype=np.uint8)
+
+    v = vertices.astype(np.float64)
+    px = (v[:, 0] - origin_x) * scale
+    py = (v[:, 1] - origin_y) * scale
+    if len(v) >= 3:
+        x0, y0 = px[:-2], py[:-2]
+        x1, y1 = px[1:-1].copy(), py[1:-1].copy()
+        x2, y2 = px[2:].copy(), py[2:].copy()
+        area = _edge(x0, y0, x1, y1, x2, y2)
+        flip = area < 0.0
+        x1[flip], x2[flip] = x2[flip], x1[flip]
+        y1[flip], y2[flip] = y2[flip], y1[flip]
+
+        xs = np.stack((x0, x1, x2))
+        ys = np.stack((y0, y1, y2))
+        jx0 = np.maximum(np.ceil(xs.min(axis=0) * 2.0 - 0.5), 0.0)
+        jx1 = np.minimum(np.floor(xs.max(axis=0) * 2.0 - 0.5), 2 * width - 1)
+        jy0 = np.maximum(np.ceil(ys.min(axis=0) * 2.0 - 0.5), 0.0)
+        jy1 = np.minimum(np.floor(ys.max(axis=0) * 2.0 - 0.5), 2 * height - 1)
+        live = (area != 0.0) & (jx0 <= jx1) & (jy0 <= jy1)
+
+        tri = np.flatnonzero(live)
+        spans_x = (jx1 - jx0 + 1)[tri].astype(np.int64)
+        spans_y = (jy1 - jy0 + 1)[tri].astype(np.int64)
+        tri = tri[np.argsort(spans_x * spans_y, kind="stable")]
+        start = 0
+        while start < len(tri):
+            # Grow the batch while the padded sample grid stays bounded
+            end = start + 1
+            bw = int(jx1[tri[start]] - jx0[tri[start]]) + 1
+            bh = int(jy1[tri[start]] - jy0[tri[start]]) + 1
+            while end < len(tri):
+                t = tri[end]
+                nbw = max(bw, int(jx1[t] - jx0[t]) + 1)
+                nbh = max(bh, int(jy1[t] - jy0[t]) + 1)
+                if (end - start + 1) * nbw * nbh > MAX_BATCH_SAMPLES:
+                    break
+                bw, bh = nbw, nbh
+                end += 1
+            batch = tri[start:end]
+            start = end
+
+            gx = jx0[batch][:, None, None] + np.arange(bw)[None, None, :]
+            gy = jy0[batch][:, None, None] + np.arange(bh)[None, :, None]
+            sx = gx * 0.5 + 0.25
+            sy = gy * 0.5 + 0.25
+            bx0, by0 = x0[batch][:, None, None], y0[batch][:, None, None]
+            bx1, by1 = x1[batch][:, None, None], y1[batch][:, None, None]
+            bx2, by2 = x2[batch][:, None, None], y2[batch][:, None, None]
+            inside = ((gx <= jx1[batch][:, None, None]) & (gy <= jy1[batch][:, None, None]) &
+                      (_edge(bx0, by0, bx1, by1, sx, sy) >= 0.0) &
+                      (_edge(bx1, by1, bx2, by2, sx, sy) >= 0.0) &
+                      (_edge(bx2, by2, bx0, by0, sx, sy) >= 0.0))
+            gx, gy = np.broadcast_arrays(gx, gy)
+            jx = gx[inside].astype(np.int64)
+            jy = gy[inside].astype(np.int64)
+            bits = (1 << (((jy & 1) << 1) | (jx & 1))).astype(np.uint8)
+            np.bitwise_or.at(mask, (jy >> 1) * width + (jx >> 1), bits)
+
+    covered = _POPCOUNT[mask]
+    hit = np.flatnonzero(covered)
+    if not len(hit):
+        return
+    flat = target.reshape(-1)
+    dst = flat[hit].astype(np.int64)
+    alpha = (color >> 24) & 0xFF
+    a = (alpha * covered[hit] + 2) // 4
+    inverse = 255 - a
+    out = np.minimum(a + ((dst >> 24) * inverse + 127) // 255, 255) << 24
+    for shift in (16, 8, 0):
+        channel = (color >> shift) & 0xFF
+        value = (channel * a + 127) // 255 + (((dst >> shift) & 0xFF) * inverse + 127) // 255
+        out |= np.minimum(value, 255) << shift
+    flat[hit] = out.astype(np.uint32)
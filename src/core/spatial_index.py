@@ -0,0 +1,298 @@
+"""R-tree over world-space rectangles for viewport culling and hit-testing.
+
+Items are opaque hashable ids paired with an ``(x0, y0, x1, y1)`` rect.
+Bulk loading uses Sort-Tile-Recursive packing; incremental inserts pick
+the child needing the least enlargement and split overfull nodes along
+their widest axis. A side table maps each id to its leaf so removal does
+not have to search the tree.
+"""
+import heapq
+import math
+from itertools import count
+
+DEFAULT_MAX_ENTRIES = 16
+
+
+def _union(rects):
+    x0 = y0 = math.inf
+    x1 = y1 = -math.inf
+    for r in rects:
+        if r[0] < x0:
+            x0 = r[0]
+        if r[1] < y0:
+            y0 = r[1]
+        if r[2] > x1:
+            x1 = r[2]
+        if r[3] > y1:
+            y1 = r[3]
+    return (x0, y0, x1, y1)
+
+
+def _area(r):
+    return (r[2] - r[0]) * (r[3] - r[1])
+
+
+def _enlargement(r, add):
+    grown = (min(r[0], add[0]), min(r[1], add[1]), max(r[2], add[2]), max(r[3], add[3]))
+    return _area(grown) - _area(r)
+
+
+def _point_distance_sq(r, x, y):
+    dx = r[0] - x if x < r[0] else (x - r[2] if x > r[2] else 0.0)
+    dy = r[1] - y if y < r[1] else (y - r[3] if y > r[3] else 0.0)
+    return dx * dx + dy * dy
+
+
+class _Node:
+    """Tree node; ``children`` are ids in leaves and _Nodes otherwise"""
+    __slots__ = ("leaf", "rects", "children", "parent", "rect")
+
+    def __init__(self, leaf, rects=None, children=None):
+        self.leaf = leaf
+        self.rects = rects if rects is not None else []
+        self.children = children if children is not None else []
+        self.parent = None
+        self.rect = _union(self.rects) if self.rects else None
+
+
+class RTree:
+    """Dynamic R-tree supporting bulk load, insert, remove and queries"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.min_entries = max(2, max_entries * 2 // 5)
+        self._leaf_of = {}
+        self._rect_of = {}
+        self._root = _Node(True)
+
+    def __len__(self):
+        return len(self._rect_of)
+
+    def __contains__(self, item):
+        return item in self._rect_of
+
+    @property
+    def bounds(self):
+        """Rectangle enclosing every item, or None when empty."""
+        return self._root.rect
+
+    def rect(self, item):
+        return self._rect_of.get(item)
+
+    # ==========================================================
+    #  Construction
+    # ==========================================================
+    def bulk_load(self, items):
+        """Replace the contents with ``items`` ((id, rect) pairs) using STR packing."""
+        items = list(items)
+        self._leaf_of = {}
+        self._rect_of = {item: rect for item, rect in items}
+        if not items:
+            self._root = _Node(True)
+            return
+
+        nodes = []
+        for group in self._str_groups(items, lambda entry: entry[1]):
+            leaf = _Node(True, [r for _, r in group], [i for i, _ in group])
+            for item in leaf.children:
+                self._leaf_of[item] = leaf
+            nodes.append(leaf)
+
+        while len(nodes) > 1:
+            parents = []
+            for group in self._str_groups(nodes, lambda node: node.rect):
+                parent = _Node(False, [n.rect for n in group], list(group))
+                for child in group:
+                    child.parent = parent
+                parents.append(parent)
+            nodes = parents
+        self._root = nodes[0]
+
+    def _str_groups(self, entries, rect_of):
+        """Partition ``entries`` into spatially coherent runs of max_entries."""
+        m = self.max_entries
+        leaves = math.ceil(len(entries) / m)
+        slices = math.ceil(math.sqrt(leaves))
+        entries.sort(key=lambda e: rect_of(e)[0] + rect_of(e)[2])
+        slice_len = slices * m
+        for start in range(0, len(entries), slice_len):
+            column = entries[start:start + slice_len]
+            column.sort(key=lambda e: rect_of(e)[1] + rect_of(e)[3])
+            for i in range(0, len(column), m):
+                yield column[i:i + m]
+
+    # ==========================================================
+    #  Incremental Updates
+    # ==========================================================
+    def insert(self, item, rect):
+        """Add ``item`` with bounding ``rect`` (replacing any previous entry)."""
+        if item in self._rect_of:
+            self.remove(item)
+        self._rect_of[item] = rect
+        leaf = self._choose_leaf(rect)
+        leaf.rects.append(rect)
+        leaf.children.append(item)
+        self._leaf_of[item] = leaf
+        self._adjust_upwards(leaf, rect)
+
+    def remove(self, item):
+        """Remove ``item``; returns False if it was not present."""
+        rect = self._rect_of.pop(item, None)
+        if rect is None:
+            return False
+        leaf = self._leaf_of.pop(item)
+        index = leaf.children.index(item)
+        del leaf.children[index]
+        del leaf.rects[index]
+        self._condense(leaf)
+        return True
+
+    def _choose_leaf(self, rect):
+        node = self._root
+        while not node.leaf:
+            best = None
+            best_cost = None
+            for i, child_rect in enumerate(node.rects):
+                cost = (_enlargement(child_rect, rect), _area(child_rect))
+                if best_cost is None or cost < best_cost:
+                    best, best_cost = i, cost
+            node = node.children[best]
+        return node
+
+    def _adjust_upwards(self, node, rect):
+        """Grow ancestors to include ``rect`` and split any overfull nodes."""
+        while node is not None:
+            node.rect = rect if node.rect is None else _union((node.rect, rect))
+            parent = node.parent
+            if parent is not None:
+                parent.rects[parent.children.index(node)] = node.rect
+            if len(node.children) > self.max_entries:
+                self._split(node)
+            node = parent
+
+    def _split(self, node):
+        """Split ``node`` in half along the axis with the widest spread."""
+        pairs = list(zip(node.rects, node.children))
+        spread_x = max(r[2] for r, _ in pairs) - min(r[0] for r, _ in pairs)
+        spread_y = max(r[3] for r, _ in pairs) - min(r[1] for r, _ in pairs)
+        axis = 0 if spread_x >= spread_y else 1
+        pairs.sort(key=lambda p: p[0][axis] + p[0][axis + 2])
+        half = len(pairs) // 2
+
+        sibling = _Node(node.leaf, [r for r, _ in pairs[half:]], [c for _, c in pairs[half:]])
+        node.rects = [r for r, _ in pairs[:half]]
+        node.children = [c for _, c in pairs[:half]]
+        node.rect = _union(node.rects)
+        self._reparent(sibling)
+
+        parent = node.parent
+        if parent is None:
+            parent = _Node(False)
+            parent.children = [node]
+            parent.rects = [node.rect]
+            node.parent = parent
+            self._root = parent
+        else:
+            parent.rects[parent.children.index(node)] = node.rect
+        parent.children.append(sibling)
+        parent.rects.append(sibling.rect)
+        sibling.parent = parent
+        parent.rect = _union(parent.rects)
+
+    def _reparent(self, node):
+        if node.leaf:
+            for item in node.children:
+                self._leaf_of[item] = node
+        else:
+            for child in node.children:
+                child.parent = node
+
+    def _condense(self, node):
+        """Shrink ancestors after removal, dissolving underfull nodes."""
+        orphans = []
+        while node.parent is not None:
+            parent = node.parent
+            index = parent.children.index(node)
+            if len(node.children) < self.min_entries:
+                del parent.children[index]
+                del parent.rects[index]
+                orphans.append(node)
+            else:
+                node.rect = _union(node.rects)
+                parent.rects[index] = node.rect
+            node = parent
+        node.rect = _union(node.rects) if node.rects else None
+
+        # Collapse a root with a single internal child
+        while not self._root.leaf and len(self._root.children) == 1:
+            self._root = self._root.children[0]
+            self._root.parent = None
+        if not self._root.children:
+            self._root = _Node(True)
+
+        for orphan in orphans:
+            for item, rect in self._iter_leaf_entries(orphan):
+                self._leaf_of.pop(item, None)
+                del self._rect_of[item]
+                self.insert(item, rect)
+
+    def _iter_leaf_entries(self, node):
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.leaf:
+                yield from zip(node.children, node.rects)
+            else:
+                stack.extend(node.children)
+
+    # ==========================================================
+    #  Queries
+    # ==========================================================
+    def query(self, rect):
+        """Ids of all items whose rect overlaps ``rect``."""
+        x0, y0, x1, y1 = rect
+        found = []
+        root = self._root
+        if root.rect is None:
+            return found
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.leaf:
+                for r, item in zip(node.rects, node.children):
+                    if r[0] <= x1 and x0 <= r[2] and r[1] <= y1 and y0 <= r[3]:
+                        found.append(item)
+            else:
+                for r, child in zip(node.rects, node.children):
+                    if r[0] <= x1 and x0 <= r[2] and r[1] <= y1 and y0 <= r[3]:
+                        stack.append(child)
+        return found
+
+    def nearest(self, x, y, k=1, max_distance=math.inf, distance=None):
+        """Up to ``k`` ids closest to (x, y), nearest first.
+
+        Ranking uses the rectangle distance unless ``distance(item)`` is
+        given; it must never be smaller than the rectangle distance, which
+        holds for any exact geometry inside the rect.
+        """
+        if self._root.rect is None:
+            return []
+        limit_sq = max_distance * max_distance
+        tie = count()
+        heap = [(0.0, next(tie), False, self._root)]
+        result = []
+        while heap and len(result) < k:
+            dist_sq, _, exact, entry = heapq.heappop(heap)
+            if dist_sq > limit_sq:
+                break
+            if isinstance(entry, _Node):
+                for r, child in zip(entry.rects, entry.children):
+                    d = _point_distance_sq(r, x, y)
+                    if d <= limit_sq:
+                        heapq.heappush(heap, (d, next(tie), False, child if not entry.leaf else (child,)))
+            elif exact or distance is None:
+                result.append(entry[0])
+            else:
+                d = distance(entry[0])
+                heapq.heappush(heap, (d * d, next(tie), True, entry))
+        return result
@@ -0,0 +1,271 @@
+"""Columnar, array-backed stroke storage.
+
+Every input point of every stroke lives in four shared float32 columns
+(x, y, pressure, time); a stroke is just a row in a packed NumPy table that
+records where its run of points starts, how long it is, its style and its
+bounds. That is 16 bytes per point and 40 bytes per stroke, instead of a
+Python object (and a QPointF) per sample.
+
+Removing a stroke only clears its ``alive`` flag so it can be restored
+cheaply; ``purge`` releases the points for good and ``compact`` squeezes
+the freed space out of the columns once enough of it has accumulated.
+"""
+import numpy as np
+
+STROKE_DTYPE = np.dtype([
+    ("offset", np.int64),
+    ("length", np.int32),
+    ("width", np.float32),
+    ("color", np.uint32),
+    ("alive", np.uint8),
+    ("x0", np.float32), ("y0", np.float32),
+    ("x1", np.float32), ("y1", np.float32),
+], align=True)
+
+POINT_COLUMNS = ("x", "y", "pressure", "time")
+COMPACT_GARBAGE_RATIO = 0.5
+
+
+def _grown(array, needed):
+    """Return ``array`` or a copy with capacity >= ``needed`` (doubling)."""
+    if needed <= len(array):
+        return array
+    capacity = max(needed, 2 * len(array), 64)
+    bigger = np.zeros(capacity, dtype=array.dtype)
+    bigger[:len(array)] = array
+    return bigger
+
+
+class Stroke:
+    """Lightweight handle onto one row of a StrokeStore"""
+    __slots__ = ("store", "id")
+
+    def __init__(self, store, stroke_id):
+        self.store = store
+        self.id = stroke_id
+
+    def _slice(self):
+        row = self.store.table[self.id]
+        return slice(int(row["offset"]), int(row["offset"]) + int(row["length"]))
+
+    @property
+    def x(self):
+        return self.store.x[self._slice()]
+
+    @property
+    def y(self):
+        return self.store.y[self._slice()]
+
+    @property
+    def pressure(self):
+        return self.store.pressure[self._slice()]
+
+    @property
+    def time(self):
+        return self.store.time[self._slice()]
+
+    def arrays(self):
+        """(x, y, pressure) views in one lookup, for hot loops."""
+        s = self._slice()
+        return self.store.x[s], self.store.y[s], self.store.pressure[s]
+
+    @property
+    def points(self):
+        """(N, 2) float32 copy of the stroke's x/y samples."""
+        s = self._slice()
+        return np.column_stack((self.store.x[s], self.store.y[s]))
+
+    def __len__(self):
+        return int(self.store.table["length"][self.id])
+
+    @property
+    def width(self):
+        return float(self.store.table["width"][self.id])
+
+    @property
+    def color(self):
+        return int(self.store.table["color"][self.id])
+
+    @property
+    def alive(self):
+        return bool(self.store.table["alive"][self.id])
+
+    @property
+    def bounds(self):
+        row = self.store.table[self.id]
+        return (float(row["x0"]), float(row["y0"]), float(row["x1"]), float(row["y1"]))
+
+
+class StrokeStore:
+    """Packed stroke table plus shared float32 point columns"""
+
+    def __init__(self, point_capacity=4096, stroke_capacity=256):
+        self.x = np.zeros(point_capacity, dtype=np.float32)
+        self.y = np.zeros(point_capacity, dtype=np.float32)
+        self.pressure = np.zeros(point_capacity, dtype=np.float32)
+        self.time = np.zeros(point_capacity, dtype=np.float32)
+        self.table = np.zeros(stroke_capacity, dtype=STROKE_DTYPE)
+        self.point_count = 0
+        self.stroke_count = 0
+        self.garbage_points = 0
+
+    def __len__(self):
+        return self.stroke_count
+
+    def __getitem__(self, stroke_id):
+        if not 0 <= stroke_id < self.stroke_count:
+            raise KeyError(stroke_id)
+        return Stroke(self, stroke_id)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns and table, including spare capacity."""
+        return sum(getattr(self, c).nbytes for c in POINT_COLUMNS) + self.table.nbytes
+
+    # ==========================================================
+    #  Editing
+    # ==========================================================
+    def add(self, x, y, pressure=None, time=None, width=1.0, color=0xFF000000):
+        """Append a stroke from coordinate sequences and return its id."""
+        start, n = self._append_points(x, y, pressure, time)
+        stroke_id = self.stroke_count
+        self.table = _grown(self.table, stroke_id + 1)
+        row = self.table[stroke_id:stroke_id + 1]
+        row["offset"] = start
+        row["length"] = n
+        row["width"] = width
+        row["color"] = color
+        row["alive"] = 1
+        self.stroke_count += 1
+        self._update_bounds(stroke_id)
+        return stroke_id
+
+    def set_alive(self, stroke_id, alive):
+        """Soft-delete or restore a stroke without touching its points."""
+        self.table["alive"][stroke_id] = 1 if alive else 0
+
+    def set_style(self, stroke_id, width=None, color=None):
+        if width is not None:
+            self.table["width"][stroke_id] = width
+        if color is not None:
+            self.table["color"][stroke_id] = color
+        self._update_bounds(stroke_id)
+
+    def transform(self, stroke_id, matrix):
+        """Apply a 2x3 affine ``matrix`` ((a, b, tx), (c, d, ty)) in place."""
+        (a, b, tx), (c, d, ty) = matrix
+        s = self[stroke_id]._slice()
+        x, y = self.x[s].copy(), self.y[s].copy()
+        self.x[s] = a * x + b * y + tx
+        self.y[s] = c * x + d * y + ty
+        self._update_bounds(stroke_id)
+
+    def set_points(self, stroke_id, x, y, pressure=None, time=None):
+        """Replace a stroke's points, or give a purged stroke its points back."""
+        row = self.table[stroke_id:stroke_id + 1]
+        self.garbage_points += int(row["length"][0])
+        start, n = self._append_points(x, y, pressure, time)
+        row["offset"] = start
+        row["length"] = n
+        self._update_bounds(stroke_id)
+
+    def purge(self, stroke_id):
+        """Drop a stroke's points for good; its id is never reused."""
+        row = self.table[stroke_id:stroke_id + 1]
+        self.garbage_points += int(row["length"][0])
+        row["alive"] = 0
+        row["length"] = 0
+        if self.garbage_points > COMPACT_GARBAGE_RATIO * self.point_count:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the point columns without purged runs; ids stay stable."""
+        rows = self.table[:self.stroke_count]
+        lengths = rows["length"].astype(np.int64)
+        new_offsets = np.cumsum(lengths) - lengths
+        # Runs are copied in table order, which set_points may have broken
+        # in the columns, so every row's new offset points at its own run
+        index = (np.arange(int(lengths.sum()), dtype=np.int64) +
+                 np.repeat(rows["offset"] - new_offsets, lengths))
+        for column in POINT_COLUMNS:
+            data = getattr(self, column)
+            data[:len(index)] = data[index]
+        rows["offset"] = new_offsets
+        self.point_count = len(index)
+        self.garbage_points = 0
+
+    # ==========================================================
+    #  Queries
+    # ==========================================================
+    def alive_ids(self):
+        return np.flatnonzero(self.table["alive"][:self.stroke_count])
+
+    def bounds_of(self, ids):
+        """(n, 4) float32 array of x0, y0, x1, y1 for ``ids``."""
+        rows = self.table[ids]
+        return np.column_stack((rows["x0"], rows["y0"], rows["x1"], rows["y1"]))
+
+    # ==========================================================
+    #  Internals
+    # ==========================================================
+    def _append_points(self, x, y, pressure, time):
+        x = np.asarray(x, dtype=np.float32)
+        y = np.asarray(y, dtype=np.float32)
+        n = len(x)
+        if n == 0 or len(y) != n:
+            raise ValueError("a stroke needs matching, non-empty x and y arrays")
+        start = self.point_count
+        self._reserve_points(start + n)
+        self.x[start:start + n] = x
+        self.y[start:start + n] = y
+        self.pressure[start:start + n] = 1.0 if pressure is None else pressure
+        self.time[start:start + n] = 0.0 if time is None else time
+        self.point_count += n
+        return start, n
+
+    def _reserve_points(self, needed):
+        for column in POINT_COLUMNS:
+            setattr(self, column, _grown(getattr(self, column), needed))
+
+    def _update_bounds(self, stroke_id):
+        s = self[stroke_id]._slice()
+        row = self.table[stroke_id:stroke_id + 1]
+        pad = float(row["width"][0]) / 2
+        xs, ys = self.x[s], self.y[s]
+        row["x0"] = xs.min() - pad
+        row["y0"] = ys.min() - pad
+        row["x1"] = xs.max() + pad
+        row["y1"] = ys.max() + pad
+
+
+class StrokeBuilder:
+    """Growable float32 buffer for the stroke currently being drawn"""
+
+    def __init__(self, capacity=256):
+        self.data = np.zeros((capacity, 4), dtype=np.float32)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, x, y, pressure=1.0, time=0.0):
+        if self.count == len(self.data):
+            self.data = np.concatenate((self.data, np.zeros_like(self.data)))
+        self.data[self.count] = (x, y, pressure, time)
+        self.count += 1
+
+    @property
+    def x(self):
+        return self.data[:self.count, 0]
+
+    @property
+    def y(self):
+        return self.data[:self.count, 1]
+
+    @property
+    def pressure(self):
+        return self.data[:self.count, 2]
+
+    @property
+    def time(self):
+        return self.data[:self.count, 3]
@@ -0,0 +1,158 @@
+"""Byte-budgeted LRU cache of rendered tiles.
+
+Entries are identified by (level, tx, ty, version). The version of a tile
+position starts at 0 and is bumped whenever an edit dirties a world
+rectangle covering it, which both drops the cached image and lets a
+render that was already in flight for the old version be recognised as
+stale and refused when it lands.
+
+The cache knows nothing about what a tile is; callers pass the byte size
+along with the value. Counters for hits, misses, evictions and
+invalidations are kept so the budget can be tuned on small machines.
+"""
+import os
+from collections import OrderedDict
+from itertools import count
+
+from core.geometry import rect_intersects
+from core.tiles import tile_rect
+
+DEFAULT_BUDGET = int(os.environ.get("WHITEBOARD_TILE_CACHE_MB", "128")) * 2**20
+
+
+class TileCache:
+    """LRU map from tile position to (version, value, nbytes) under a byte budget"""
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.stale_puts = 0
+        self._entries = OrderedDict()   # (level, tx, ty) -> (version, value, nbytes)
+        self._versions = {}             # Positions whose version is not 0
+        self._pending = set()           # Positions with a render in flight
+        self._counter = count(1)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, position):
+        return position in self._entries
+
+    def __iter__(self):
+        return iter(list(self._entries))
+
+    # ==========================================================
+    #  Lookup & Insertion
+    # ==========================================================
+    def version(self, level, tx, ty):
+        """Current content version of a tile position."""
+        return self._versions.get((level, tx, ty), 0)
+
+    def get(self, level, tx, ty):
+        """Cached value for the current version, or None (counted as a miss)."""
+        position = (level, tx, ty)
+        entry = self._entries.get(position)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(position)
+        self.hits += 1
+        return entry[1]
+
+    def peek(self, level, tx, ty):
+        """Like ``get`` but without touching recency or counters."""
+        entry = self._entries.get((level, tx, ty))
+        return None if entry is None else entry[1]
+
+    def begin(self, level, tx, ty):
+        """Note that a render has started; returns the version it renders."""
+        self._pending.add((level, tx, ty))
+        return self.version(level, tx, ty)
+
+    def cancel(self, level, tx, ty):
+        """Forget an in-flight render that will never be ``put``."""
+        self._pending.discard((level, tx, ty))
+        self._forget_version((level, tx, ty))
+
+    def put(self, level, tx, ty, value, nbytes, version=None):
+        """Store a rendered tile; returns False if ``version`` is out of date."""
+        position = (level, tx, ty)
+        self._pending.discard(position)
+        current = self.version(level, tx, ty)
+        if version is not None and version != current:
+            self.stale_puts += 1
+            self._forget_version(position)
+            return False
+        old = self._entries.pop(position, None)
+        if old is not None:
+            self.nbytes -= old[2]
+        self._entries[position] = (current, value, nbytes)
+        self.nbytes += nbytes
+        self._evict()
+        return True
+
+    # ==========================================================
+    #  Invalidation & Eviction
+    # ==========================================================
+    def invalidate(self, rect):
+        """Drop and re-version every cached or pending tile meeting world ``rect``."""
+        dropped = 0
+        for position in list(self._entries) + list(self._pending):
+            if not rect_intersects(tile_rect(*position), rect):
+                continue
+            self._versions[position] = next(self._counter)
+            entry = self._entries.pop(position, None)
+            if entry is not None:
+                self.nbytes -= entry[2]
+                dropped += 1
+        self.invalidations += dropped
+        for position in list(self._versions):
+            self._forget_version(position)
+        return dropped
+
+    def clear(self):
+        """Drop everything; in-flight renders become stale."""
+        for position in self._pending:
+            self._versions[position] = next(self._counter)
+        self._entries.clear()
+        self.nbytes = 0
+        for position in list(self._versions):
+            self._forget_version(position)
+
+    def _evict(self):
+        while self.nbytes > self.budget and len(self._entries) > 1:
+            position, (_, _, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+            self._forget_version(position)
+
+    def _forget_version(self, position):
+        # A version only matters while a tile is cached or being rendered
+        if position not in self._entries and position not in self._pending:
+            self._versions.pop(position, None)
+
+    # ==========================================================
+    #  Telemetry
+    # ==========================================================
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Snapshot of the counters, for logging and the HUD."""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "stale_puts": self.stale_puts,
+        }
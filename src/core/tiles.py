@@ -0,0 +1,49 @@
+"""Tile pyramid arithmetic shared by the canvas and the tile renderers.
+
+World coordinates are unbounded floats. A tile at ``level`` L is a
+``TILE_SIZE`` x ``TILE_SIZE`` pixel image of the world rendered at a scale
+of ``2 ** L`` pixels per world unit, so every zoom factor maps onto the
+nearest level at or above it and is drawn with a small down-scale.
+"""
+import math
+
+TILE_SIZE = 256
+MIN_LEVEL = -16
+MAX_LEVEL = 12
+
+
+def level_for_zoom(zoom):
+    """Tile level whose scale is the smallest power of two >= ``zoom``."""
+    level = math.ceil(math.log2(zoom) - 1e-9)
+    return max(MIN_LEVEL, min(MAX_LEVEL, level))
+
+
+def level_scale(level):
+    """Pixels per world unit for tiles at ``level``."""
+    return 2.0 ** level
+
+
+def tile_world_size(level):
+    """Edge length of a tile at ``level`` in world units."""
+    return TILE_SIZE / level_scale(level)
+
+
+def tile_rect(level, tx, ty):
+    """World rectangle covered by tile (tx, ty) at ``level``."""
+    size = tile_world_size(level)
+    return (tx * size, ty * size, (tx + 1) * size, (ty + 1) * size)
+
+
+def tile_range(level, rect):
+    """Inclusive (tx0, ty0, tx1, ty1) index range of tiles touching ``rect``."""
+    size = tile_world_size(level)
+    return (math.floor(rect[0] / size), math.floor(rect[1] / size),
+            math.floor(rect[2] / size), math.floor(rect[3] / size))
+
+
+def tiles_for_rect(level, rect):
+    """Yield (tx, ty) for every tile at ``level`` touching ``rect``, row by row."""
+    tx0, ty0, tx1, ty1 = tile_range(level, rect)
+    for ty in range(ty0, ty1 + 1):
+        for tx in range(tx0, tx1 + 1):
+            yield tx, ty
@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+from PySide6.QtCore import QBuffer, QEvent, QIODevice, QMarginsF, QPointF, Qt
+from PySide6.QtGui import QColor, QImage, QMouseEvent, QPageSize, QPainter, QPdfWriter
+from PySide6.QtWidgets import QApplication
+
+from core.assets import (AssetCache, AssetStore, composite_image, downsample, mip_count,
+                         mip_for_scale)
+from core.board import Board
+from core.tiles import TILE_SIZE
+from ui.rendering.asset_loader import AssetLoader
+from ui.rendering.qimage_utils import image_buffer
+from ui.rendering.tile_renderer import TileRenderer
+from ui.widgets.canvas import Canvas
+
+
+def png_bytes(width, height, color):
+    QApplication.instance() or QApplication([])
+    image = QImage(width, height, QImage.Format_ARGB32)
+    image.fill(QColor(color))
+    device = QBuffer()
+    device.open(QIODevice.WriteOnly)
+    image.save(device, "PNG")
+    return bytes(device.data())
+
+
+def pdf_bytes(pages):
+    QApplication.instance() or QApplication([])
+    device = QBuffer()
+    device.open(QIODevice.WriteOnly)
+    writer = QPdfWriter(device)
+    writer.setPageSize(QPageSize(QPageSize.A6))
+    writer.setPageMargins(QMarginsF(0, 0, 0, 0))
+    painter = QPainter(writer)
+    for i, color in enumerate(pages):
+        if i:
+            writer.newPage()
+        painter.fillRect(0, 0, 10000, 10000, QColor(color))
+    painter.end()
+    return bytes(device.data())
+
+
+def test_mip_selection_and_downsample():
+    assert mip_count(64, 10) == 1
+    assert mip_count(1000, 300) == 5
+    # A 1024 px wide image shown 256 px wide wants the quarter-size level
+    assert mip_for_scale(1024, (0, 0, 256, 100), 1.0, 5) == 2
+    assert mip_for_scale(1024, (0, 0, 256, 100), 8.0, 5) == 0
+    assert mip_for_scale(1024, (0, 0, 256, 100), 1 / 64, 5) == 4
+    pixels = np.array([[0xFF000000, 0xFFFFFFFF, 0xFF0000FF]] * 3, dtype=np.uint32)
+    half = downsample(pixels)
+    assert half.shape == (2, 2)
+    assert half[0, 0] == 0xFF808080 and half[1, 1] == 0xFF0000FF
+
+
+def test_composite_image_scales_and_blends():
+    target = np.full((8, 8), 0xFF000000, dtype=np.uint32)
+    pixels = np.array([[0xFFFF0000, 0x80000080]], dtype=np.uint32)   # Opaque red, half blue
+    composite_image(target, pixels, (2, 2, 6, 4), 0.0, 0.0, 1.0)
+    assert (target[2:4, 2:4] == 0xFFFF0000).all()
+    assert (target[2:4, 4:6] == 0xFF000080).all()
+    assert target[1, 3] == target[4, 3] == target[3, 6] == 0xFF000000
+
+
+def test_store_deduplicates_and_maps_levels(tmp_path):
+    store = AssetStore(str(tmp_path))
+    loader = AssetLoader(store)
+    data = png_bytes(300, 200, "#336699")
+    first, meta = loader.import_data(data)
+    second, _ = loader.import_data(data)
+    assert first == second and meta == {"kind": "image", "pages": [[300, 200]]}
+    assert len(os.listdir(tmp_path)) == 1
+    # Every level was written by the one decode, each readable as a memory map
+    levels = [store.open_level(first, 0, mip) for mip in range(mip_count(300, 200))]
+    assert [level.shape for level in levels] == [(200, 300), (100, 150), (50, 75), (25, 38)]
+    assert isinstance(levels[0], np.memmap) and levels[2][10, 10] == 0xFF336699
+
+
+def test_cache_picks_level_for_zoom_and_evicts(tmp_path):
+    store = AssetStore(str(tmp_path))
+    loader = AssetLoader(store)
+    asset_id, _ = loader.import_data(png_bytes(512, 512, "#ff0000"))
+    requested = []
+    cache = AssetCache(store, request=lambda *key: requested.append(key))
+    assert cache.pixels(asset_id, 0, (0, 0, 128, 128), 1.0).shape == (128, 128)
+    assert cache.pixels(asset_id, 0, (0, 0, 128, 128), 4.0).shape == (512, 512)
+    assert len(cache) == 2 and not requested
+    assert cache.retain({("another", 0)}) == 2 and len(cache) == 0 and cache.nbytes == 0
+
+
+def test_pdf_pages_render_lazily_per_level(tmp_path):
+    store = AssetStore(str(tmp_path))
+    loader = AssetLoader(store)
+    asset_id, meta = loader.import_data(pdf_bytes(["#ff0000", "#0000ff"]))
+    assert meta["kind"] == "pdf" and len(meta["pages"]) == 2
+    assert not store.has_level(asset_id, 1, 0)
+    cache = AssetCache(store, request=loader.request)
+    width, height = meta["pages"][1]
+    pixels = cache.pixels(asset_id, 1, (0, 0, width / 8, height / 8), 1.0)
+    assert pixels.shape[1] == -(-width // 8) and pixels[5, 5] == 0xFF0000FF
+    assert [name for name in os.listdir(store.path(asset_id)) if name.endswith(".pix")] == ["p1m3.pix"]
+
+
+def test_tiles_draw_images_beneath_strokes(tmp_path):
+    store = AssetStore(str(tmp_path))
+    loader = AssetLoader(store)
+    asset_id, _ = loader.import_data(png_bytes(64, 64, "#00ff00"))
+    board = Board()
+    board.add_image(asset_id, (10, 10, 74, 74))
+    board.add_stroke([(0, 40), (100, 40)], 4.0, 0xFFFF0000)
+    assert [image.asset for image in board.images_in_rect((0, 0, 20, 20))] == [asset_id]
+    pixels = image_buffer(TileRenderer(board, AssetCache(store)).render_tile(0, 0, 0))
+    assert pixels[20, 20] == 0xFF00FF00
+    assert pixels[40, 20] == 0xFFFF0000
+    assert pixels[5, 5] == 0 and pixels[80, 80] == 0
+
+
+def test_canvas_inserts_pdf_pages_and_redraws_when_decoded(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=1, asset_store=AssetStore(str(tmp_path)))
+    canvas.resize(2 * TILE_SIZE, 2 * TILE_SIZE)
+    ids = canvas.insert_asset(pdf_bytes(["#ff0000", "#00ff00"]), 200, 0)
+    first, second = (canvas.board.images()[i] for i in ids)
+    assert first.rect[0] < 200 < first.rect[2] and second.rect[1] > first.rect[3]
+    canvas.offset = QPointF(first.rect[0], first.rect[1])
+    canvas.grab()
+    canvas.asset_loader.wait()
+    canvas.render_pool.wait()
+    canvas.grab()
+    canvas.render_pool.wait()
+    image = canvas.grab().toImage()
+    assert image.pixelColor(20, 20) == QColor("#ff0000")
+    canvas.render_pool.shutdown()
+
+
+def test_canvas_places_images_as_undoable_selectable_edits(tmp_path):
+    QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=1, asset_store=AssetStore(str(tmp_path)))
+    ids = canvas.insert_asset(pdf_bytes(["#ff0000", "#00ff00"]), 200, 0)
+    photo, = canvas.insert_asset(png_bytes(64, 64, "#0000ff"), 1000, 0)
+    canvas.undo()
+    assert [image.id for image in canvas.board.images()] == ids   # Both pages went together
+    canvas.redo()
+
+    x0, y0, x1, y1 = canvas.board.image(photo).rect
+    canvas.lasso_points = [(x0 - 5, y0 - 5), (x1 + 5, y0 - 5), (x1 + 5, y1 + 5), (x0 - 5, y1 + 5)]
+    canvas.mouseReleaseEvent(QMouseEvent(QEvent.MouseButtonRelease, QPointF(0, 0), QPointF(0, 0),
+                                         Qt.LeftButton, Qt.NoButton, Qt.NoModifier))
+    assert canvas.selected_images == [photo] and canvas.selection == []
+    canvas.delete_selection()
+    assert canvas.board.image(photo) is None
+    canvas.undo()
+    assert canvas.board.image(photo).rect == (x0, y0, x1, y1)
+    canvas.render_pool.shutdown()
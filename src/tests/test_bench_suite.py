@@ -0,0 +1,13 @@
+from benchmarks.bench_suite import compare
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"pan_zoom": {"steps_per_s": 100.0, "frame_p95_ms": 10.0, "peak_rss_mb": 200.0}}
+    results = {"pan_zoom": {"steps_per_s": 70.0, "frame_p95_ms": 12.0, "peak_rss_mb": 300.0,
+                            "new_metric_ms": 5.0},
+               "drag": {"input_p50_ms": 1.0}}
+    regressed = {(scenario, metric) for scenario, metric, _, _ in compare(results, baseline)}
+    assert regressed == {("pan_zoom", "steps_per_s"), ("pan_zoom", "peak_rss_mb")}
+    assert compare(results, baseline, tolerance=0.6) == []
+    # Sub-millisecond jitter is not a regression however large the ratio
+    assert compare({"drag": {"input_p50_ms": 0.3}}, {"drag": {"input_p50_ms": 0.1}}) == []
@@ -0,0 +1,101 @@
+import numpy as np
+
+from core.board import Board
+from core.board_file import IMAGE_DTYPE, BoardDocument, BoardFile
+
+
+def grid_board(n=10, spacing=1000.0):
+    board = Board()
+    for i in range(n):
+        for j in range(n):
+            x, y = i * spacing, j * spacing
+            board.add_stroke([(x, y), (x + 50, y + 20), (x + 90, y)], 2.0,
+                             pressure=[0.2, 0.6, 1.0])
+    return board
+
+
+def test_round_trip_preserves_strokes(tmp_path):
+    path = str(tmp_path / "grid.wbd")
+    source = grid_board()
+    BoardDocument(source).save(path)
+
+    board = Board()
+    document = BoardDocument(board, path)
+    document.load_all()
+    assert len(board) == len(source)
+    assert not document.modified
+    loaded = sorted(tuple(s.bounds) for s in board.strokes())
+    assert loaded == sorted(tuple(s.bounds) for s in source.strokes())
+    assert np.allclose(sorted(float(s.pressure[1]) for s in board.strokes()), 0.6)
+
+
+def test_open_loads_only_viewport_chunks(tmp_path):
+    path = str(tmp_path / "grid.wbd")
+    BoardDocument(grid_board(), path, chunk_size=2048).save(path)
+
+    board = Board()
+    document = BoardDocument(board, path)
+    assert len(board) == 0
+    document.ensure_region((0, 0, 1500, 1500))
+    assert 0 < len(board) < 100
+    assert len(document.loaded) == 1
+
+
+def test_incremental_save_writes_only_dirty_chunks(tmp_path):
+    path = str(tmp_path / "grid.wbd")
+    document = BoardDocument(grid_board(), path)
+    full = document.save(path)
+
+    board = Board()
+    document = BoardDocument(board, path)
+    document.ensure_region((0, 0, 10, 10))
+    board.remove_stroke(board.strokes()[0].id)
+    board.add_stroke([(9000, 9000), (9010, 9010)])
+    written = document.save()
+    assert 0 < written < full / 10
+
+    reopened = Board()
+    BoardDocument(reopened, path).load_all()
+    assert len(reopened) == 100
+    assert len(BoardFile(path).chunks) == 25
+
+
+def test_moved_stroke_changes_chunk(tmp_path):
+    path = str(tmp_path / "grid.wbd")
+    board = grid_board(n=2)
+    document = BoardDocument(board, path, chunk_size=2048)
+    document.save()
+    board.transform_strokes([0], ((1, 0, 5000), (0, 1, 0)))
+    assert document.dirty == {(0, 0), (2, 0)}
+    document.save()
+
+    reloaded = Board()
+    BoardDocument(reloaded, path).load_all()
+    assert max(s.bounds[0] for s in reloaded.strokes()) > 4990
+
+
+def test_image_placements_are_saved_and_carried_over(tmp_path):
+    path = str(tmp_path / "grid.wbd")
+    board = grid_board(n=2)
+    board.add_image("a" * 64, (10, 10, 74.5, 74))
+    board.add_image("b" * 64, (0, 100, 50, 150), page=3)
+    document = BoardDocument(board, path)
+    assert document.modified
+    document.save()
+
+    reopened = Board()
+    document = BoardDocument(reopened, path)
+    assert not document.modified
+    assert [(i.asset[0], i.page, i.rect) for i in reopened.images()] == \
+        [("a", 0, (10, 10, 74.5, 74)), ("b", 3, (0, 100, 50, 150))]
+    # Stroke-only saves keep the images; removing one rewrites the table
+    document.ensure_region((0, 0, 10, 10))
+    reopened.add_stroke([(500, 500), (510, 510)])
+    document.save()
+    assert len(BoardFile(path).images) == 2 * IMAGE_DTYPE.itemsize
+    reopened.remove_image(reopened.images()[0].id)
+    assert document.modified
+    document.save()
+    again = Board()
+    BoardDocument(again, path)
+    assert [i.page for i in again.images()] == [3]
@@ -0,0 +1,59 @@
+from PySide6.QtCore import QPointF
+from PySide6.QtWidgets import QApplication
+from core.tiles import TILE_SIZE, level_for_zoom, tile_rect, tiles_for_rect
+from ui.widgets.canvas import Canvas
+
+
+def make_canvas(workers=0):
+    app = QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=workers)
+    canvas.resize(2 * TILE_SIZE, 2 * TILE_SIZE)
+    return app, canvas
+
+
+def test_level_for_zoom():
+    assert level_for_zoom(1.0) == 0
+    assert level_for_zoom(1.5) == 1
+    assert level_for_zoom(0.5) == -1
+    assert level_for_zoom(0.3) == -1
+
+
+def test_tile_rect_covers_world():
+    assert tile_rect(0, 0, 0) == (0, 0, TILE_SIZE, TILE_SIZE)
+    assert tile_rect(1, -1, 0) == (-TILE_SIZE / 2, 0, 0, TILE_SIZE / 2)
+    assert list(tiles_for_rect(0, (10, 10, TILE_SIZE + 1, 20))) == [(0, 0), (1, 0)]
+
+
+def test_pan_reuses_cached_tiles():
+    app, canvas = make_canvas()
+    canvas.grab()
+    rendered = canvas.tiles_rendered
+    canvas.pan_by(TILE_SIZE, 0)
+    canvas.grab()
+    # Only the newly exposed column is rendered
+    assert canvas.tiles_rendered - rendered == 3
+    canvas.pan_by(-TILE_SIZE, 0)
+    canvas.grab()
+    assert canvas.tiles_rendered - rendered == 3
+
+
+def test_edit_invalidates_only_touched_tiles():
+    app, canvas = make_canvas()
+    canvas.grab()
+    cached = len(canvas.tiles)
+    canvas.board.add_stroke([(10, 10), (20, 20)], 2.0)
+    assert len(canvas.tiles) == cached - 1
+    assert canvas.world_to_screen(*canvas.screen_to_world(QPointF(5, 7))) == QPointF(5, 7)
+
+
+def test_pixel_eraser_cuts_along_its_drag():
+    app, canvas = make_canvas()
+    xs = [float(x) for x in range(0, 201, 4)]
+    stroke = canvas.history.add_stroke([(x, 100.0) for x in xs], 2.0)
+    canvas.set_tool("pixel_eraser")
+    canvas.erase_at(QPointF(100, 50))
+    canvas.erase_at(QPointF(100, 150))     # The drag crosses the stroke between events
+    assert canvas.board.stroke(stroke) is None
+    assert len(canvas.board) == 2
+    canvas.undo()
+    assert canvas.board.store.alive_ids().tolist() == [stroke]
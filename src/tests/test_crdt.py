@@ -0,0 +1,132 @@
+import asyncio
+import random
+
+import numpy as np
+
+from core.board import Board
+from core.collab import BoardBinding, CollabClient, Relay
+from core.crdt import (BoardCRDT, COLOR, POINTS, REMOVE, WIDTH, coalesce,
+                       decode_ops, encode_ops)
+
+
+def line(i, n=30):
+    return np.column_stack((np.arange(n) + i, np.full(n, float(i)), np.ones(n)))
+
+
+def test_replicas_converge_under_any_interleaving():
+    a, b, c = BoardCRDT(1), BoardCRDT(2), BoardCRDT(3)
+    ops_a = [a.add(line(0), 2.0, 0xFF0000FF), a.add(line(1), 2.0, 0xFF00FF00)]
+    ops_b = [b.add(line(2), 3.0, 0xFFFF0000)]
+    for op in ops_a:
+        b.apply(op)
+    ops_b.append(b.set(ops_a[0].target, COLOR, 0xFFFFFFFF))    # Concurrent with...
+    ops_a.append(a.set(ops_a[0].target, COLOR, 0xFF123456))    # ...this write
+    ops_a.append(a.remove(ops_a[1].target))
+
+    rng = random.Random(4)
+    for op in ops_a[:2]:
+        c.apply(op)     # b's edit depends on these: causal delivery sends them first
+    for replica, streams in ((a, [ops_b]), (b, [ops_a[2:]]), (c, [ops_a[2:], ops_b])):
+        streams = [list(s) for s in streams]
+        while any(streams):
+            stream = rng.choice([s for s in streams if s])
+            replica.apply(stream.pop(0))
+            replica.apply(stream[0]) if stream else None    # Duplicates are ignored
+    assert a.digest() == b.digest() == c.digest()
+    assert len(a) == 2 and a.tombstones == 1
+    assert a.get(ops_a[0].target, COLOR) == b.get(ops_a[0].target, COLOR)
+
+
+def test_binary_delta_round_trip_and_compression():
+    replica = BoardCRDT(7)
+    ops = [replica.add(line(i, 200), 2.5, 0xFF00FF00) for i in range(5)]
+    ops.append(replica.set(ops[0].target, WIDTH, 4.0))
+    ops.append(replica.set(ops[1].target, POINTS, line(9, 10)))
+    ops.append(replica.remove(ops[2].target))
+    frame = encode_ops(ops)
+    assert frame[0] == 1                        # Compressed
+    other = BoardCRDT(8)
+    for op in decode_ops(frame):
+        other.apply(op)
+    assert other.digest() == replica.digest()
+
+
+def test_coalesce_drops_superseded_ops():
+    replica = BoardCRDT(1)
+    kept = replica.add(line(0), 1.0, 0xFF000000)
+    gone = replica.add(line(1), 1.0, 0xFF000000)
+    batch = [kept, gone,
+             replica.set(kept.target, COLOR, 1), replica.set(kept.target, COLOR, 2),
+             replica.remove(gone.target)]
+    ops = coalesce(batch)
+    assert [op.kind for op in ops] == [kept.kind, batch[3].kind]
+    assert ops[1].value == 2
+
+
+def test_tombstones_are_collected_once_stable():
+    replica = BoardCRDT(1)
+    op = replica.add(line(0), 1.0, 0xFF000000)
+    removal = replica.remove(op.target)
+    assert removal.kind == REMOVE
+    assert replica.collect({1: removal.counter - 1}) == 0
+    assert replica.collect({1: removal.counter}) == 1
+    assert replica.tombstones == 0 and not replica.order
+
+
+def test_relay_syncs_boards_and_late_joiners():
+    async def scenario():
+        relay = await Relay(port=0, flush_interval=0.005).start()
+        boards, clients = [], []
+        for site in (1, 2):
+            board = Board()
+            client = await CollabClient(BoardCRDT(site), port=relay.port,
+                                        flush_interval=0.005).connect()
+            binding = BoardBinding(board, client.replica, client.submit)
+            client.listeners.append(binding.apply_remote)
+            boards.append(board)
+            clients.append(client)
+
+        first = boards[0].add_stroke(line(0)[:, :2], 2.0)
+        boards[1].add_stroke(line(5)[:, :2], 4.0)
+        await asyncio.sleep(0.1)
+        boards[1].restyle_strokes(boards[1].ids_in_rect((-1e9, -1e9, 1e9, 1e9))[:1],
+                                  color=0xFFABCDEF)
+        boards[0].remove_stroke(first)
+        await asyncio.sleep(0.1)
+
+        late = await CollabClient(BoardCRDT(3), port=relay.port).connect()
+        await asyncio.sleep(0.1)
+        digests = {c.replica.digest() for c in clients + [late]}
+        sizes = [len(board) for board in boards]
+        colors = {int(s.color) for board in boards for s in board.strokes()}
+        tombstones = relay.replica.tombstones
+        for client in clients + [late]:
+            await client.close()
+        await relay.close()
+        return digests, sizes, colors, tombstones
+
+    digests, sizes, colors, tombstones = asyncio.run(scenario())
+    assert len(digests) == 1
+    assert sizes == [1, 1]
+    assert colors == {0xFFABCDEF}
+    assert tombstones == 0
+
+
+def test_binding_ignores_strokes_paged_in_from_the_file(tmp_path):
+    from core.board_file import BoardDocument
+    path = str(tmp_path / "board.wbd")
+    source = Board()
+    for i in range(20):
+        source.add_stroke(line(i * 500)[:, :2], 2.0)
+    BoardDocument(source).save(path)
+
+    board = Board()
+    document = BoardDocument(board, path)
+    sent = []
+    binding = BoardBinding(board, BoardCRDT(1), sent.append, document)
+    document.ensure_region((0, 0, 3000, 3000))
+    document.load_all()
+    assert len(board) == 20 and sent == []
+    board.add_stroke(line(7)[:, :2], 2.0)
+    assert len(sent) == 1
+    binding.close()
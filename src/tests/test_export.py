@@ -0,0 +1,101 @@
+import zlib
+import xml.etree.ElementTree as ElementTree
+
+import numpy as np
+from PySide6.QtCore import QSize
+from PySide6.QtGui import QImage
+from PySide6.QtPdf import QPdfDocument
+from PySide6.QtWidgets import QApplication
+
+from core.board import Board
+from core.board_file import BoardDocument
+from core.export import adler32_combine, channels, page_grid, page_strips
+from ui.export import export_board, headless_assets
+from ui.rendering.qimage_utils import image_buffer
+from ui.rendering.tile_renderer import TileRenderer
+
+
+def scatter_board(n=200, seed=1):
+    rng = np.random.default_rng(seed)
+    board = Board()
+    for i, (x, y) in enumerate(rng.uniform(0, 1000, (n, 2))):
+        board.add_stroke([(x, y), (x + 60, y + 25), (x + 90, y - 15)], 4.0,
+                         0xFFFF0000 if i % 2 else 0x80FFFFFF)
+    return board
+
+
+def test_checksums_combine_and_pixels_unpremultiply():
+    a, b = b"tiles" * 999, bytes(range(256)) * 300
+    assert adler32_combine(zlib.adler32(a), zlib.adler32(b), len(b)) == zlib.adler32(a + b)
+    # Half-transparent red, premultiplied
+    pixels = np.array([[0x80800000, 0xFF0000FF, 0]], dtype=np.uint32)
+    assert channels(pixels, True).tolist() == [[[255, 0, 0, 128], [0, 0, 255, 255], [0, 0, 0, 0]]]
+    assert channels(pixels[:, 1:2], False).tolist() == [[[0, 0, 255]]]
+
+
+def test_layout_covers_every_pixel_once():
+    pages = page_grid(1000, 700, 600, 500)
+    assert pages == [(0, 0, 600, 500), (600, 0, 400, 500), (0, 500, 600, 200), (600, 500, 400, 200)]
+    strips = page_strips(pages[0])
+    assert [s[1] for s in strips] == [0, 256] and sum(s[3] for s in strips) == 500
+
+
+def test_png_matches_tiles_and_processes_match_inline(tmp_path):
+    QApplication.instance() or QApplication([])
+    board = scatter_board()
+    path = str(tmp_path / "board.wbd")
+    BoardDocument(board).save(path)
+
+    inline, parallel = str(tmp_path / "inline.png"), str(tmp_path / "parallel.png")
+    assert export_board(board, inline, (0, 0, 512, 300), 1.0, background=None) == (512, 300, 1)
+    export_board(path, parallel, (0, 0, 512, 300), 1.0, workers=2, background=None)
+    image = QImage(inline)
+    assert image == QImage(parallel)
+
+    # The same pixels as the canvas's own tile at level 0
+    tile = TileRenderer(board).render_tile(0, 1, 0)
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    expected, exported = image_buffer(tile), image_buffer(image)
+    difference = exported[:256, 256:512].view(np.uint8).astype(int) - expected.view(np.uint8)
+    assert np.abs(difference).max() <= 1       # Straight 8-bit alpha rounds on the way
+
+
+def test_pdf_pages_and_svg_strips(tmp_path):
+    QApplication.instance() or QApplication([])
+    board = scatter_board()
+    png, pdf, svg = (str(tmp_path / f"board.{kind}") for kind in ("png", "pdf", "svg"))
+    rect = (0, 0, 1000, 700)
+    export_board(board, png, rect, 0.5)
+    assert export_board(board, pdf, rect, 0.5, page_size=(300, 200), dpi=72) == (500, 350, 4)
+
+    document = QPdfDocument()
+    document.load(pdf)
+    assert document.pageCount() == 4 and document.pagePointSize(1).toSize() == QSize(200, 200)
+    page = document.render(1, QSize(200, 200)).convertToFormat(QImage.Format_RGB32)
+    assert page == QImage(png).copy(300, 0, 200, 200).convertToFormat(QImage.Format_RGB32)
+
+    export_board(board, svg, rect, 0.5)
+    root = ElementTree.parse(svg).getroot()
+    assert root.get("width") == "500" and [image.get("y") for image in root] == ["0", "256"]
+
+
+def test_images_reach_worker_processes_and_the_default_rect(tmp_path):
+    QApplication.instance() or QApplication([])
+    green = QImage(64, 64, QImage.Format_ARGB32)
+    green.fill(0xFF00FF00)
+    green.save(str(tmp_path / "green.png"))
+    assets = headless_assets(str(tmp_path / "assets"))
+    with open(tmp_path / "green.png", "rb") as f:
+        asset_id = assets.store.add(f.read())
+    assets.store.set_meta(asset_id, "image", [(64, 64)])
+    board = Board()
+    board.add_image(asset_id, (-300, 0, -236, 64))
+    board.add_stroke([(0, 40), (100, 40)], 4.0, 0xFFFF0000)
+    path = str(tmp_path / "board.wbd")
+    BoardDocument(board).save(path)
+
+    for workers in (1, 2):
+        out = str(tmp_path / f"board{workers}.png")
+        assert export_board(path, out, workers=workers, assets=assets)[0] == 402
+        image = QImage(out)
+        assert image.pixel(20, 20) == 0xFF00FF00 and image.pixel(350, 40) == 0xFFFF0000
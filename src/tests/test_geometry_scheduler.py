@@ -0,0 +1,63 @@
+from PySide6.QtCore import QPoint, QRect
+from PySide6.QtWidgets import QApplication, QWidget
+from core.tiles import TILE_SIZE
+from ui.geometry_scheduler import GeometryScheduler
+from ui.widgets.canvas import Canvas
+
+
+def make_window():
+    app = QApplication.instance() or QApplication([])
+    window = QWidget()
+    window.setGeometry(100, 100, 400, 300)
+    return app, window, GeometryScheduler(window)
+
+
+def test_requests_coalesce_into_one_update():
+    app, window, scheduler = make_window()
+    for i in range(1, 20):
+        scheduler.request_move(QPoint(100 + i, 100))
+    assert window.pos() == QPoint(100, 100)     # Nothing applied before the frame
+    scheduler.flush()
+    assert window.pos() == QPoint(119, 100)
+    assert (scheduler.applied, scheduler.coalesced) == (1, 18)
+
+    scheduler.request_geometry(QRect(50, 60, 500, 400))
+    scheduler.request_move(QPoint(70, 80))      # Moves the pending rect
+    scheduler.flush()
+    assert window.geometry() == QRect(70, 80, 500, 400)
+    assert scheduler.applied == 2
+    scheduler.flush()                           # Nothing pending: no-op
+    assert scheduler.applied == 2
+
+
+def test_size_change_starts_and_settles_a_resize():
+    app, window, scheduler = make_window()
+    events = []
+    scheduler.resize_started.connect(lambda: events.append("started"))
+    scheduler.resize_settled.connect(lambda: events.append("settled"))
+    scheduler.request_move(QPoint(10, 10))
+    scheduler.flush()
+    assert events == []
+    for width in (420, 440, 460):
+        scheduler.request_geometry(QRect(10, 10, width, 300))
+        scheduler.flush()
+    assert events == ["started"] and scheduler.resizing
+    scheduler.settle()
+    assert events == ["started", "settled"] and not scheduler.resizing
+
+
+def test_canvas_stretches_last_frame_while_resizing():
+    app = QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=0)
+    canvas.resize(2 * TILE_SIZE, 2 * TILE_SIZE)
+    canvas.show()
+    canvas.grab()
+    canvas.begin_interactive_resize()
+    rendered = canvas.tiles_rendered
+    canvas.resize(4 * TILE_SIZE, 3 * TILE_SIZE)
+    canvas.grab()
+    assert canvas.tiles_rendered == rendered    # No tiles drawn mid-resize
+    canvas.end_interactive_resize()
+    canvas.grab()
+    assert canvas.tiles_rendered > rendered
+    canvas.close()
@@ -0,0 +1,118 @@
+import numpy as np
+
+from core.board import Board
+from core.history import History
+
+
+def snapshot(board):
+    return {s.id: (s.points.tolist(), float(s.width), int(s.color)) for s in board.strokes()}
+
+
+def scribble(board, i):
+    return [(i * 10.0, 0.0), (i * 10.0 + 5, 5.0), (i * 10.0 + 2, 9.0)]
+
+
+def test_every_operation_undoes_and_redoes():
+    board = Board()
+    history = History(board)
+    a = history.add_stroke(scribble(board, 0), 2.0, 0xFF112233)
+    b = history.add_stroke(scribble(board, 1), 2.0)
+    states = [snapshot(board)]
+    history.transform([a, b], ((1, 0, 30), (0, 2, -5)))
+    states.append(snapshot(board))
+    history.restyle([a], width=6.0, color=0xFFFF0000)
+    states.append(snapshot(board))
+    history.erase([b])
+    states.append(snapshot(board))
+
+    for expected in reversed(states[:-1]):
+        assert history.undo() == 1
+        got = snapshot(board)
+        assert got.keys() == expected.keys()
+        for i in got:
+            np.testing.assert_allclose(got[i][0], expected[i][0], atol=1e-4)
+            assert got[i][1:] == expected[i][1:]
+    assert history.redo(3) == 3
+    assert snapshot(board).keys() == states[-1].keys()
+    assert board.stroke(b) is None and board.stroke(a).width == 6.0
+
+
+def test_images_undo_in_place_step_by_step_and_across_checkpoints():
+    board = Board()
+    history = History(board, checkpoint_every=4)
+    ids = [history.add_image("a" * 64, (i * 100, 0, i * 100 + 50, 50)) for i in range(3)]
+    history.remove_images([ids[0], ids[2]])
+    assert [image.id for image in board.images()] == [ids[1]]
+    history.undo()
+    assert [image.id for image in board.images()] == ids       # Paint order kept
+    history.redo()
+    history.undo(4)                                             # Through the block's delta
+    assert board.images() == [] and not history.can_undo
+    history.redo(4)
+    assert [image.id for image in board.images()] == [ids[1]]
+    history.undo(2)
+    assert [image.rect for image in board.images()] == [(0, 0, 50, 50), (100, 0, 150, 50)]
+
+
+def test_checkpoint_makes_long_undo_proportional_to_changes():
+    board = Board()
+    history = History(board, checkpoint_every=8)
+    stroke = history.add_stroke(scribble(board, 0))
+    for _ in range(31):
+        history.transform([stroke], ((1, 0, 1), (0, 1, 0)))
+    assert history.undo_depth == 32
+
+    version = board.version
+    assert history.undo(32) == 32
+    # Four compacted blocks, one board edit each (plus the removal), not 32 steps
+    assert board.version - version == 5
+    assert board.stroke(stroke) is None
+    assert history.redo(32) == 32
+    assert board.stroke(stroke).x[0] == np.float32(31.0)
+
+
+def test_grouped_edits_form_one_step_and_new_edits_drop_redo():
+    board = Board()
+    history = History(board)
+    ids = [history.add_stroke(scribble(board, i)) for i in range(3)]
+    with history.group():
+        history.erase([ids[0]])
+        history.erase([ids[1]])
+    assert len(board) == 1
+    history.undo()
+    assert len(board) == 3
+
+    history.undo()                          # Un-add the third stroke
+    history.add_stroke(scribble(board, 9))  # ...and branch off
+    assert not history.can_redo
+    assert board.store.table["length"][ids[2]] == 0     # Purged for good
+
+
+def test_memory_cap_forgets_oldest_steps():
+    board = Board()
+    history = History(board, limit=2000)
+    ids = [board.add_stroke(np.zeros((20, 2)) + i) for i in range(10)]
+    for stroke_id in ids:
+        history.erase([stroke_id])
+    assert history.nbytes <= 2000
+    depth = history.undo_depth
+    assert 0 < depth < 10
+    # Strokes whose erase was forgotten can never come back
+    assert board.store.table["length"][ids[0]] == 0
+    assert history.undo(10) == depth
+    assert len(board) == depth
+
+
+def test_spill_to_disk_keeps_full_depth():
+    board = Board()
+    history = History(board, limit=2000, spill=True)
+    ids = [board.add_stroke(np.arange(40, dtype=np.float32).reshape(20, 2) + i)
+           for i in range(10)]
+    before = snapshot(board)
+    for stroke_id in ids:
+        history.erase([stroke_id])
+    assert history.nbytes <= 2000
+    assert board.store.table["length"][ids[0]] == 0     # Points live on disk now
+
+    assert history.undo(10) == 10
+    assert snapshot(board) == before
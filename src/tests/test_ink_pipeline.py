@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+from core.geometry import polyline_distance
+from core.ink_pipeline import InkPipeline
+
+
+def feed(pipeline, samples, zoom=1.0):
+    pipeline.begin(zoom)
+    for i, (x, y) in enumerate(samples):
+        pipeline.add(x, y, 1.0, i / 200)
+    return pipeline.finish()
+
+
+def test_straight_line_collapses_to_endpoints():
+    samples = [(i * 0.5, 0.0) for i in range(400)]
+    out = feed(InkPipeline(window=1000), samples)
+    assert len(out) == 2
+    assert (out.x[0], out.x[-1]) == (0.0, 199.5)
+
+
+def test_curve_stays_within_tolerance():
+    samples = [(100 * math.cos(a), 100 * math.sin(a))
+               for a in np.linspace(0, math.pi, 600)]
+    out = feed(InkPipeline(tolerance=0.5), samples)
+    assert len(out) < len(samples) / 3
+    worst = max(polyline_distance(out.x, out.y, x, y) for x, y in samples)
+    assert worst < 1.0
+
+
+def test_tolerance_scales_with_zoom():
+    samples = [(i * 0.05, math.sin(i * 0.05)) for i in range(200)]
+    coarse = feed(InkPipeline(tolerance=1.0), samples, zoom=1.0)
+    fine = feed(InkPipeline(tolerance=1.0), samples, zoom=16.0)
+    assert len(fine) > len(coarse)
+
+
+def test_window_bounds_pending_run():
+    pipeline = InkPipeline(window=8)
+    pipeline.begin()
+    for i in range(100):
+        pipeline.add(float(i), 0.0)
+        assert len(pipeline.tail()) <= 8 + 2
+
+
+def test_prediction_extrapolates_and_is_clamped():
+    pipeline = InkPipeline()
+    pipeline.begin(zoom=2.0)
+    assert pipeline.predict(0.016) == []
+    for i in range(5):
+        pipeline.add(i * 1.0, 0.0, 1.0, i * 0.01)       # 100 units/s along x
+    (x, y), = pipeline.predict(0.05)
+    assert (x, y) == (pytest.approx(9.0), 0.0)
+    (x, y), = pipeline.predict(10.0)
+    assert x == pytest.approx(4.0 + 24.0 / 2.0)          # MAX_PREDICTION screen pixels
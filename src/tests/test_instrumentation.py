@@ -0,0 +1,57 @@
+import json
+
+from PySide6.QtCore import QEvent, QPointF, Qt
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtWidgets import QApplication
+from core.instrumentation import (CACHE_LOOKUP, COMPOSITE, INPUT, TILE_RENDER,
+                                  Instrumentation, instruments)
+from ui.widgets.canvas import Canvas
+
+
+def test_disabled_spans_record_nothing():
+    timers = Instrumentation()
+    first, second = timers.span("a"), timers.span("b")
+    assert first is second                      # Shared no-op, nothing allocated
+    with first:
+        pass
+    assert timers.summary() == {}
+
+
+def test_spans_feed_histograms_and_trace(tmp_path):
+    timers = Instrumentation()
+    timers.enable(trace=True)
+    for i in range(100):
+        timers.record("paint", 1.0, 1.0 + (i + 1) / 1000.0)
+    with timers.span("input"):
+        pass
+    summary = timers.summary()
+    assert summary["paint"]["count"] == 100
+    assert abs(summary["paint"]["p50"] - 50.5) < 1e-6
+    assert summary["paint"]["p99"] > summary["paint"]["p95"] > summary["paint"]["p50"]
+
+    path = tmp_path / "trace.json"
+    assert timers.export_trace(str(path)) == 101
+    events = json.loads(path.read_text())["traceEvents"]
+    assert events[0]["ph"] == "X" and events[0]["name"] == "paint"
+    assert abs(events[99]["dur"] - 100_000) < 1e-3     # Microseconds
+
+
+def test_canvas_reports_frame_timers():
+    app = QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=0)
+    canvas.resize(300, 200)
+    instruments.reset()
+    instruments.enable()
+    try:
+        event = QMouseEvent(QEvent.MouseMove, QPointF(5, 5), QPointF(5, 5),
+                            Qt.NoButton, Qt.NoButton, Qt.NoModifier)
+        QApplication.sendEvent(canvas, event)
+        canvas.toggle_hud()
+        canvas.grab()
+        summary = instruments.summary()
+        assert {INPUT, CACHE_LOOKUP, TILE_RENDER, COMPOSITE} <= set(summary)
+        canvas.hud.refresh()
+        assert canvas.hud.isVisibleTo(canvas) and len(canvas.hud.lines) > 1
+    finally:
+        instruments.disable()
+        instruments.reset()
@@ -0,0 +1,112 @@
+import random
+
+import numpy as np
+
+from core.board import Board
+from core.history import History
+from core.intersect import (boxes_on_polygon_edge, capsule_hits, gather_segments,
+                            segments_cross_polygon, split_runs)
+
+
+def random_board(n, seed=3):
+    rng = random.Random(seed)
+    board = Board()
+    for _ in range(n):
+        x, y = rng.uniform(0, 500), rng.uniform(0, 500)
+        points = [(x + rng.uniform(-20, 20), y + rng.uniform(-20, 20))
+                  for _ in range(rng.randint(1, 12))]
+        board.add_stroke(points, rng.uniform(1, 6))
+    return board
+
+
+def test_hit_test_matches_per_stroke_distance():
+    board = random_board(400)
+    for x, y, radius in [(250, 250, 10), (0, 0, 30), (480, 100, 3)]:
+        expected = [i for i in board.store.alive_ids().tolist()
+                    if board.distance_to(i, x, y) <= radius]
+        assert board.hit_test(x, y, radius) == expected
+
+
+def test_eraser_path_covers_the_gap_between_samples():
+    board = Board()
+    stroke = board.add_stroke([(50, -20), (50, 20)], 2.0)
+    # Neither end of the drag is near the stroke, the way between them crosses it
+    assert board.hit_test(0, 0, 5) == board.hit_test(100, 0, 5) == []
+    assert board.strokes_touching_path([0, 100], [0, 0], 5) == [stroke]
+
+
+def test_capsule_hits_matches_sampled_distance():
+    board = random_board(200, seed=4)
+    ax, ay, bx, by, owner = gather_segments(board.store, board.store.alive_ids())
+    path_x, path_y = [100, 300, 320], [100, 250, 400]
+    hits = capsule_hits(ax, ay, bx, by, path_x, path_y, 15.0)
+    assert 0 < hits.sum() < len(hits)
+    # Densely sample the path and compare with point-to-segment distances
+    t = np.linspace(0, 1, 400)[:, None]
+    samples = np.vstack([(1 - t) * np.array([path_x[k], path_y[k]]) +
+                         t * np.array([path_x[k + 1], path_y[k + 1]]) for k in range(2)])
+    for k in range(len(ax)):
+        dx, dy = bx[k] - ax[k], by[k] - ay[k]
+        length_sq = dx * dx + dy * dy
+        u = np.zeros(len(samples)) if length_sq == 0 else np.clip(
+            ((samples[:, 0] - ax[k]) * dx + (samples[:, 1] - ay[k]) * dy) / length_sq, 0, 1)
+        near = np.hypot(ax[k] + u * dx - samples[:, 0], ay[k] + u * dy - samples[:, 1]).min()
+        if abs(near - 15.0) > 0.5:
+            assert hits[k] == (near < 15.0)
+
+
+def test_segments_cross_polygon():
+    square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    ax, ay = np.array([2.0, 5.0, -5.0, 20.0]), np.array([2.0, 5.0, 5.0, 20.0])
+    bx, by = np.array([8.0, 15.0, 15.0, 30.0]), np.array([8.0, 5.0, 5.0, 30.0])
+    assert segments_cross_polygon(ax, ay, bx, by, square).tolist() == [False, True, True, False]
+
+
+def test_edge_boxes_match_every_edge_against_every_box():
+    board = random_board(400, seed=7)
+    bounds = board.store.bounds_of(board.store.alive_ids()).astype(np.float64)
+    x0, y0, x1, y1 = bounds.T
+    angles = np.linspace(0, 2 * np.pi, 40, endpoint=False)
+    lasso = np.column_stack((250 + 180 * np.cos(angles), 250 + 120 * np.sin(3 * angles) + 60))
+    ends = np.roll(lasso, -1, axis=0)
+    ex0, ey0 = np.minimum(lasso, ends).T
+    ex1, ey1 = np.maximum(lasso, ends).T
+    expected = ((x0[:, None] <= ex1) & (x1[:, None] >= ex0) &
+                (y0[:, None] <= ey1) & (y1[:, None] >= ey0)).any(axis=1)
+    assert boxes_on_polygon_edge(x0, y0, x1, y1, lasso).tolist() == expected.tolist()
+
+
+def test_lasso_leaves_out_strokes_crossing_its_edge():
+    board = Board()
+    inside = board.add_stroke([(2, 2), (3, 8)], 0.5)
+    bridge = board.add_stroke([(2, 8), (8, 8)], 0.5)   # Both ends inside, middle outside
+    # A U shape: the gap between its arms is outside
+    lasso = [(0, 0), (10, 0), (10, 10), (6, 10), (6, 5), (4, 5), (4, 10), (0, 10)]
+    assert board.strokes_in_polygon(lasso) == [inside]
+    assert bridge not in board.strokes_in_polygon(lasso)
+
+
+def test_split_runs_respects_strokes_and_cuts():
+    keep = np.array([1, 1, 0, 1, 1, 1, 1, 1, 0, 1], dtype=bool)
+    starts, lengths = np.array([0, 5]), np.array([5, 5])
+    cut = np.zeros(10, dtype=bool)
+    cut[6] = True
+    stroke, start, end = split_runs(keep, starts, lengths, cut)
+    assert list(zip(stroke.tolist(), start.tolist(), end.tolist())) == [
+        (0, 0, 2), (0, 3, 5), (1, 0, 2)]
+
+
+def test_pixel_erase_splits_a_stroke_and_undoes():
+    board = Board()
+    history = History(board)
+    xs = np.arange(0, 101, 5.0)
+    stroke = history.add_stroke(np.column_stack((xs, np.zeros_like(xs))), 2.0, 0xFF112233,
+                                pressure=np.linspace(0.1, 1.0, len(xs)))
+    history.split(board.split_along([50, 50], [-10, 10], 6))
+    assert board.stroke(stroke) is None
+    pieces = [board.store[i] for i in board.store.alive_ids().tolist()]
+    assert [(p.x[0], p.x[-1]) for p in pieces] == [(0, 40), (60, 100)]
+    assert all(p.color == 0xFF112233 and p.width == 2.0 for p in pieces)
+    assert np.allclose(pieces[1].pressure, np.linspace(0.1, 1.0, len(xs))[12:])
+    history.undo()
+    assert board.store.alive_ids().tolist() == [stroke]
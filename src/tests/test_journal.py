@@ -0,0 +1,195 @@
+import os
+
+import numpy as np
+from PySide6.QtWidgets import QApplication
+
+from core.board import Board
+from core.board_file import BoardDocument
+from core.history import History
+from core.journal import Journal, read_journal, recover
+from ui.autosave import Autosave
+
+
+def saved_board(path, n=40):
+    board = Board()
+    for i in range(n):
+        board.add_stroke([(i * 150, 0), (i * 150 + 60, 40)], 2.0)
+    BoardDocument(board).save(path)
+
+
+def contents(board):
+    return sorted((tuple(np.round(s.bounds, 3)), s.width, s.color) for s in board.strokes())
+
+
+def reopened(path):
+    document = BoardDocument(Board(), path)
+    replayed = recover(document)
+    document.load_all()
+    return replayed, document
+
+
+def test_replay_after_crash_matches_the_session(tmp_path):
+    path = str(tmp_path / "board.wbd")
+    saved_board(path)
+    document = BoardDocument(Board(), path)
+    document.ensure_region((0, 0, 3000, 100))       # Only part of the board is loaded
+    journal = Journal(document)
+    history = History(document.board)
+    ids = sorted(s.id for s in document.board.strokes())
+
+    history.erase(ids[:3])
+    journal.commit()
+    history.transform(ids[4:7], ((1, 0, 10), (0, 1, 20)))
+    added = history.add_stroke([(0, 500), (90, 620)], 3.0, 0xFF00FF00)
+    journal.commit()
+    history.restyle([added, ids[8]], color=0xFFFF0000)
+    history.transform([added], ((1, 0, 5000), (0, 1, 0)))       # Into another chunk
+    journal.commit()
+    history.undo()
+    journal.commit()
+    document.board.add_image("c" * 64, (0, 0, 64, 48))
+    journal.commit()
+    journal.flush()
+
+    # The process dies here: no checkpoint, no close
+    document.load_all()
+    replayed, recovered = reopened(path)
+    assert replayed == 5
+    assert contents(recovered.board) == contents(document.board)
+    assert [image.rect for image in recovered.board.images()] == [(0, 0, 64, 48)]
+    journal.close()
+
+
+def test_checkpoint_retires_the_journal_and_recovery_stays_short(tmp_path):
+    path = str(tmp_path / "board.wbd")
+    saved_board(path)
+    document = BoardDocument(Board(), path)
+    document.load_all()
+    journal = Journal(document, checkpoint_bytes=4096)
+    history = History(document.board)
+    for i in range(200):
+        history.add_stroke([(i, 100), (i + 5, 140), (i + 9, 100)])
+        journal.commit()
+    journal.flush()
+    # Outgrowing checkpoint_bytes checkpointed into the board file along the way
+    assert journal.checkpoints >= 2 and os.path.getsize(journal.path) < 4096 + 512
+
+    replayed, recovered = reopened(path)
+    assert 0 < replayed < 200
+    assert contents(recovered.board) == contents(document.board)
+
+    # A journal from before the last checkpoint no longer matches the file
+    stale = read_journal(journal.path)
+    journal.checkpoint()
+    journal.flush()
+    with open(journal.path + ".old", "wb") as f:
+        f.write(b"WBJL\1\0\0\0" + stale[0].to_bytes(8, "little"))
+    assert recover(BoardDocument(Board(), path), journal.path + ".old") == 0
+    journal.close()
+    assert not os.path.exists(journal.path)
+
+
+def test_torn_tail_is_dropped_and_fsyncs_are_coalesced(tmp_path):
+    path = str(tmp_path / "board.wbd")
+    saved_board(path)
+    document = BoardDocument(Board(), path)
+    journal = Journal(document, sync_interval=0.2)
+    history = History(document.board)
+    for i in range(100):
+        history.add_stroke([(i, 300), (i + 10, 310)])
+        journal.commit()
+    journal.flush()
+    assert journal.syncs < 10
+    with open(journal.path, "ab") as f:
+        f.write(b"\x40\0\0\0garbage")
+    assert reopened(path)[0] == 100
+    journal.close()
+
+
+def test_io_errors_never_leave_flush_or_close_waiting(tmp_path):
+    path = str(tmp_path / "board.wbd")
+    saved_board(path)
+    document = BoardDocument(Board(), path)
+    journal = Journal(document)
+
+    def broken(*args):
+        raise ValueError("not a board file")
+
+    journal._checkpoint = broken
+    journal.checkpoint()
+    assert journal.flush(5) and isinstance(journal.error, ValueError)
+
+    def locked(discard):
+        raise PermissionError("still mapped")
+
+    journal._stop = locked
+    assert journal.close(discard=True, timeout=5)
+    assert isinstance(journal.error, PermissionError) and not journal.flush()
+
+
+def test_autosave_commits_each_event_loop_pass_and_checkpoints_on_close(tmp_path):
+    app = QApplication.instance() or QApplication([])
+    path = str(tmp_path / "board.wbd")
+    saved_board(path)
+    document = BoardDocument(Board(), path)
+    document.load_all()
+    autosave = Autosave(document)
+    history = History(document.board)
+    with history.group():
+        for i in range(5):
+            history.add_stroke([(i, 900), (i + 30, 960)])
+    history.erase([0, 1])
+    assert autosave.journal.pending
+    app.processEvents()
+    assert not autosave.journal.pending
+    autosave.flush()
+    assert len(read_journal(autosave.journal.path)[1]) == 1
+
+    autosave.checkpoint()
+    autosave.flush()
+    app.processEvents()             # The GUI thread's view of the file catches up
+    assert document.file.generation == autosave.journal._base
+    history.add_stroke([(0, 2000), (10, 2000)])
+    autosave.close()
+    assert not os.path.exists(path + ".journal")
+    reloaded = BoardDocument(Board(), path)
+    reloaded.load_all()
+    assert contents(reloaded.board) == contents(document.board)
+
+
+def test_untitled_windows_autosave_apart_and_only_claim_crashed_files(tmp_path, monkeypatch):
+    import ui.autosave
+    from ui.main import MainWindow
+    QApplication.instance() or QApplication([])
+    monkeypatch.setattr(ui.autosave, "UNTITLED_DIR", str(tmp_path))
+    # A crash left one untitled board behind, unlocked
+    crashed = str(tmp_path / "untitled-1-crashed.wbd")
+    saved_board(crashed, n=3)
+
+    first, second = MainWindow(), MainWindow()
+    first.open_untitled()
+    second.open_untitled()
+    assert first.autosave.journal.target == crashed
+    first.canvas.document.load_all()
+    second.canvas.document.load_all()
+    assert len(first.canvas.board) == 3
+    assert len(second.canvas.board) == 0             # The first window's file stays its own
+    assert second.autosave.journal.target not in (crashed, None)
+
+    first.close()
+    second.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_claiming_skips_untitled_files_removed_meanwhile(tmp_path, monkeypatch):
+    import ui.autosave
+    monkeypatch.setattr(ui.autosave, "UNTITLED_DIR", str(tmp_path))
+    crashed = str(tmp_path / "untitled-1-crashed.wbd")
+    saved_board(crashed, n=1)
+    gone = str(tmp_path / "untitled-2-closed.wbd")      # Its window quit after the glob
+    monkeypatch.setattr(ui.autosave.glob, "glob", lambda pattern: [gone, crashed])
+    path, lock = ui.autosave.claim_untitled()
+    assert path == crashed
+    lock.unlock()
+    os.remove(crashed)
+    assert ui.autosave.claim_untitled() is None
@@ -0,0 +1,64 @@
+import numpy as np
+
+from core.geometry import polyline_distance
+from core.lod import LodCache, blob_layer, simplify_indices, split_tiny
+from core.stroke_store import StrokeStore
+
+
+def wavy_store():
+    store = StrokeStore()
+    t = np.linspace(0, 20, 2000)
+    store.add(t * 50, np.sin(t) * 40, width=2.0)
+    return store
+
+
+def test_simplify_keeps_shape_within_tolerance():
+    store = wavy_store()
+    x, y = store[0].x, store[0].y
+    kept = simplify_indices(x, y, 1.0)
+    assert kept[0] == 0 and kept[-1] == len(x) - 1
+    assert len(kept) < len(x) / 5
+    worst = max(polyline_distance(x[kept], y[kept], px, py)
+                for px, py in zip(x[::37].tolist(), y[::37].tolist()))
+    assert worst <= 1.0 + 1e-4
+
+
+def test_pyramid_gets_coarser_and_is_cached():
+    store = wavy_store()
+    lod = LodCache(store)
+    counts = [len(lod.polyline(0, level)[0]) for level in (2, 0, -2, -4)]
+    assert counts == sorted(counts, reverse=True) and counts[-1] < counts[0]
+    assert lod.indices(0, -4) is lod.indices(0, -4)
+
+
+def test_renderer_drops_pyramids_of_edited_and_erased_strokes():
+    from core.board import Board
+    from ui.rendering.tile_renderer import TileRenderer
+    board = Board()
+    t = np.linspace(0, 20, 2000)
+    wave = np.column_stack((t * 50, np.sin(t) * 40))
+    stroke_id = board.add_stroke(wave, 2.0)
+    renderer = TileRenderer(board)
+    before = renderer.lod.polyline(stroke_id, -2)[1].copy()
+    # Mirrored points: same count, same bounds, different shape
+    board.set_points(stroke_id, np.column_stack((wave[:, 0], -wave[:, 1])))
+    after = renderer.lod.polyline(stroke_id, -2)[1]
+    assert np.array_equal(after, -before)
+    board.remove_stroke(stroke_id)
+    assert len(renderer.lod) == 0
+    renderer.close()
+
+
+def test_tiny_strokes_become_blobs():
+    store = StrokeStore()
+    for i in range(100):
+        store.add([i * 10, i * 10 + 3], [0, 2], width=1.0, color=0xFFFF0000)
+    big = store.add([0, 900], [0, 900], width=1.0)
+    tiny, regular = split_tiny(store, np.arange(101), scale=1 / 16)
+    assert list(regular) == [big] and len(tiny) == 100
+    layer = blob_layer(store, tiny, 0, 0, 1 / 16, (64, 64))
+    pixels = layer[layer != 0].astype(np.int64)
+    assert len(pixels)
+    # Premultiplied pure red: red channel tracks alpha, green/blue stay empty
+    assert np.all(np.abs(((pixels >> 16) & 0xFF) - (pixels >> 24)) <= 1)
+    assert not np.any(pixels & 0xFFFF)
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from core import raster, raster_fallback
+
+try:
+    from core import _native
+except ImportError:
+    _native = None
+
+
+def zigzag(n=40, seed=3):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.normal(0, 6, n)).astype(np.float32) + 128
+    y = np.cumsum(rng.normal(0, 6, n)).astype(np.float32) + 128
+    radius = rng.uniform(0.5, 5, n).astype(np.float32)
+    return x, y, radius
+
+
+def test_round_caps_cover_past_the_endpoints():
+    x = np.array([10, 30], dtype=np.float32)
+    y = np.array([10, 10], dtype=np.float32)
+    strip = raster_fallback.tessellate(x, y, np.array([4, 4], dtype=np.float32))
+    assert strip.dtype == np.float32 and strip.shape[1] == 2
+    assert strip[:, 0].min() == pytest.approx(6) and strip[:, 0].max() == pytest.approx(34)
+
+    tile = np.zeros((20, 40), dtype=np.uint32)
+    raster_fallback.rasterize_strip(strip, 0, 0, 1.0, 0xFFFFFFFF, tile)
+    assert tile[10, 7] == 0xFFFFFFFF and tile[10, 33] == 0xFFFFFFFF
+    assert tile[10, 3] == 0 and tile[3, 20] == 0
+
+
+def test_single_point_renders_a_dot():
+    tile = np.zeros((16, 16), dtype=np.uint32)
+    one = np.array([8], dtype=np.float32)
+    raster.render_stroke(tile, one, one, np.array([3], dtype=np.float32),
+                         0xFF00FF00, 0, 0, 1.0)
+    assert tile[8, 8] == 0xFF00FF00 and tile[0, 0] == 0
+
+
+@pytest.mark.skipif(_native is None, reason="native core not built")
+def test_native_matches_fallback_bit_for_bit():
+    for seed in range(10):
+        x, y, radius = zigzag(seed=seed)
+        native_strip = _native.tessellate(x, y, radius)
+        assert np.array_equal(native_strip, raster_fallback.tessellate(x, y, radius))
+
+        a = np.full((256, 256), 0xFF101010, dtype=np.uint32)
+        b = a.copy()
+        _native.rasterize_strip(native_strip, 2.5, -1.25, 1.5, 0x80FF8000, a)
+        raster_fallback.rasterize_strip(native_strip, 2.5, -1.25, 1.5, 0x80FF8000, b)
+        assert np.array_equal(a, b)
@@ -0,0 +1,101 @@
+import threading
+
+from PySide6.QtWidgets import QApplication
+from core.tiles import TILE_SIZE, tile_rect
+from ui.rendering.render_pool import RenderPool
+from ui.widgets.canvas import Canvas
+
+
+def make_pool():
+    """Single-thread pool whose first job blocks until released."""
+    app = QApplication.instance() or QApplication([])
+    started, gate = threading.Event(), threading.Event()
+    order = []
+
+    def render(plan):
+        if not order:
+            started.set()
+            gate.wait(5)
+        order.append(plan)
+        return plan
+
+    pool = RenderPool(threads=1, render=render)
+    ready = []
+    pool.tile_ready.connect(lambda level, tx, ty, version, image: ready.append(image))
+    return app, pool, started, gate, order, ready
+
+
+def test_tiles_nearest_focus_render_first():
+    app, pool, started, gate, order, ready = make_pool()
+    pool.request(0, 0, 0, 0, "blocker")
+    started.wait(5)
+    pool.request(0, 9, 0, 0, "far")
+    pool.request(0, 1, 0, 0, "near")
+    pool.request(0, 5, 0, 0, "middle")
+    x0, y0, _, _ = tile_rect(0, 1, 0)
+    pool.set_focus(x0, y0)
+    gate.set()
+    pool.wait()
+    assert order == ["blocker", "near", "middle", "far"]
+    assert ready == order
+
+
+def test_retain_cancels_queued_requests():
+    app, pool, started, gate, order, ready = make_pool()
+    pool.request(0, 0, 0, 0, "blocker")
+    started.wait(5)
+    pool.request(0, 1, 0, 0, "kept")
+    pool.request(0, 2, 0, 0, "dropped")
+    assert pool.retain({(0, 0, 0), (0, 1, 0)}) == [(0, 2, 0)]
+    assert pool.in_flight(0, 0, 0) and not pool.in_flight(0, 2, 0)
+    gate.set()
+    pool.wait()
+    assert order == ["blocker", "kept"]
+    assert pool.cancelled == 1 and len(pool) == 0
+
+
+def test_background_tiles_match_synchronous_render():
+    app = QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=2)
+    canvas.resize(2 * TILE_SIZE, 2 * TILE_SIZE)
+    canvas.board.add_stroke([(10, 10), (300, 200), (400, 20)], 6.0)
+    canvas.grab()
+    canvas.render_pool.wait()
+    assert len(canvas.tiles) == canvas.tiles_rendered > 0
+
+    # An edit redraws the touched tile; the old image stands in meanwhile
+    canvas.board.add_stroke([(20, 200), (60, 240)], 4.0)
+    assert (0, 0, 0) in canvas.stale_tiles
+    canvas.grab()
+    canvas.render_pool.wait()
+    assert not canvas.stale_tiles
+    for level, tx, ty in canvas.tiles:
+        expected = canvas.renderer.render_tile(level, tx, ty)
+        assert canvas.tiles.peek(level, tx, ty) == expected
+
+
+def test_failed_renders_are_logged_and_not_retried_until_edited(caplog):
+    app = QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=1)
+    canvas.resize(TILE_SIZE, TILE_SIZE)
+    canvas.board.add_stroke([(10, 10), (200, 100)], 4.0)
+
+    def broken(plan):
+        raise MemoryError("no room for the tile")
+
+    pool = canvas.render_pool
+    pool.render = broken
+    canvas.grab()
+    pool.wait()
+    failed = pool.failed
+    assert failed > 0 and (0, 0, 0) in canvas.failed_tiles
+    assert "rendering tile (0, 0, 0) failed" in caplog.text
+    canvas.grab()
+    pool.wait()
+    assert pool.failed == failed and len(pool) == 0
+
+    canvas.board.add_stroke([(20, 20), (40, 40)], 4.0)
+    assert (0, 0, 0) not in canvas.failed_tiles and (0, 1, 1) in canvas.failed_tiles
+    canvas.grab()
+    pool.wait()
+    assert pool.failed > failed
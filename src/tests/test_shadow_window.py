@@ -0,0 +1,35 @@
+from PySide6.QtCore import QRect
+from PySide6.QtGui import QColor
+from PySide6.QtWidgets import QApplication, QWidget
+from ui.widgets.shadow_window import ShadowWindow, shadow_slices
+
+
+def test_slices_are_blurred_once_per_feather_and_color():
+    app = QApplication.instance() or QApplication([])
+    color = QColor(0, 0, 0, 180)
+    image = shadow_slices(20, color)
+    assert shadow_slices(20, QColor(color)) is image
+    assert shadow_slices(30, color) is not image
+    assert image.width() == 80
+    assert image.pixelColor(0, 40).alpha() == 0             # Faded out at the rim
+    assert image.pixelColor(40, 40).alpha() == 180          # Solid under the window
+    edge = [image.pixelColor(x, 40).alpha() for x in range(0, 41)]
+    assert edge == sorted(edge)
+
+
+def test_shadow_follows_window_geometry():
+    app = QApplication.instance() or QApplication([])
+    window = QWidget()
+    window.setGeometry(100, 100, 400, 300)
+    shadow = ShadowWindow(feather=20)
+    shadow.track(window)
+    assert not shadow.isVisible()
+    window.show()
+    assert shadow.isVisible()
+    assert shadow.geometry() == QRect(80, 80, 440, 340)
+    window.setGeometry(200, 150, 500, 320)
+    assert shadow.geometry() == QRect(180, 130, 540, 360)
+    assert shadow.grab().toImage().pixelColor(0, 180).alpha() < 5
+    window.hide()
+    assert not shadow.isVisible()
+    shadow.close()
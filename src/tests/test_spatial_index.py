@@ -0,0 +1,56 @@
+import random
+
+from core.board import Board
+from core.geometry import rect_intersects
+from core.spatial_index import RTree
+
+
+def random_rects(n, seed=1):
+    rng = random.Random(seed)
+    rects = {}
+    for i in range(n):
+        x, y = rng.uniform(0, 1000), rng.uniform(0, 1000)
+        rects[i] = (x, y, x + rng.uniform(0, 30), y + rng.uniform(0, 30))
+    return rects
+
+
+def brute_query(rects, window):
+    return sorted(i for i, r in rects.items() if rect_intersects(r, window))
+
+
+def test_bulk_load_matches_linear_scan():
+    rects = random_rects(2000)
+    tree = RTree()
+    tree.bulk_load(rects.items())
+    for window in [(0, 0, 100, 100), (500, 500, 520, 900), (-10, -10, -1, -1)]:
+        assert sorted(tree.query(window)) == brute_query(rects, window)
+
+
+def test_insert_and_remove_keep_tree_consistent():
+    rects = random_rects(1500, seed=2)
+    tree = RTree(max_entries=8)
+    for i, r in rects.items():
+        tree.insert(i, r)
+    for i in list(rects)[::3]:
+        assert tree.remove(i)
+        del rects[i]
+    assert not tree.remove(-1)
+    assert len(tree) == len(rects)
+    assert sorted(tree.query((200, 200, 600, 450))) == brute_query(rects, (200, 200, 600, 450))
+
+
+def test_nearest_orders_by_distance():
+    tree = RTree()
+    tree.bulk_load([("a", (0, 0, 1, 1)), ("b", (10, 0, 11, 1)), ("c", (4, 0, 5, 1))])
+    assert tree.nearest(6, 0.5, k=2) == ["c", "b"]
+    assert tree.nearest(100, 100, max_distance=5) == []
+
+
+def test_board_hit_testing_and_lasso():
+    board = Board()
+    near = board.add_stroke([(0, 0), (10, 0)], 2.0)
+    far = board.add_stroke([(0, 50), (10, 50)], 2.0)
+    assert board.hit_test(5, 3, radius=2.5) == [near]
+    assert board.nearest_stroke(5, 40) == far
+    lasso = [(-5, -5), (20, -5), (20, 10), (-5, 10)]
+    assert board.strokes_in_polygon(lasso) == [near]
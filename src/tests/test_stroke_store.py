@@ -0,0 +1,51 @@
+import numpy as np
+
+from core.stroke_store import StrokeBuilder, StrokeStore
+
+
+def test_strokes_share_float32_columns():
+    store = StrokeStore(point_capacity=4, stroke_capacity=1)
+    a = store.add([0, 1, 2], [0, 0, 1], width=2.0, color=0xFF112233)
+    b = store.add(np.arange(100), np.arange(100), pressure=0.5)
+    assert store.x.dtype == np.float32 and store.point_count == 103
+    assert list(store[a].x) == [0, 1, 2]
+    assert store[a].bounds == (-1.0, -1.0, 3.0, 2.0)
+    assert store[a].color == 0xFF112233
+    assert float(store[b].pressure[-1]) == 0.5
+
+
+def test_purge_and_compact_keep_ids_stable():
+    store = StrokeStore()
+    ids = [store.add([i, i + 1], [0, 0]) for i in range(10)]
+    for i in ids[:6]:
+        store.purge(i)
+    assert store.point_count == 8
+    assert list(store.alive_ids()) == ids[6:]
+    assert list(store[ids[7]].x) == [7, 8]
+
+
+def test_compact_after_set_points_keeps_each_stroke_its_own_points():
+    store = StrokeStore()
+    a = store.add([0, 1, 2], [0, 0, 0])
+    b = store.add([100, 101], [0, 0])
+    c = store.add([200, 201, 202, 203], [0, 0, 0, 0])
+    store.set_points(a, [10, 11, 12], [1, 1, 1])      # a's run now follows c's
+    store.purge(c)
+    assert store.garbage_points == 0 and store.point_count == 5
+    assert list(store[a].x) == [10, 11, 12] and list(store[a].y) == [1, 1, 1]
+    assert list(store[b].x) == [100, 101]
+
+
+def test_transform_updates_points_and_bounds():
+    store = StrokeStore()
+    i = store.add([0, 10], [0, 0], width=0.0)
+    store.transform(i, ((1, 0, 5), (0, 2, 1)))
+    assert store[i].bounds == (5.0, 1.0, 15.0, 1.0)
+
+
+def test_builder_grows():
+    builder = StrokeBuilder(capacity=2)
+    for i in range(5):
+        builder.append(i, -i, 0.5, i / 10)
+    assert len(builder) == 5
+    assert list(builder.y) == [0, -1, -2, -3, -4]
@@ -0,0 +1,64 @@
+from core.tile_cache import TileCache
+from core.tiles import TILE_SIZE
+
+
+def test_lru_eviction_respects_byte_budget():
+    cache = TileCache(budget=300)
+    for tx in range(3):
+        cache.put(0, tx, 0, f"tile{tx}", 100)
+    assert cache.get(0, 0, 0) == "tile0"        # Now most recently used
+    cache.put(0, 3, 0, "tile3", 100)
+
+    assert cache.nbytes == 300
+    assert (0, 1, 0) not in cache               # Least recently used went first
+    assert (0, 0, 0) in cache and (0, 3, 0) in cache
+    assert cache.evictions == 1
+
+
+def test_hit_and_miss_counters():
+    cache = TileCache()
+    assert cache.get(0, 0, 0) is None
+    cache.put(0, 0, 0, "tile", 10)
+    assert cache.get(0, 0, 0) == "tile"
+    assert cache.peek(0, 0, 0) == "tile"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_invalidate_drops_overlapping_tiles_at_every_level():
+    cache = TileCache()
+    cache.put(0, 0, 0, "a", 10)
+    cache.put(0, 1, 0, "b", 10)
+    cache.put(-1, 0, 0, "coarse", 10)          # Covers 512 world units
+
+    dropped = cache.invalidate((10, 10, 20, 20))
+
+    assert dropped == 2
+    assert list(cache) == [(0, 1, 0)]
+    assert cache.nbytes == 10
+    assert cache.invalidations == 2
+
+
+def test_in_flight_render_is_rejected_after_invalidation():
+    cache = TileCache()
+    version = cache.begin(0, 0, 0)
+    cache.invalidate((0, 0, TILE_SIZE, TILE_SIZE))
+    assert cache.version(0, 0, 0) != version
+
+    assert not cache.put(0, 0, 0, "stale", 10, version)
+    assert (0, 0, 0) not in cache
+    assert cache.stale_puts == 1
+
+    fresh = cache.begin(0, 0, 0)
+    assert cache.put(0, 0, 0, "fresh", 10, fresh)
+    assert cache.get(0, 0, 0) == "fresh"
+
+
+def test_clear_makes_pending_renders_stale():
+    cache = TileCache()
+    cache.put(0, 1, 1, "a", 10)
+    version = cache.begin(0, 0, 0)
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
+    assert not cache.put(0, 0, 0, "stale", 10, version)
@@ -0,0 +1,44 @@
+from PySide6.QtCore import QEvent, QPointF, Qt
+from PySide6.QtGui import QMouseEvent
+from PySide6.QtWidgets import QApplication
+from core.latency import LatencyMeter
+from ui.widgets.canvas import Canvas
+
+
+def mouse(kind, x, y, timestamp, buttons=Qt.LeftButton):
+    button = Qt.NoButton if kind == QEvent.MouseMove else Qt.LeftButton
+    event = QMouseEvent(kind, QPointF(x, y), QPointF(x, y), button, buttons, Qt.NoModifier)
+    event.setTimestamp(timestamp)
+    return event
+
+
+def test_latency_maps_event_clock_onto_paint_clock():
+    meter = LatencyMeter()
+    meter.event(1000, now=50.0)         # Fastest delivery: clocks are 950 ms apart
+    meter.event(1010, now=63.0)         # Delivered 3 ms late
+    meter.painted(now=65.0)
+    assert list(meter.samples) == [15.0, 5.0]
+    assert meter.summary()["max"] == 15.0
+    meter.event(1020, now=70.0)
+    meter.discard()
+    meter.painted(now=80.0)
+    assert len(meter) == 2
+
+
+def test_overlay_draws_stroke_until_pen_up():
+    app = QApplication.instance() or QApplication([])
+    canvas = Canvas(workers=0)
+    canvas.resize(300, 200)
+    canvas.mousePressEvent(mouse(QEvent.MouseButtonPress, 10, 10, 1000))
+    for i in range(1, 20):
+        canvas.mouseMoveEvent(mouse(QEvent.MouseMove, 10 + 8 * i, 10 + 3 * i, 1000 + 8 * i))
+    assert canvas.wet_ink.isVisibleTo(canvas)
+    assert len(canvas.board.store) == 0         # Nothing committed while inking
+
+    image = canvas.wet_ink.grab().toImage()
+    assert image.pixelColor(10, 10).alpha() > 0
+    assert canvas.wet_ink.latency.summary()["count"] == 20
+
+    canvas.mouseReleaseEvent(mouse(QEvent.MouseButtonRelease, 162, 67, 1160, Qt.NoButton))
+    assert not canvas.wet_ink.isVisibleTo(canvas)
+    assert len(canvas.board.strokes()) == 1
@@ -1,8 +1,31 @@
 from PySide6.QtWidgets import QApplication  # ADD THIS
 from ui.main import MainWindow
+from ui.startup import StartupProfile
 
 def test_window_opens():
     app = QApplication.instance() or QApplication([])  # CREATE APP INSTANCE
     window = MainWindow()
     assert window.windowTitle() == "Whiteboard App"
-    window.close()  # EXPLICITLY CLOSE WINDOW 
\ No newline at end of file
+    window.close()  # EXPLICITLY CLOSE WINDOW 
+
+
+def test_window_builds_chrome_on_first_use():
+    app = QApplication.instance() or QApplication([])
+    window = MainWindow()
+    assert not window.isVisible()               # Shown once, by the caller
+    assert window.shadow is None and not window.resize_handles
+    window.showNormal()
+    assert len(window.resize_handles) == 8 and window.shadow is not None
+    window.shadow.close()
+    window.close()
+
+
+def test_startup_profile_counts_imported_modules():
+    import sys
+    profile = StartupProfile()
+    sys.modules.pop("colorsys", None)
+    with profile.phase("import colorsys"):
+        import colorsys
+    profile.mark("done")
+    assert profile.phases[0][0] == "import colorsys" and profile.phases[0][2] >= 1
+    assert profile.marks[0][0] == "done"
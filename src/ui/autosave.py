@@ -0,0 +1,134 @@
+import glob
+import os
+import uuid
+
+from PySide6.QtCore import QLockFile, QObject, Qt, QTimer, Signal, Slot
+
+from core.board_file import FILE_EXTENSION
+from core.journal import Journal
+
+CHECKPOINT_INTERVAL_MS = 30_000
+UNTITLED_DIR = os.environ.get("WHITEBOARD_AUTOSAVE_DIR",
+                              os.path.join(os.path.expanduser("~"), ".cache", "whiteboard", "autosave"))
+UNTITLED_PREFIX = "untitled-"
+
+
+def _lock(path):
+    lock = QLockFile(path + ".lock")
+    lock.setStaleLockTime(0)            # Only a lock whose process is gone is stale
+    return lock if lock.tryLock(0) else None
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0          # Gone meanwhile; found missing once locked
+
+
+def new_untitled():
+    """A fresh, locked autosave file name for an untitled board: (path, lock)."""
+    os.makedirs(UNTITLED_DIR, exist_ok=True)
+    while True:
+        path = os.path.join(UNTITLED_DIR, f"{UNTITLED_PREFIX}{os.getpid()}-{uuid.uuid4().hex[:8]}"
+                                          f"{FILE_EXTENSION}")
+        lock = _lock(path)
+        if lock is not None and not os.path.exists(path):
+            return path, lock
+
+
+def claim_untitled():
+    """Lock an untitled autosave left behind by a crash: (path, lock), or None.
+
+    Files still locked belong to a running window and are left alone. The
+    most recently written leftover is claimed first.
+    """
+    leftovers = glob.glob(os.path.join(UNTITLED_DIR, glob.escape(UNTITLED_PREFIX) + "*" + FILE_EXTENSION))
+    for _, path in sorted(((_mtime(path), path) for path in leftovers), reverse=True):
+        lock = _lock(path)
+        if lock is None:
+            continue
+        # Its owner may have closed, removing it, just before we locked it
+        if os.path.exists(path):
+            return path, lock
+        lock.unlock()
+    return None
+
+
+class Autosave(QObject):
+    """Journals a document's edits and checkpoints them without waiting on the disk
+
+    Everything edited during one pass of the event loop is committed as one
+    journal transaction right after it. Every ``interval_ms`` with edits
+    in the journal, and whenever it outgrows the journal's
+    ``checkpoint_bytes``, the dirty chunks are checkpointed into the board
+    file. The writing and fsyncing happen on the Journal's own thread.
+
+    An untitled document is checkpointed into a file of its own under
+    ``UNTITLED_DIR``, ``untitled`` from ``claim_untitled`` or else a new
+    one, locked while this autosave runs. The next start claims it if it
+    is still there, i.e. after a crash. ``close`` removes it, like quitting
+    always discarded untitled work.
+    """
+
+    _checkpointed = Signal()            # I/O thread -> GUI thread hop
+
+    def __init__(self, document, untitled=None, interval_ms=CHECKPOINT_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.document = document
+        self.untitled = document.path is None
+        target, self._lock = None, None
+        if self.untitled:
+            target, self._lock = untitled or new_untitled()
+        self._commit_queued = False
+        self._checkpointed.connect(self._reload, Qt.QueuedConnection)
+        self.journal = Journal(document, target,
+                               on_pending=self._queue_commit,
+                               on_checkpoint=self._checkpointed.emit)
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self._tick)
+        self.timer.start(interval_ms)
+
+    def _queue_commit(self):
+        if not self._commit_queued:
+            self._commit_queued = True
+            QTimer.singleShot(0, self.commit)
+
+    @Slot()
+    def commit(self):
+        self._commit_queued = False
+        if self.journal is not None:
+            self.journal.commit()
+
+    def checkpoint(self):
+        """Write the document's changes into its board file, in the background."""
+        self.journal.checkpoint()
+
+    def flush(self, timeout=None):
+        """Block until every edit so far is on disk (tests and shutdown)."""
+        return self.journal.flush(timeout)
+
+    @Slot()
+    def _tick(self):
+        journal = self.journal
+        if journal.size or journal.pending or journal.failed:
+            journal.checkpoint()
+
+    @Slot()
+    def _reload(self):
+        # The GUI thread reads chunks through its own view of the file
+        document_file = self.document.file
+        if document_file is not None and self.journal is not None and \
+                os.path.abspath(document_file.path) == os.path.abspath(self.journal.target):
+            document_file.reload()
+
+    def close(self):
+        """Checkpoint, or drop an untitled board, and stop journaling."""
+        if self.journal is None:
+            return
+        self.timer.stop()
+        self.journal.close(discard=self.untitled)
+        self.journal = None
+        if self._lock is not None:
+            self._lock.unlock()
+            self._lock = None
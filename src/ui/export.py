@@ -0,0 +1,277 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.assets import DEFAULT_ROOT, AssetCache, AssetStore, blend_over
+from core.board import Board
+from core.board_file import BoardDocument, BoardFile, decode_images
+from core.export import (STRIP_ROWS, WRITERS, channels, deflate_strip, export_size,
+                         format_for_path, page_grid, page_strips, scanlines)
+from core.geometry import rect_inflate, rect_union
+from core.tiles import TILE_SIZE, level_for_zoom
+from ui.rendering.qimage_utils import image_buffer
+from ui.rendering.tile_renderer import TileRenderer, rasterize
+
+DEFAULT_BACKGROUND = 0xFF1E1E1E     # The canvas's BACKGROUND_COLOR
+DEFAULT_DPI = 300.0
+A4_INCHES = (8.27, 11.69)           # Default PDF page, portrait
+IN_FLIGHT = 2                       # Bands queued per worker process
+MAX_BAND_STRIPS = 16
+
+
+def board_bounds(source):
+    """World bounds of everything on a Board or in a .wbd file, or None."""
+    if isinstance(source, Board):
+        return source.bounds
+    board_file = BoardFile(source)
+    bounds = None
+    for rec in board_file.chunks.values():
+        bounds = rect_union(bounds, (float(rec["x0"]), float(rec["y0"]),
+                                     float(rec["x1"]), float(rec["y1"])))
+    for _, _, rect in decode_images(board_file.images):
+        bounds = rect_union(bounds, rect)
+    board_file.close()
+    return bounds
+
+
+def headless_assets(root=DEFAULT_ROOT):
+    """AssetCache over the store at ``root`` that decodes missing levels inline."""
+    from ui.rendering.asset_loader import AssetLoader
+    store = AssetStore(root)
+    return AssetCache(store, request=AssetLoader(store).request)
+
+
+class StripRenderer:
+    """Renders export strips of one board region with the canvas's tile renderer
+
+    ``source`` is a Board already in memory or the path of a .wbd file. A
+    file is read per band of strips: only the chunks a band touches are
+    loaded, into a fresh board unless the current one already holds them. Loading
+    always follows the file's chunk order, so every worker process stacks
+    overlapping strokes the same way and strips meet without seams.
+
+    With a ``background`` (ARGB) pixels are flattened onto it; None keeps
+    them transparent.
+    """
+
+    def __init__(self, source, rect, scale, background=DEFAULT_BACKGROUND, assets=None):
+        self.rect = rect
+        self.scale = scale
+        self.level = level_for_zoom(scale)
+        self.background = background
+        self.assets = assets
+        self._path = None
+        self._document = None
+        if isinstance(source, Board):
+            self._renderer = TileRenderer(source, assets)
+        else:
+            self._path = source
+            self._renderer = None
+
+    def world_rect(self, strip):
+        x, y, width, height = strip
+        return (self.rect[0] + x / self.scale, self.rect[1] + y / self.scale,
+                self.rect[0] + (x + width) / self.scale, self.rect[1] + (y + height) / self.scale)
+
+    def _renderer_for(self, rect):
+        if self._path is None:
+            return self._renderer
+        # The tile renderer looks one pixel past its tiles
+        rect = rect_inflate(rect, 1.0 / self.scale)
+        if self._document is not None:
+            if set(self._document.file.chunks_in_rect(rect)) <= self._document.loaded:
+                return self._renderer
+            self._document.close()
+        self._document = BoardDocument(Board(), self._path)
+        self._document.ensure_region(rect)
+        self._renderer = TileRenderer(self._document.board, self.assets)
+        return self._renderer
+
+    def render(self, strip):
+        """(h, w, 3 or 4) straight RGB(A) bytes of pixel rectangle ``strip``."""
+        x, y, width, height = strip
+        renderer = self._renderer_for(self.world_rect(strip))
+        alpha = self.background is None
+        rows = np.empty((height, width, 4 if alpha else 3), dtype=np.uint8)
+        origin_y = self.rect[1] + y / self.scale
+        for left in range(0, width, TILE_SIZE):
+            plan = renderer.plan_at(self.level, self.rect[0] + (x + left) / self.scale,
+                                    origin_y, self.scale)
+            image = rasterize(plan)
+            right = min(left + TILE_SIZE, width)
+            pixels = image_buffer(image)[:height, :right - left]
+            if not alpha:
+                paper = np.full(pixels.shape, self.background, dtype=np.uint32)
+                blend_over(paper, pixels)
+                pixels = paper
+            rows[:, left:right] = channels(pixels, alpha)
+        return rows
+
+    def encode(self, band):
+        """EncodedStrips of a band of strips stacked top down.
+
+        The board chunks of the whole band are loaded up front, so a worker
+        given consecutive strips reads each chunk about once.
+        """
+        first, last = self.world_rect(band[0]), self.world_rect(band[-1])
+        self._renderer_for((first[0], first[1], last[2], last[3]))
+        return [deflate_strip(strip, scanlines(self.render(strip))) for strip in band]
+
+
+def bands(strips, count):
+    """``strips`` in runs of up to ``count`` vertically adjacent ones."""
+    band = []
+    for strip in strips:
+        if band and (len(band) == count or strip[0] != band[-1][0]
+                     or strip[1] != band[-1][1] + band[-1][3]):
+            yield band
+            band = []
+        band.append(strip)
+    if band:
+        yield band
+
+
+# Worker processes each hold one StripRenderer
+_worker = None
+
+
+def _start_worker(source, rect, scale, background, asset_root):
+    global _worker
+    # Caches do not cross processes: each worker maps the shared store itself
+    assets = headless_assets(asset_root) if asset_root is not None else None
+    _worker = StripRenderer(source, rect, scale, background, assets)
+
+
+def _encode(band):
+    return _worker.encode(band)
+
+
+def _encoded_strips(strips, source, rect, scale, background, workers, assets):
+    """Yield every strip encoded, in order, keeping few of them in memory."""
+    count = 1
+    if not isinstance(source, Board):
+        # A band spans about one row of board chunks
+        board_file = BoardFile(source)
+        count = max(1, min(MAX_BAND_STRIPS, int(board_file.chunk_size * scale / STRIP_ROWS)))
+        board_file.close()
+    if workers <= 1 or isinstance(source, Board):
+        renderer = StripRenderer(source, rect, scale, background, assets)
+        for band in bands(strips, count):
+            yield from renderer.encode(band)
+        return
+    # Spawned, not forked: the parent may be a Qt application with threads running
+    context = multiprocessing.get_context("spawn")
+    asset_root = assets.store.root if assets is not None else None
+    with ProcessPoolExecutor(workers, context, _start_worker,
+                             (source, rect, scale, background, asset_root)) as pool:
+        pending = deque()
+        for band in bands(strips, count):
+            pending.append(pool.submit(_encode, band))
+            if len(pending) >= workers * IN_FLIGHT:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def export_board(source, path, rect=None, scale=1.0, workers=None, page_size=None,
+                 dpi=DEFAULT_DPI, background=DEFAULT_BACKGROUND, assets=None):
+    """Render ``rect`` of ``source`` into a PNG, PDF or SVG file at ``path``.
+
+    ``source`` is a Board or the path of a .wbd file; only a file can be
+    rendered in parallel, by ``workers`` processes (default: one per CPU).
+    ``scale`` is output pixels per world unit and ``rect`` defaults to the
+    whole board. PDFs are cut into pages of ``page_size`` (w, h) pixels, an
+    A4 sheet at ``dpi`` by default. Placed images are drawn from ``assets``,
+    an AssetCache; worker processes open its store themselves. The file is
+    written under a temporary name and renamed when complete. Returns
+    (width, height, pages).
+    """
+    kind = format_for_path(path)
+    if rect is None:
+        rect = board_bounds(source)
+        if rect is None:
+            raise ValueError("the board is empty")
+    width, height = export_size(rect, scale)
+    if kind == "pdf" and page_size is None:
+        page_size = (round(A4_INCHES[0] * dpi), round(A4_INCHES[1] * dpi))
+    pages = page_grid(width, height, *(page_size or ()))
+    strips = [strip for page in pages for strip in page_strips(page)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    alpha = background is None
+    options = {"dpi": dpi} if kind == "pdf" else {}
+    partial = path + ".part"
+    try:
+        with open(partial, "wb") as f:
+            writer = WRITERS[kind](f, alpha, **options)
+            encoded = _encoded_strips(strips, source, rect, scale, background, workers, assets)
+            for page in pages:
+                writer.begin_page(page[2], page[3])
+                for _ in page_strips(page):
+                    writer.add(next(encoded))
+                writer.end_page()
+            writer.close()
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return width, height, len(pages)
+
+
+def _numbers(text, count, kind=float):
+    values = [kind(v) for v in text.replace("x", ",").split(",")]
+    if len(values) != count:
+        raise argparse.ArgumentTypeError(f"expected {count} numbers, got {text!r}")
+    return tuple(values)
+
+
+def _color(text):
+    if text == "transparent":
+        return None
+    return 0xFF000000 | int(text.lstrip("#"), 16)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export a board to PNG, PDF or SVG without opening a window")
+    parser.add_argument("board", help="board file (.wbd)")
+    parser.add_argument("output", help="output file; its extension picks the format")
+    parser.add_argument("--rect", type=lambda t: _numbers(t, 4), metavar="X0,Y0,X1,Y1",
+                        help="world region to export (default: the whole board)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="output pixels per world unit (default 1)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="render processes (default: one per CPU)")
+    parser.add_argument("--page", type=lambda t: _numbers(t, 2, int), metavar="WxH",
+                        help="PDF page size in pixels (default: A4 at --dpi)")
+    parser.add_argument("--dpi", type=float, default=DEFAULT_DPI,
+                        help="PDF pixels per inch (default 300)")
+    parser.add_argument("--background", type=_color, default=DEFAULT_BACKGROUND,
+                        metavar="#RRGGBB", help="background colour, or 'transparent'")
+    parser.add_argument("--assets", default=DEFAULT_ROOT, metavar="DIR",
+                        help="asset store of the board's images (default: the app's)")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.board):
+        parser.error(f"no such board: {args.board}")
+
+    start = time.perf_counter()
+    try:
+        width, height, pages = export_board(
+            args.board, args.output, args.rect, args.scale, args.workers, args.page,
+            args.dpi, args.background, headless_assets(args.assets))
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{args.output}: {width} x {height} px, {pages} page{'s' * (pages != 1)} "
+          f"in {time.perf_counter() - start:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import time
+
+from PySide6.QtCore import QObject, QRect, QTimer, Qt, Signal
+from PySide6.QtWidgets import QApplication
+
+SETTLE_DELAY = 150          # ms without a size change before a resize counts as done
+FALLBACK_REFRESH = 60.0     # Hz, when the screen does not report a rate
+
+
+class GeometryScheduler(QObject):
+    """Frame-paced window moves and resizes
+
+    Drag and resize handlers call ``request_move`` / ``request_geometry``
+    for every mouse event; only the latest request is kept and it is
+    applied at most once per screen refresh, so a burst of events costs
+    one native move or one relayout per frame. ``resize_started`` fires
+    before the first size change of a resize and ``resize_settled`` once
+    the size has been still for ``SETTLE_DELAY`` ms.
+
+    Screen geometry is cached here too and refreshed only when the screen
+    reports a change, instead of being queried on every mouse move.
+    """
+    resize_started = Signal()
+    resize_settled = Signal()
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.applied = 0            # Geometry changes made, for profiling
+        self.coalesced = 0          # Requests dropped in favour of a later one
+        self.resizing = False
+        self._pending_pos = None
+        self._pending_rect = None
+        self._last_flush = 0.0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self.flush)
+        self._settle = QTimer(self)
+        self._settle.setSingleShot(True)
+        self._settle.setInterval(SETTLE_DELAY)
+        self._settle.timeout.connect(self._settled)
+
+        self._screen = None
+        self._screen_geometry = None
+        self._available_geometry = None
+        QApplication.instance().primaryScreenChanged.connect(self._watch_screen)
+        self._watch_screen(QApplication.primaryScreen())
+
+    # ==========================================================
+    #  Screen Cache
+    # ==========================================================
+    def screen_geometry(self):
+        """Cached geometry of the primary screen."""
+        return self._screen_geometry
+
+    def available_geometry(self):
+        """Cached geometry of the primary screen, excluding the taskbar."""
+        return self._available_geometry
+
+    def frame_interval(self):
+        """Milliseconds between screen refreshes."""
+        rate = self._screen.refreshRate() if self._screen is not None else 0
+        return 1000.0 / (rate if rate > 0 else FALLBACK_REFRESH)
+
+    def _watch_screen(self, screen):
+        if self._screen is not None:
+            self._screen.geometryChanged.disconnect(self._refresh_screen)
+            self._screen.availableGeometryChanged.disconnect(self._refresh_screen)
+        self._screen = screen
+        if screen is not None:
+            screen.geometryChanged.connect(self._refresh_screen)
+            screen.availableGeometryChanged.connect(self._refresh_screen)
+        self._refresh_screen()
+
+    def _refresh_screen(self):
+        if self._screen is None:
+            self._screen_geometry = self._available_geometry = QRect()
+        else:
+            self._screen_geometry = self._screen.geometry()
+            self._available_geometry = self._screen.availableGeometry()
+
+    # ==========================================================
+    #  Requests
+    # ==========================================================
+    def request_move(self, pos):
+        """Move the window's top-left to ``pos`` on the next frame."""
+        if self._pending_rect is not None:
+            self._pending_rect.moveTopLeft(pos)
+        else:
+            self._count_coalesced(self._pending_pos)
+            self._pending_pos = pos
+        self._schedule()
+
+    def request_geometry(self, rect):
+        """Give the window geometry ``rect`` on the next frame."""
+        self._count_coalesced(self._pending_rect or self._pending_pos)
+        self._pending_rect = QRect(rect)
+        self._pending_pos = None
+        self._schedule()
+
+    def pending(self):
+        return self._pending_pos is not None or self._pending_rect is not None
+
+    def cancel(self):
+        """Drop requests not applied yet (e.g. when the window gets maximized)."""
+        self._pending_pos = self._pending_rect = None
+        self._timer.stop()
+
+    def flush(self):
+        """Apply the latest request now."""
+        self._timer.stop()
+        self._last_flush = time.perf_counter()
+        pos, rect = self._pending_pos, self._pending_rect
+        self._pending_pos = self._pending_rect = None
+        window = self.window
+        if rect is not None:
+            if rect.size() != window.size():
+                if not self.resizing:
+                    self.resizing = True
+                    self.resize_started.emit()
+                self._settle.start()
+            if rect != window.geometry():
+                window.setGeometry(rect)
+                self.applied += 1
+        elif pos is not None and pos != window.pos():
+            window.move(pos)
+            self.applied += 1
+
+    def _schedule(self):
+        if self._timer.isActive():
+            return
+        # The first request after a pause goes out at once, later ones a frame apart
+        elapsed = (time.perf_counter() - self._last_flush) * 1000.0
+        self._timer.start(max(0, round(self.frame_interval() - elapsed)))
+
+    def _count_coalesced(self, previous):
+        if previous is not None:
+            self.coalesced += 1
+
+    def settle(self):
+        """End the current resize now (e.g. the handle was released)."""
+        self._settle.stop()
+        self._settled()
+
+    def _settled(self):
+        if self.resizing:
+            self.resizing = False
+            self.resize_settled.emit()
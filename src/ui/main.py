@@ -1,22 +1,81 @@
-import sys
+import time
+
+LAUNCHED = time.perf_counter()  # Taken before anything heavy is imported
+
+import argparse
 import os  # Required for file path operations
-from PySide6.QtWidgets import QApplication
-from ui.main_window import MainWindow
+import sys
 
 
-if __name__ == "__main__":
-    # Create Qt application instance
-    app = QApplication(sys.argv)
+def __getattr__(name):
+    # ``from ui.main import MainWindow`` still works, without importing the
+    # window (and Qt) just because this module was
+    if name == "MainWindow":
+        from ui.main_window import MainWindow
+        return MainWindow
+    raise AttributeError(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Whiteboard App")
+    parser.add_argument("board", nargs="?", help="board file to open")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report time to first paint and import costs, then quit")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record timings and write a Chrome trace to FILE on exit")
+    args, qt_args = parser.parse_known_args()
+
+    from ui.startup import StartupProfile, after_first_paint
+    profile = StartupProfile(LAUNCHED)
+
+    with profile.phase("import Qt"):
+        from PySide6.QtCore import Qt
+        from PySide6.QtWidgets import QApplication
 
-    theme_path = os.path.join(os.path.dirname(__file__), 'styles', 'theme.qss')
-    if os.path.exists(theme_path):
-        app.setStyleSheet(open(theme_path).read())
+    with profile.phase("create QApplication"):
+        # Deliver every pen sample; the canvas coalesces them into frames itself
+        QApplication.setAttribute(Qt.AA_CompressHighFrequencyEvents, False)
+        app = QApplication(sys.argv[:1] + qt_args)
 
+    with profile.phase("load stylesheet"):
+        theme_path = os.path.join(os.path.dirname(__file__), 'styles', 'theme.qss')
+        if os.path.exists(theme_path):
+            with open(theme_path) as theme:
+                app.setStyleSheet(theme.read())
+
+    with profile.phase("import main window"):
+        from ui.main_window import MainWindow
+
+    with profile.phase("build main window"):
+        window = MainWindow()
+
+    if args.trace:
+        from core.instrumentation import instruments
+        instruments.enable(trace=True)
+        app.aboutToQuit.connect(lambda: instruments.export_trace(args.trace))
+
+    def first_frame():
+        profile.mark("first paint")
+        # The board loads once something is on screen, not before. Either
+        # way edits a crash kept off disk come back from the autosave journal
+        with profile.phase("open board"):
+            if args.board:
+                window.open_board(args.board)
+            else:
+                window.open_untitled()
+        if args.profile_startup:
+            profile.report()
+            app.quit()
+
+    # Quitting without closing the window (e.g. --profile-startup) still ends cleanly
+    app.aboutToQuit.connect(window.stop_autosave)
+    after_first_paint(window.canvas, first_frame)
+    # Shown once, already in its final state
+    window.showMaximized()
 
-    
-    # Create and show main window
-    window = MainWindow()
-    window.show()
-    
     # Start application event loop
-    sys.exit(app.exec())
\ No newline at end of file
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,12 +2,14 @@ from PySide6.QtCore import (Qt, QPoint, QSize, QEvent, QTimer, QRect)
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QPushButton, QVBoxLayout,
     QHBoxLayout, QLabel, QSpacerItem, QSizePolicy,
-    QApplication
+    QApplication, QFileDialog
 )
-from PySide6.QtGui import QCursor
-from ui.widgets.resize_handle import ResizeHandle
-from ui.widgets.visual_indicator import VisualIndicator
-from ui.widgets.shadow_window import ShadowWindow
+from PySide6.QtGui import QCursor, QKeySequence, QShortcut
+from ui.widgets.canvas import Canvas
+from ui.geometry_scheduler import GeometryScheduler
+from core.board import Board
+# Handles, the snap indicator, the shadow and board files are imported and
+# built on first use, keeping them off the path to the first frame
 
 
 # ==========================================================
@@ -25,10 +27,9 @@ class MainWindow(QMainWindow):
         self.setWindowFlags(Qt.FramelessWindowHint)  # Hides default title bar
         self.setMinimumSize(400, 300)
 
-        screen = QApplication.primaryScreen()
-        screen_size = screen.availableGeometry().size()  # Excluding taskbar
-        self.default_size = QSize(screen_size.width() // 1.6,
-                                  screen_size.height() // 1.35)
+        available = QApplication.primaryScreen().availableGeometry()  # Excluding taskbar
+        self.default_size = QSize(available.width() // 1.6,
+                                  available.height() // 1.35)
 
         # -----------------------
         # Central Layout & Title Bar
@@ -42,18 +43,24 @@ class MainWindow(QMainWindow):
 
         self._setup_title_bar(main_layout)
 
-        # Canvas placeholder
-        self.canvas_placeholder = QWidget(central_widget)
-        main_layout.addWidget(self.canvas_placeholder)
+        # Infinite canvas
+        self.canvas = Canvas(central_widget)
+        main_layout.addWidget(self.canvas)
+
+        # Drag and resize go through here: at most one geometry change per frame
+        self.geometry_scheduler = GeometryScheduler(self)
+        self.geometry_scheduler.resize_started.connect(self.canvas.begin_interactive_resize)
+        self.geometry_scheduler.resize_settled.connect(self.canvas.end_interactive_resize)
 
         # -----------------------
         # Initial Sizing & Geometry
         # -----------------------
-        self.resize(self.default_size)
-        self.showNormal()
-        self.maximize_btn.setText("□")
-        self.last_normal_geometry = self.geometry()
-        QTimer.singleShot(0, self.showMaximized)
+        # Centred normal geometry for restoring; the caller shows the window
+        # once, maximized, so it is never painted at this size first
+        normal = QRect(QPoint(0, 0), self.default_size)
+        normal.moveCenter(available.center())
+        self.setGeometry(normal)
+        self.last_normal_geometry = normal
         self.maximize_btn.setText("❐")
 
         # -----------------------
@@ -69,11 +76,16 @@ class MainWindow(QMainWindow):
         # -----------------------
         # Helpers: Indicator, Handles, Shadow
         # -----------------------
-        self.visual_indicator = VisualIndicator(self)
-        self.visual_indicator.hide()
+        # Built on first use: none of them shows while maximized
+        self.visual_indicator = None
+        self._indicator_geometry = None
+        self.resize_handles = {}
+        self._handles_laid_out_for = None
+        self.shadow = None
+        self.autosave = None            # Started with the first board, after the first frame
 
-        self._setup_resize_handles()
-        self.shadow = ShadowWindow()
+        QShortcut(QKeySequence.Save, self, self.save_board)
+        QShortcut(QKeySequence.SaveAs, self, lambda: self.save_board(ask=True))
 
     # ==========================================================
     #  Setup Helpers
@@ -131,7 +143,9 @@ class MainWindow(QMainWindow):
 
     def _setup_resize_handles(self):
         """Create 8 resize handles and set initial positions"""
+        from ui.widgets.resize_handle import ResizeHandle
         self.resize_handles = {}
+        self._handles_laid_out_for = None
         positions = ['top', 'bottom', 'left', 'right',
                      'topleft', 'topright', 'bottomleft', 'bottomright']
         for pos in positions:
@@ -140,6 +154,18 @@ class MainWindow(QMainWindow):
             self.resize_handles[pos] = handle
         self.update_handle_positions()
 
+    def _update_chrome(self):
+        """Show handles and shadow only in the normal state, building them on first use."""
+        normal = not (self.isMaximized() or self.isMinimized())
+        if normal and not self.resize_handles:
+            self._setup_resize_handles()
+        for handle in self.resize_handles.values():
+            handle.setVisible(not self.isMaximized())
+        if normal and self.shadow is None and self.isVisible():
+            from ui.widgets.shadow_window import ShadowWindow
+            self.shadow = ShadowWindow()
+            self.shadow.track(self)
+
     # ==========================================================
     #  Window State Methods
     # ==========================================================
@@ -157,11 +183,11 @@ class MainWindow(QMainWindow):
             self.maximize_window()
 
         # Show/hide all resize handles based on window state
-        for handle in self.resize_handles.values():
-            handle.setVisible(not self.isMaximized())
+        self._update_chrome()
 
     def maximize_window(self):
         """Maximize the window and update state."""
+        self.geometry_scheduler.cancel()
         self.last_normal_geometry = self.geometry()
         self.showMaximized()
         self.maximize_btn.setText("❐")
@@ -177,6 +203,82 @@ class MainWindow(QMainWindow):
         """Close the window."""
         self.close()
 
+    # ==========================================================
+    #  Board Files
+    # ==========================================================
+    def open_board(self, path):
+        """Show the board stored at ``path``; chunks load as the view needs them.
+
+        Edits a crash kept out of the file are replayed from its journal.
+        Returns the number of journal transactions replayed.
+        """
+        from core.board_file import BoardDocument
+        from core.journal import recover
+        document = BoardDocument(Board(), path)
+        recovered = recover(document)
+        self._show_document(document)
+        return recovered
+
+    def open_untitled(self):
+        """Start autosaving the untitled board, first bringing back one lost in a crash."""
+        from core.board_file import BoardDocument
+        from core.journal import recover
+        from ui.autosave import claim_untitled
+        claimed = claim_untitled()
+        if claimed is not None:
+            document = BoardDocument(Board(), claimed[0])
+            recover(document)
+            document.path = None        # Still untitled: saving asks for a name
+        else:
+            document = BoardDocument(self.canvas.board)
+        self._show_document(document, claimed)
+
+    def _show_document(self, document, untitled=None):
+        from ui.autosave import Autosave
+        if self.autosave is not None:
+            self.autosave.close()
+        if self.canvas.document is not None and self.canvas.document is not document:
+            self.canvas.document.close()
+        if document.board is not self.canvas.board:
+            self.canvas.set_board(document.board, document)
+        self.canvas.document = document
+        self.autosave = Autosave(document, untitled, parent=self)
+
+    def save_board(self, ask=False):
+        """Save the board, asking for a file name the first time.
+
+        While autosaving, saving under the current name just checkpoints
+        in the background.
+        """
+        from core.board_file import BoardDocument, FILE_EXTENSION
+        document = self.canvas.document
+        if document is None:
+            document = BoardDocument(self.canvas.board)
+            self.canvas.document = document
+        path = document.path
+        if ask or path is None:
+            path, _ = QFileDialog.getSaveFileName(
+                self, "Save Board", path or "", f"Boards (*{FILE_EXTENSION})")
+            if not path:
+                return
+            if not path.endswith(FILE_EXTENSION):
+                path += FILE_EXTENSION
+        if self.autosave is None:
+            document.save(path)
+        elif path == document.path:
+            self.autosave.checkpoint()
+        else:
+            # The old file gets a last checkpoint. An untitled one is dropped,
+            # but only once the document no longer maps it
+            from ui.autosave import Autosave
+            if self.autosave.untitled:
+                document.save(path)
+                self.autosave.close()
+            else:
+                self.autosave.close()
+                document.save(path)
+            self.autosave = Autosave(document, parent=self)
+
     # ==========================================================
     #  Event Handlers
     # ==========================================================
@@ -200,10 +302,24 @@ class MainWindow(QMainWindow):
                 self.maximize_btn.setText("❐" if self.isMaximized() else "□")
 
             # Update all resize handles visibility
-            for handle in self.resize_handles.values():
-                handle.setVisible(not self.isMaximized())
+            self._update_chrome()
         super().changeEvent(event)
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        self._update_chrome()
+
+    def closeEvent(self, event):
+        self.stop_autosave()
+        super().closeEvent(event)
+
+    def stop_autosave(self):
+        """Last checkpoint and journal cleanup, for a clean shutdown."""
+        if self.autosave is not None:
+            # Blocks for the final write: nothing is left to keep responsive
+            self.autosave.close()
+            self.autosave = None
+
     def mouseDoubleClickEvent(self, event):
         """Maximize/Restore on title bar double-click"""
         if event.y() < self.title_bar.height():
@@ -243,30 +359,28 @@ class MainWindow(QMainWindow):
             else:
                 self.drag_position = cursor_pos - self.frameGeometry().topLeft()
 
+        screen_geometry = self.geometry_scheduler.screen_geometry()
         if self.drag_position:
             cursor_pos = self.constrain_cursor_to_screen(cursor_pos)
-            new_pos = cursor_pos - self.drag_position
-            self.move(new_pos)
-
-            screen_geometry = QApplication.primaryScreen().geometry()
+            self.geometry_scheduler.request_move(cursor_pos - self.drag_position)
 
         # Snap indicators
         if cursor_pos.y() <= 20:
-            self.setCursor(Qt.SizeAllCursor)
+            self._set_drag_cursor(Qt.SizeAllCursor)
             self.show_visual_indicator(screen_geometry)
         elif cursor_pos.x() <= 20:
-            self.setCursor(Qt.SizeHorCursor)
+            self._set_drag_cursor(Qt.SizeHorCursor)
             left_half = QRect(screen_geometry.x(), screen_geometry.y(),
                               screen_geometry.width() // 2, screen_geometry.height())
             self.show_visual_indicator(left_half)
         elif cursor_pos.x() >= screen_geometry.width() - 20:
-            self.setCursor(Qt.SizeHorCursor)
+            self._set_drag_cursor(Qt.SizeHorCursor)
             right_half = QRect(screen_geometry.x() + screen_geometry.width() // 2,
                                screen_geometry.y(), screen_geometry.width() // 2,
                                screen_geometry.height())
             self.show_visual_indicator(right_half)
         else:
-            self.setCursor(Qt.ArrowCursor)
+            self._set_drag_cursor(Qt.ArrowCursor)
             self.hide_visual_indicator()
             event.accept()
 
@@ -276,7 +390,9 @@ class MainWindow(QMainWindow):
         self.setCursor(Qt.ArrowCursor)
 
         if self.dragging:
-            screen_geometry = QApplication.primaryScreen().geometry()
+            # Land the last move before snapping from it
+            self.geometry_scheduler.flush()
+            screen_geometry = self.geometry_scheduler.screen_geometry()
             cursor_pos = event.globalPosition().toPoint()
 
             if cursor_pos.y() <= 20:
@@ -306,12 +422,13 @@ class MainWindow(QMainWindow):
 
         new_x = cursor_pos.x() - self.width() // 2
         new_y = cursor_pos.y() - 10
-        self.move(new_x, new_y)
+        self.geometry_scheduler.request_move(QPoint(new_x, new_y))
         self.drag_position = QPoint(self.width() // 2, 10)
 
     def snap_to_left_half(self):
         """Snap window to left half of screen"""
-        screen_geometry = QApplication.primaryScreen().availableGeometry()
+        self.geometry_scheduler.cancel()
+        screen_geometry = self.geometry_scheduler.available_geometry()
         half_width = screen_geometry.width() // 2
         new_geometry = QRect(screen_geometry.x(), screen_geometry.y(),
                              half_width, screen_geometry.height())
@@ -320,7 +437,8 @@ class MainWindow(QMainWindow):
 
     def snap_to_right_half(self):
         """Snap window to right half of screen"""
-        screen_geometry = QApplication.primaryScreen().availableGeometry()
+        self.geometry_scheduler.cancel()
+        screen_geometry = self.geometry_scheduler.available_geometry()
         half_width = screen_geometry.width() // 2
         new_geometry = QRect(screen_geometry.x() + half_width, screen_geometry.y(),
                              half_width, screen_geometry.height())
@@ -335,8 +453,9 @@ class MainWindow(QMainWindow):
         handle_size = 6
         corner_size = 10
 
-        if not hasattr(self, 'resize_handles'):
+        if not getattr(self, 'resize_handles', None) or self.size() == self._handles_laid_out_for:
             return
+        self._handles_laid_out_for = self.size()
 
         self.resize_handles['top'].setGeometry(0, 0, self.width(), handle_size)
         self.resize_handles['bottom'].setGeometry(
@@ -358,6 +477,14 @@ class MainWindow(QMainWindow):
 
     def show_visual_indicator(self, geometry):
         """Show visual indicator at the specified geometry"""
+        # Placed relative to the window, so it is stale once the window moves
+        key = (QRect(geometry), self.pos())
+        if self.visual_indicator is None:
+            from ui.widgets.visual_indicator import VisualIndicator
+            self.visual_indicator = VisualIndicator(self)
+        elif self.visual_indicator.isVisible() and key == self._indicator_geometry:
+            return
+        self._indicator_geometry = key
         window_pos = self.mapFromGlobal(geometry.topLeft())
         self.visual_indicator.setGeometry(QRect(window_pos, geometry.size()))
         self.visual_indicator.show()
@@ -365,11 +492,16 @@ class MainWindow(QMainWindow):
 
     def hide_visual_indicator(self):
         """Hide visual indicator"""
-        self.visual_indicator.hide()
+        if self.visual_indicator is not None and self.visual_indicator.isVisible():
+            self.visual_indicator.hide()
+
+    def _set_drag_cursor(self, shape):
+        if self.cursor().shape() != shape:
+            self.setCursor(shape)
 
     def constrain_cursor_to_screen(self, cursor_pos):
         """Constrain cursor to stay within a percentage of screen height"""
-        screen_geometry = QApplication.primaryScreen().geometry()
+        screen_geometry = self.geometry_scheduler.screen_geometry()
         max_y = screen_geometry.y() + int(screen_geometry.height() * 0.925)
 
         constrained_x = max(screen_geometry.left(),
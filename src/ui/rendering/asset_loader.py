@@ -0,0 +1,178 @@
+import threading
+from functools import partial
+
+import numpy as np
+from PySide6.QtCore import (QBuffer, QByteArray, QCoreApplication, QIODevice, QObject, QSize, Qt,
+                            Signal, Slot)
+from PySide6.QtGui import QImage, QImageReader
+from PySide6.QtPdf import QPdfDocument
+
+from core.assets import (PDF_SCALE, AssetError, blend_over, downsample, mip_count, mip_size,
+                         sniff_kind)
+from ui.rendering.qimage_utils import image_buffer
+
+
+def _buffer(data):
+    device = QBuffer()
+    device.setData(QByteArray(data))
+    device.open(QIODevice.ReadOnly)
+    return device
+
+
+def _open_pdf(device):
+    document = QPdfDocument()
+    document.load(device)
+    if document.status() != QPdfDocument.Status.Ready:
+        raise AssetError(f"cannot read PDF: {document.error()}")
+    return document
+
+
+def probe(data):
+    """(kind, full-resolution (width, height) per page) without decoding pixels."""
+    kind = sniff_kind(data)
+    device = _buffer(data)
+    if kind == "pdf":
+        document = _open_pdf(device)
+        sizes = [document.pagePointSize(page) for page in range(document.pageCount())]
+        document.close()
+        return kind, [(max(1, round(s.width() * PDF_SCALE)), max(1, round(s.height() * PDF_SCALE)))
+                      for s in sizes]
+    size = QImageReader(device).size()      # Reads the header only
+    if not size.isValid():
+        raise AssetError("not an image format Qt can read")
+    return kind, [(size.width(), size.height())]
+
+
+def _pixels(image):
+    """Owned (H, W) premultiplied ARGB32 copy of a QImage's pixels."""
+    image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return np.array(image_buffer(image)[:, :image.width()])
+
+
+def build_image_levels(store, asset_id):
+    """Decode an image asset once and write all of its mip levels."""
+    image = QImage(store.source_path(asset_id))
+    if image.isNull():
+        raise AssetError(f"cannot decode image {asset_id}")
+    pixels = _pixels(image)
+    del image
+    count = mip_count(pixels.shape[1], pixels.shape[0])
+    for mip in range(count):
+        store.write_level(asset_id, 0, mip, pixels)
+        if mip + 1 < count:
+            pixels = downsample(pixels)
+
+
+def render_pdf_level(store, asset_id, page, mip):
+    """Rasterize one page of a PDF asset at mip level ``mip``, on white paper."""
+    with open(store.source_path(asset_id), "rb") as f:
+        device = _buffer(f.read())
+    document = _open_pdf(device)
+    if not 0 <= page < document.pageCount():
+        raise AssetError(f"{asset_id} has no page {page}")
+    width, height = mip_size(*store.page_size(asset_id, page), mip)
+    pixels = _pixels(document.render(page, QSize(width, height)))
+    document.close()
+    paper = np.full(pixels.shape, 0xFFFFFFFF, dtype=np.uint32)
+    blend_over(paper, pixels)
+    store.write_level(asset_id, page, mip, paper)
+
+
+# ==========================================================
+#  Asset Loader
+# ==========================================================
+class AssetLoader(QObject):
+    """Imports assets and decodes their mip levels off the GUI thread
+
+    ``import_data`` stores and probes an asset right away (a hash and a
+    header read, no pixel decoding) so it can be placed at its real size.
+    Decoding runs on ``threads``, a QThreadPool (the canvas shares its
+    RenderPool's), and ``asset_ready`` fires on the GUI thread whenever new
+    levels of an asset land. An image is decoded once into every level; a
+    PDF page is rendered per level on request. Without ``threads`` the work
+    runs inline, for tests and headless use.
+    """
+
+    asset_ready = Signal(str)           # Asset id
+    _finished = Signal(object)          # (key, ok), worker -> GUI thread hop
+
+    def __init__(self, store, threads=None, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.threads = threads
+        self.decoded = 0
+        self._queued = set()            # (asset_id, page, mip); mip None for a whole image
+        self._failed = set()
+        self._lock = threading.Lock()
+        self._finished.connect(self._deliver, Qt.QueuedConnection)
+
+    def import_data(self, data):
+        """Store image or PDF bytes; returns (asset_id, meta).
+
+        Content seen before is not stored again. Raises AssetError for data
+        that is neither.
+        """
+        data = bytes(data)
+        kind, pages = probe(data)
+        asset_id = self.store.add(data)
+        meta = self.store.meta(asset_id) or self.store.set_meta(asset_id, kind, pages)
+        if kind == "image":
+            self.request(asset_id, 0, 0)
+        return asset_id, meta
+
+    def import_file(self, path):
+        with open(path, "rb") as f:
+            return self.import_data(f.read())
+
+    def request(self, asset_id, page, mip):
+        """Decode level ``mip`` of ``page`` in the background unless it is on the way."""
+        if self.store.has_level(asset_id, page, mip):
+            return
+        meta = self.store.meta(asset_id)
+        if meta is None:
+            return
+        # An image's levels all come out of one decode
+        key = (asset_id, page, mip if meta["kind"] == "pdf" else None)
+        with self._lock:
+            if key in self._queued or key in self._failed:
+                return
+            self._queued.add(key)
+        job = partial(self._work, key)
+        if self.threads is None:
+            job()
+        else:
+            self.threads.start(job)
+
+    def wait(self, msecs=-1):
+        """Block until queued decodes are done (tests and headless use)."""
+        if self.threads is not None:
+            self.threads.waitForDone(msecs)
+        # Results are posted to this object as events; hand them out now
+        QCoreApplication.sendPostedEvents(self)
+
+    def _work(self, key):
+        asset_id, page, mip = key
+        ok = False
+        try:
+            if mip is None:
+                build_image_levels(self.store, asset_id)
+            else:
+                render_pdf_level(self.store, asset_id, page, mip)
+            ok = True
+        except (AssetError, OSError):
+            with self._lock:
+                self._failed.add(key)       # Not retried on every repaint
+        finally:
+            if self.threads is None:
+                self._deliver((key, ok))
+            else:
+                self._finished.emit((key, ok))
+
+    @Slot(object)
+    def _deliver(self, result):
+        key, ok = result
+        with self._lock:
+            self._queued.discard(key)
+        if ok:
+            self.decoded += 1
+            self.asset_ready.emit(key[0])
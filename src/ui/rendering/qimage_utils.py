@@ -0,0 +1,7 @@
+import numpy as np
+
+
+def image_buffer(image):
+    """Zero-copy (H, W) uint32 view of an ARGB32 QImage's pixels."""
+    return np.frombuffer(image.bits(), dtype=np.uint32).reshape(
+        image.height(), image.bytesPerLine() // 4)
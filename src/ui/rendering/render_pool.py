@@ -0,0 +1,161 @@
+import heapq
+import logging
+import threading
+from itertools import count
+
+from PySide6.QtCore import QCoreApplication, QObject, QThreadPool, Qt, Signal, Slot
+
+from core.tiles import tile_rect
+from ui.rendering.tile_renderer import rasterize
+
+log = logging.getLogger(__name__)
+
+
+class _Job:
+    """One queued tile render"""
+    __slots__ = ("position", "version", "plan", "center", "seq")
+
+    def __init__(self, position, version, plan, center, seq):
+        self.position = position
+        self.version = version
+        self.plan = plan
+        self.center = center
+        self.seq = seq
+
+
+# ==========================================================
+#  Render Pool
+# ==========================================================
+class RenderPool(QObject):
+    """Rasterizes tile plans on a QThreadPool, tiles nearest the focus first
+
+    Every request carries the tile's cache version and comes back through
+    ``tile_ready`` on the GUI thread, so the receiver can refuse results
+    that an edit made stale in the meantime. Requests that have not started
+    yet are cancelled by ``retain`` when the viewport moves on; a render
+    already running is left to finish since its tile may still be useful.
+    A render that raises is logged and reported through ``tile_failed``.
+    """
+
+    tile_ready = Signal(int, int, int, int, object)    # level, tx, ty, version, QImage
+    tile_failed = Signal(int, int, int, int)           # level, tx, ty, version
+    _finished = Signal(object, object)                 # Worker -> GUI thread hop
+
+    def __init__(self, threads=None, render=rasterize, parent=None):
+        super().__init__(parent)
+        self.render = render
+        self.threads = QThreadPool(self)
+        if threads is not None:
+            self.threads.setMaxThreadCount(threads)
+        self.focus = (0.0, 0.0)     # World point whose tiles go first
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self._queued = {}           # (level, tx, ty) -> _Job
+        self._heap = []             # (distance to focus, seq, position)
+        self._running = set()
+        self._lock = threading.Lock()
+        self._seq = count()
+        self._finished.connect(self._deliver, Qt.QueuedConnection)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    def __len__(self):
+        return len(self._queued) + len(self._running)
+
+    def in_flight(self, level, tx, ty):
+        """True if the tile is queued or being rendered."""
+        position = (level, tx, ty)
+        return position in self._queued or position in self._running
+
+    # ==========================================================
+    #  Scheduling
+    # ==========================================================
+    def request(self, level, tx, ty, version, plan):
+        """Queue ``plan`` for rendering as version ``version`` of the tile."""
+        x0, y0, x1, y1 = tile_rect(level, tx, ty)
+        job = _Job((level, tx, ty), version, plan,
+                   ((x0 + x1) / 2, (y0 + y1) / 2), next(self._seq))
+        with self._lock:
+            self._queued[job.position] = job
+            heapq.heappush(self._heap, (self._distance(job), job.seq, job.position))
+        self.threads.start(self._work)
+
+    def set_focus(self, x, y):
+        """Render queued tiles closest to world point (x, y) first."""
+        with self._lock:
+            if (x, y) != self.focus:
+                self.focus = (x, y)
+                self._reorder()
+
+    def retain(self, positions):
+        """Cancel queued requests not in ``positions``; returns those cancelled."""
+        with self._lock:
+            dropped = [position for position in self._queued if position not in positions]
+            for position in dropped:
+                del self._queued[position]
+            if dropped:
+                self._reorder()
+        self.cancelled += len(dropped)
+        return dropped
+
+    def clear(self):
+        """Cancel every queued request."""
+        return self.retain(())
+
+    def shutdown(self):
+        """Drop queued work and wait for running renders, e.g. before exit."""
+        self.clear()
+        self.threads.waitForDone()
+
+    def wait(self, msecs=-1):
+        """Block until the workers are idle, then deliver their results."""
+        done = self.threads.waitForDone(msecs)
+        # Results are posted to this object as events; hand them out now
+        QCoreApplication.sendPostedEvents(self)
+        return done
+
+    def _distance(self, job):
+        dx = job.center[0] - self.focus[0]
+        dy = job.center[1] - self.focus[1]
+        return dx * dx + dy * dy
+
+    def _reorder(self):
+        self._heap = [(self._distance(job), job.seq, position)
+                      for position, job in self._queued.items()]
+        heapq.heapify(self._heap)
+
+    # ==========================================================
+    #  Workers
+    # ==========================================================
+    def _work(self):
+        """Worker body: render whichever queued tile is nearest the focus."""
+        with self._lock:
+            job = None
+            while self._heap and job is None:
+                _, seq, position = heapq.heappop(self._heap)
+                queued = self._queued.get(position)
+                if queued is not None and queued.seq == seq:
+                    job = self._queued.pop(position)
+            if job is None:
+                return      # Its request was cancelled or already taken
+            self._running.add(job.position)
+        image = None
+        try:
+            image = self.render(job.plan)
+        except Exception:
+            log.exception("rendering tile %s failed", job.position)
+        finally:
+            self._finished.emit(job, image)
+
+    @Slot(object, object)
+    def _deliver(self, job, image):
+        with self._lock:
+            self._running.discard(job.position)
+        if image is not None:
+            self.completed += 1
+            self.tile_ready.emit(*job.position, job.version, image)
+        else:
+            self.failed += 1
+            self.tile_failed.emit(*job.position, job.version)
@@ -0,0 +1,131 @@
+import numpy as np
+from PySide6.QtGui import QImage
+
+from core import raster
+from core.assets import blend_over, composite_image
+from core.instrumentation import TILE_RENDER, instruments
+from core.geometry import rect_inflate
+from core.lod import LodCache, blob_pixels, split_tiny
+from core.tiles import TILE_SIZE, level_scale, tile_rect
+from ui.rendering.qimage_utils import image_buffer
+
+MIN_PIXEL_RADIUS = 0.5  # Hairlines stay visible however far out we zoom
+
+
+def rasterize(plan):
+    """Draw a ``TilePlan`` into a new transparent QImage; safe on any thread."""
+    with instruments.span(TILE_RENDER):
+        return _rasterize(plan)
+
+
+def _rasterize(plan):
+    image = QImage(TILE_SIZE, TILE_SIZE, QImage.Format_ARGB32_Premultiplied)
+    image.fill(0)
+    if plan.blobs is None and not plan.strokes and not plan.images:
+        return image
+
+    target = image_buffer(image)
+    for pixels, rect in plan.images:
+        composite_image(target, pixels, rect, plan.origin_x, plan.origin_y, plan.scale)
+    if plan.blobs is not None:
+        blobs = blob_pixels(plan.blobs, plan.origin_x, plan.origin_y, plan.scale, target.shape)
+        if plan.images:
+            blend_over(target, blobs)
+        else:
+            target[:] = blobs
+    min_radius = MIN_PIXEL_RADIUS / plan.scale
+    for x, y, pressure, width, color in plan.strokes:
+        radii = raster.stroke_radii(width, pressure, min_radius)
+        raster.render_stroke(target, x, y, radii, color,
+                             plan.origin_x, plan.origin_y, plan.scale)
+    return image
+
+
+class TilePlan:
+    """Everything needed to draw one tile, copied out of the board
+
+    Plans own their arrays, so rasterizing one never reads the board and
+    can happen on a worker thread while the GUI thread keeps editing.
+    Image pixels are read-only memory maps of asset mip levels; the plan's
+    reference keeps a level mapped even if the asset cache lets go of it.
+    """
+    __slots__ = ("level", "origin_x", "origin_y", "scale", "images", "blobs", "strokes")
+
+    def __init__(self, level, origin_x, origin_y, scale):
+        self.level = level
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.scale = scale
+        self.images = []        # (pixels, world rect) per placed image, beneath the strokes
+        self.blobs = None       # Stroke table rows drawn as blobs
+        self.strokes = []       # (x, y, pressure, width, color) per stroke
+
+
+class TileRenderer:
+    """Rasterizes the board into fixed-size tile images at a given level
+
+    Strokes are tessellated and rasterized by ``core.raster`` straight into
+    the QImage's memory, using the native engine when it is built. The
+    tile level selects each stroke's level of detail: strokes under a
+    couple of pixels become aggregated blobs, the rest are drawn from
+    their simplified polyline for that level.
+
+    Placed images are drawn first, from the mip level of their asset that
+    ``assets`` (an AssetCache) has for the tile's scale.
+
+    Rendering is split in two: ``plan`` queries the board and must run on
+    the GUI thread, ``rasterize`` does the heavy lifting anywhere.
+    """
+
+    def __init__(self, board, assets=None):
+        self.board = board
+        self.assets = assets
+        self.lod = LodCache(board.store)
+        board.add_stroke_listener(self._on_stroke)
+
+    def close(self):
+        """Stop following the board's edits."""
+        self.board.remove_stroke_listener(self._on_stroke)
+
+    def _on_stroke(self, event, stroke_id):
+        if event != "add":
+            self.lod.discard(stroke_id)
+
+    def plan(self, level, tx, ty):
+        """Snapshot the strokes tile (tx, ty) at ``level`` needs."""
+        rect = tile_rect(level, tx, ty)
+        return self.plan_at(level, rect[0], rect[1], level_scale(level))
+
+    def plan_at(self, level, origin_x, origin_y, scale):
+        """Snapshot a tile whose top-left pixel shows (origin_x, origin_y).
+
+        Unlike ``plan`` the tile need not sit on the level's grid nor use its
+        scale (exports render at any scale); ``level`` only picks the strokes'
+        level of detail and should be ``level_for_zoom(scale)``.
+        """
+        rect = (origin_x, origin_y, origin_x + TILE_SIZE / scale, origin_y + TILE_SIZE / scale)
+        plan = TilePlan(level, origin_x, origin_y, scale)
+        if self.assets is not None:
+            for image in self.board.images_in_rect(rect):
+                pixels = self.assets.pixels(image.asset, image.page, image.rect, scale)
+                if pixels is not None:
+                    plan.images.append((pixels, image.rect))
+        # One pixel of slack so antialiased edges on tile seams are not cut
+        ids = self.board.ids_in_rect(rect_inflate(rect, 1.0 / scale))
+        if not ids:
+            return plan
+
+        store = self.board.store
+        tiny, regular = split_tiny(store, ids, scale)
+        if len(tiny):
+            plan.blobs = store.table[tiny]
+        for stroke_id in regular.tolist():
+            x, y, pressure = self.lod.polyline(stroke_id, level)
+            stroke = store[stroke_id]
+            plan.strokes.append((np.array(x), np.array(y), np.array(pressure),
+                                 stroke.width, stroke.color))
+        return plan
+
+    def render_tile(self, level, tx, ty):
+        """Render tile (tx, ty) at ``level`` into a new transparent QImage."""
+        return rasterize(self.plan(level, tx, ty))
@@ -0,0 +1,57 @@
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupProfile:
+    """Wall-clock phases of application startup, for ``--profile-startup``
+
+    ``phase`` times a block and counts the modules it imported, which is
+    where most cold-start time goes; ``mark`` records a point in time
+    (e.g. the first paint). Only the standard library is imported here so
+    the profile can start before Qt does.
+    """
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.phases = []            # (name, seconds, modules imported)
+        self.marks = []             # (name, seconds since start)
+
+    @contextmanager
+    def phase(self, name):
+        modules = len(sys.modules)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start,
+                                len(sys.modules) - modules))
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.started))
+
+    def report(self, out=None):
+        out = out or sys.stderr
+        print("startup phases:", file=out)
+        for name, seconds, modules in self.phases:
+            print(f"  {name:<24} {seconds * 1000:8.1f} ms  {modules:5d} modules", file=out)
+        for name, seconds in self.marks:
+            print(f"{name + ':':<26} {seconds * 1000:8.1f} ms after launch", file=out)
+        print(f"{'modules loaded:':<26} {len(sys.modules):8d}"
+              "  (per-module times: python -X importtime)", file=out)
+
+
+def after_first_paint(widget, callback):
+    """Call ``callback`` once, just after ``widget`` has painted for the first time."""
+    from PySide6.QtCore import QEvent, QObject, QTimer
+
+    class Watcher(QObject):
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint:
+                widget.removeEventFilter(self)
+                # The filter sees the event before the paint; run after it
+                QTimer.singleShot(0, callback)
+                self.deleteLater()
+            return False
+
+    widget.installEventFilter(Watcher(widget))
@@ -0,0 +1,600 @@
+import math
+
+import numpy as np
+from PySide6.QtCore import Qt, QBuffer, QEvent, QIODevice, QPointF, QRectF
+from PySide6.QtGui import QPainter, QColor, QCursor, QImage, QKeySequence, QPen, QPolygonF
+from PySide6.QtWidgets import QApplication, QWidget
+
+from core.assets import PDF_SCALE, AssetCache, AssetError, AssetStore
+from core.board import Board, DEFAULT_COLOR, DEFAULT_WIDTH
+from core.geometry import rect_inflate, rect_intersects
+from core.history import History
+from core.instrumentation import CACHE_LOOKUP, COMPOSITE, INPUT, instruments
+from core.ink_pipeline import InkPipeline
+from core.tile_cache import TileCache
+from core.tiles import (MIN_LEVEL, level_for_zoom, level_scale, tile_rect,
+                        tile_world_size, tiles_for_rect)
+from ui.rendering.asset_loader import AssetLoader
+from ui.rendering.render_pool import RenderPool
+from ui.rendering.tile_renderer import TileRenderer
+from ui.widgets.wet_ink import WetInkOverlay, draw_polyline
+
+BACKGROUND_COLOR = QColor(0x1E, 0x1E, 0x1E)
+MIN_ZOOM = 2.0 ** -12
+MAX_ZOOM = 2.0 ** 8
+ZOOM_STEP = 1.0015      # Zoom factor per wheel angle-delta unit
+ERASER_RADIUS = 8.0     # Screen pixels
+SELECTION_COLOR = QColor(0x3A, 0x96, 0xDD)
+PLACEHOLDER_LEVELS = 4  # Coarser levels searched for a stand-in while a tile renders
+PAGE_GAP = 16.0         # Screen pixels between the pages of a pasted PDF
+ASSET_MARGIN = 1.0      # Viewports around the view whose images stay mapped
+
+TOOL_KEYS = {Qt.Key_P: "pen", Qt.Key_E: "eraser", Qt.Key_X: "pixel_eraser",
+             Qt.Key_L: "lasso"}
+INPUT_EVENTS = {QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.MouseButtonRelease,
+                QEvent.MouseButtonDblClick, QEvent.Wheel, QEvent.KeyPress, QEvent.KeyRelease,
+                QEvent.TabletPress, QEvent.TabletMove, QEvent.TabletRelease}
+
+
+# ==========================================================
+#  Canvas Widget
+# ==========================================================
+class Canvas(QWidget):
+    """Infinite canvas that draws the board from cached world-space tiles.
+
+    Content is stored in world coordinates by ``Board``. The view is a pan
+    offset (world point at the widget's top-left) plus a zoom factor. Tiles
+    are rendered once per level and reused across pans and zooms; only
+    newly exposed tiles, or tiles touched by an edit, are rasterized.
+
+    Tiles are rasterized by a ``RenderPool`` off the GUI thread, nearest
+    the cursor first; until one lands, the previous image of the tile or a
+    magnified coarser tile stands in for it. ``workers=0`` renders tiles
+    synchronously inside ``paintEvent`` instead.
+
+    While the window is being resized interactively the canvas only
+    stretches a snapshot of its last frame; tiles are drawn again once the
+    resize settles.
+
+    Pasted images and PDFs go into ``asset_store`` and are drawn into the
+    tiles from the mip level matching the zoom, decoded by an AssetLoader
+    on the render pool's threads.
+    """
+
+    def __init__(self, parent=None, board=None, cache_budget=None, workers=None,
+                 asset_store=None):
+        super().__init__(parent)
+        self.setObjectName("Canvas")
+        self.setMouseTracking(True)
+        self.setFocusPolicy(Qt.StrongFocus)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)
+
+        # -----------------------
+        # View State
+        # -----------------------
+        self.offset = QPointF(0, 0)
+        self.zoom = 1.0
+        self.tiles = TileCache() if cache_budget is None else TileCache(cache_budget)
+        self.tiles_rendered = 0         # Running count, handy for profiling
+        self.stale_tiles = {}           # Invalidated images shown until redrawn
+        self.failed_tiles = set()       # Positions whose render raised, until next invalidated
+        self.resize_frame = None        # Last frame, stretched during interactive resize
+        self.render_pool = None
+        if workers != 0:
+            self.render_pool = RenderPool(workers, parent=self)
+            self.render_pool.tile_ready.connect(self._tile_ready)
+            self.render_pool.tile_failed.connect(self._tile_failed)
+        self.asset_store = asset_store if asset_store is not None else AssetStore()
+        self.asset_loader = AssetLoader(self.asset_store,
+                                        self.render_pool.threads if self.render_pool else None,
+                                        parent=self)
+        self.asset_loader.asset_ready.connect(self._asset_ready)
+        self.assets = AssetCache(self.asset_store, request=self.asset_loader.request)
+
+        # -----------------------
+        # Interaction State
+        # -----------------------
+        self.pen_width = DEFAULT_WIDTH     # Screen pixels at the moment of drawing
+        self.pen_color = DEFAULT_COLOR
+        self.tool = "pen"
+        self.ink = InkPipeline()
+        self.current_stroke = None      # Smoothed StrokeBuilder while the pen is down
+        self.wet_ink = WetInkOverlay(self)
+        self.settling = []              # Committed strokes drawn until their tiles land
+        self.stroke_start_time = 0
+        self.lasso_points = None
+        self.erasing = False
+        self.eraser_last = None         # World position of the previous eraser event
+        self.selection = []
+        self.selected_images = []
+        self.pan_anchor = None
+        self.space_held = False
+        self.hud = None                 # Timing overlay, built on first toggle
+
+        # -----------------------
+        # Content
+        # -----------------------
+        self.board = None
+        self.document = None            # BoardDocument when backed by a file
+        self.history = None             # Undo/redo log of edits to the board
+        self.set_board(board if board is not None else Board())
+
+    def set_board(self, board, document=None):
+        """Show ``board`` (optionally file-backed by ``document``) from scratch."""
+        if self.board is not None:
+            self.board.remove_listener(self.invalidate_rect)
+            self.renderer.close()
+        if self.history is not None:
+            self.history.clear()
+        self.board = board
+        self.document = document
+        self.history = History(board)
+        self.renderer = TileRenderer(board, self.assets)
+        self.board.add_listener(self.invalidate_rect)
+        if self.render_pool is not None:
+            self.render_pool.clear()
+        self.tiles.clear()
+        self.stale_tiles = {}
+        self.failed_tiles = set()
+        self.settling = []
+        self.selection = []
+        self.selected_images = []
+        self.update()
+
+    # ==========================================================
+    #  Coordinate Mapping
+    # ==========================================================
+    def screen_to_world(self, pos):
+        """Map a widget-space QPointF to a world (x, y) tuple."""
+        return (self.offset.x() + pos.x() / self.zoom,
+                self.offset.y() + pos.y() / self.zoom)
+
+    def world_to_screen(self, x, y):
+        """Map a world point to a widget-space QPointF."""
+        return QPointF((x - self.offset.x()) * self.zoom,
+                       (y - self.offset.y()) * self.zoom)
+
+    def visible_world_rect(self):
+        """World rectangle currently shown by the widget."""
+        x0, y0 = self.offset.x(), self.offset.y()
+        return (x0, y0, x0 + self.width() / self.zoom, y0 + self.height() / self.zoom)
+
+    # ==========================================================
+    #  View Control
+    # ==========================================================
+    def pan_by(self, dx, dy):
+        """Scroll the view by (dx, dy) screen pixels."""
+        self.offset -= QPointF(dx / self.zoom, dy / self.zoom)
+        self.update()
+
+    def zoom_at(self, pos, factor):
+        """Zoom by ``factor`` keeping the world point under ``pos`` fixed."""
+        new_zoom = max(MIN_ZOOM, min(MAX_ZOOM, self.zoom * factor))
+        if new_zoom == self.zoom:
+            return
+        wx, wy = self.screen_to_world(pos)
+        self.zoom = new_zoom
+        self.offset = QPointF(wx - pos.x() / new_zoom, wy - pos.y() / new_zoom)
+        self.update()
+
+    # ==========================================================
+    #  Tile Cache
+    # ==========================================================
+    def invalidate_rect(self, rect):
+        """Drop cached tiles (at every level) that overlap world ``rect``."""
+        if self.render_pool is not None:
+            # Keep showing the old images until their replacements land
+            level = level_for_zoom(self.zoom)
+            for position in self.tiles:
+                if position[0] == level and rect_intersects(tile_rect(*position), rect):
+                    self.stale_tiles[position] = self.tiles.peek(*position)
+            # What made a render fail may have been edited away
+            self.failed_tiles = {position for position in self.failed_tiles
+                                 if not rect_intersects(tile_rect(*position), rect)}
+        if self.tiles.invalidate(rect):
+            self.update()
+
+    def tile(self, level, tx, ty):
+        """Return the cached tile image, rendering it on a miss."""
+        with instruments.span(CACHE_LOOKUP):
+            image = self.tiles.get(level, tx, ty)
+        if image is None:
+            image = self.renderer.render_tile(level, tx, ty)
+            self.tiles.put(level, tx, ty, image, image.sizeInBytes())
+            self.tiles_rendered += 1
+        return image
+
+    def request_tile(self, level, tx, ty):
+        """Queue a background render of the tile unless one is in flight or failed."""
+        if (level, tx, ty) in self.failed_tiles:
+            return
+        if not self.render_pool.in_flight(level, tx, ty):
+            version = self.tiles.begin(level, tx, ty)
+            self.render_pool.request(level, tx, ty, version,
+                                     self.renderer.plan(level, tx, ty))
+
+    def placeholder(self, level, tx, ty):
+        """(image, source rect) to draw while the tile is being rendered."""
+        stale = self.stale_tiles.get((level, tx, ty))
+        if stale is not None:
+            return stale, QRectF(stale.rect())
+        x0, y0, x1, y1 = tile_rect(level, tx, ty)
+        for coarser in range(level - 1, max(level - PLACEHOLDER_LEVELS, MIN_LEVEL) - 1, -1):
+            size = tile_world_size(coarser)
+            ptx, pty = math.floor(x0 / size), math.floor(y0 / size)
+            image = self.tiles.peek(coarser, ptx, pty)
+            if image is not None:
+                scale = level_scale(coarser)
+                return image, QRectF((x0 - ptx * size) * scale, (y0 - pty * size) * scale,
+                                     (x1 - x0) * scale, (y1 - y0) * scale)
+        return None, None
+
+    def _tile_ready(self, level, tx, ty, version, image):
+        if self.tiles.put(level, tx, ty, image, image.sizeInBytes(), version):
+            self.tiles_rendered += 1
+            self.stale_tiles.pop((level, tx, ty), None)
+        if not len(self.render_pool):
+            self.settling = []
+        # A refused (stale) tile is simply requested again by the repaint
+        self.update()
+
+    def _tile_failed(self, level, tx, ty, version):
+        # Not retried on every repaint: only once the board changes under it
+        self.tiles.cancel(level, tx, ty)
+        self.failed_tiles.add((level, tx, ty))
+        if not len(self.render_pool):
+            self.settling = []
+
+    def _asset_ready(self, asset_id):
+        # Redraw whatever shows the asset, now with the level it wanted
+        for image in self.board.images():
+            if image.asset == asset_id:
+                self.invalidate_rect(image.rect)
+
+    # ==========================================================
+    #  Interactive Resize
+    # ==========================================================
+    def begin_interactive_resize(self):
+        """Show a stretched snapshot of the current frame until the resize ends."""
+        if self.resize_frame is None and self.isVisible():
+            self.resize_frame = self.grab()
+
+    def end_interactive_resize(self):
+        if self.resize_frame is not None:
+            self.resize_frame = None
+            self.update()
+
+    # ==========================================================
+    #  Instrumentation
+    # ==========================================================
+    def event(self, event):
+        # Time input handling and painting here rather than in every handler
+        if instruments.enabled:
+            kind = event.type()
+            if kind in INPUT_EVENTS:
+                with instruments.span(INPUT):
+                    return super().event(event)
+            if kind == QEvent.Paint:
+                with instruments.span(COMPOSITE):
+                    return super().event(event)
+        return super().event(event)
+
+    def toggle_hud(self):
+        """Show or hide the timing overlay, turning instrumentation on with it."""
+        if self.hud is None:
+            from ui.widgets.instrument_hud import InstrumentHud
+            self.hud = InstrumentHud(self)
+        if self.hud.isVisible():
+            self.hud.hide()
+        else:
+            if not instruments.enabled:
+                instruments.enable()
+            self.hud.show()
+            self.hud.raise_()
+
+    # ==========================================================
+    #  Painting
+    # ==========================================================
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        if self.resize_frame is not None:
+            painter.drawPixmap(self.rect(), self.resize_frame)
+            painter.end()
+            return
+        painter.fillRect(event.rect(), BACKGROUND_COLOR)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+
+        level = level_for_zoom(self.zoom)
+        visible = self.visible_world_rect()
+        # Overlay repaints (wet ink) expose a small region; only draw under it
+        exposed = QRectF(event.rect())
+        exposed = (*self.screen_to_world(exposed.topLeft()),
+                   *self.screen_to_world(exposed.bottomRight() + QPointF(1, 1)))
+        if self.document is not None:
+            # Pull in stored chunks around the view before drawing it
+            margin = max(visible[2] - visible[0], visible[3] - visible[1]) / 2
+            self.document.ensure_region(rect_inflate(visible, margin))
+        if self.render_pool is not None:
+            self.render_pool.set_focus(*self._focus_point())
+
+        wanted = set()
+        for tx, ty in tiles_for_rect(level, visible):
+            wanted.add((level, tx, ty))
+            x0, y0, x1, y1 = tile_rect(level, tx, ty)
+            if not rect_intersects((x0, y0, x1, y1), exposed):
+                continue
+            target = QRectF(self.world_to_screen(x0, y0), self.world_to_screen(x1, y1))
+            if self.render_pool is None:
+                painter.drawImage(target, self.tile(level, tx, ty))
+                continue
+            with instruments.span(CACHE_LOOKUP):
+                image = self.tiles.get(level, tx, ty)
+            if image is not None:
+                painter.drawImage(target, image)
+                continue
+            self.request_tile(level, tx, ty)
+            image, source = self.placeholder(level, tx, ty)
+            if image is not None:
+                painter.drawImage(target, image, source)
+
+        if self.render_pool is not None:
+            # Tiles scrolled out of view are not worth rendering any more
+            for position in self.render_pool.retain(wanted):
+                self.tiles.cancel(*position)
+            self.stale_tiles = {position: image for position, image in self.stale_tiles.items()
+                                if position in wanted}
+        if len(self.assets):
+            # Unmap images placed far outside the view
+            margin = ASSET_MARGIN * max(visible[2] - visible[0], visible[3] - visible[1])
+            self.assets.retain({(image.asset, image.page) for image in
+                                self.board.images_in_rect(rect_inflate(visible, margin))})
+
+        if self.settling:
+            self._paint_settling(painter)
+        if self.selection or self.selected_images or self.lasso_points:
+            self._paint_selection(painter)
+        painter.end()
+
+    def resizeEvent(self, event):
+        self.wet_ink.setGeometry(self.rect())
+        super().resizeEvent(event)
+
+    def _paint_settling(self, painter):
+        """Draw just-committed strokes whose tiles are still rendering."""
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.scale(self.zoom, self.zoom)
+        painter.translate(-self.offset)
+        for xs, ys, width, color in self.settling:
+            draw_polyline(painter, xs, ys, width, color)
+        painter.restore()
+
+    def _focus_point(self):
+        """World point to render first: the cursor, else the view centre."""
+        pos = QPointF(self.mapFromGlobal(QCursor.pos()))
+        if not self.rect().contains(pos.toPoint()):
+            pos = QPointF(self.width() / 2, self.height() / 2)
+        return self.screen_to_world(pos)
+
+    def _paint_selection(self, painter):
+        """Outline selected strokes and images and the lasso being drawn."""
+        painter.save()
+        pen = QPen(SELECTION_COLOR, 1, Qt.DashLine)
+        painter.setPen(pen)
+        strokes = [self.board.stroke(stroke_id) for stroke_id in self.selection]
+        images = [self.board.image(image_id) for image_id in self.selected_images]
+        for rect in ([s.bounds for s in strokes if s is not None] +
+                     [i.rect for i in images if i is not None]):
+            x0, y0, x1, y1 = rect
+            painter.drawRect(QRectF(self.world_to_screen(x0, y0),
+                                    self.world_to_screen(x1, y1)))
+        if self.lasso_points:
+            painter.drawPolygon(QPolygonF([self.world_to_screen(x, y)
+                                           for x, y in self.lasso_points]))
+        painter.restore()
+
+    # ==========================================================
+    #  Tools
+    # ==========================================================
+    def set_tool(self, tool):
+        """Switch between the 'pen', 'eraser', 'pixel_eraser' and 'lasso' tools."""
+        self.tool = tool
+        self.selection = []
+        self.selected_images = []
+        self.update()
+
+    def erase_at(self, pos):
+        """Erase under the eraser moving to widget position ``pos``.
+
+        The whole way from the previous eraser event is covered, not just
+        the new position. The stroke eraser removes every stroke it
+        touches; the pixel eraser cuts away only the parts it passes over.
+        """
+        x, y = self.screen_to_world(pos)
+        if self.eraser_last is None:
+            xs, ys = [x], [y]
+        else:
+            xs, ys = [self.eraser_last[0], x], [self.eraser_last[1], y]
+        self.eraser_last = (x, y)
+        radius = ERASER_RADIUS / self.zoom
+        if self.tool == "pixel_eraser":
+            self.history.split(self.board.split_along(xs, ys, radius))
+        else:
+            self.history.erase(self.board.strokes_touching_path(xs, ys, radius))
+
+    def paste(self):
+        """Place the clipboard's image, or image and PDF files, at the view centre."""
+        mime = QApplication.clipboard().mimeData()
+        sources = []
+        if mime.hasUrls():
+            for url in mime.urls():
+                if url.isLocalFile():
+                    try:
+                        with open(url.toLocalFile(), "rb") as f:
+                            sources.append(f.read())
+                    except OSError:
+                        continue        # Gone or unreadable, like a file Qt cannot decode
+        elif mime.hasImage():
+            device = QBuffer()
+            device.open(QIODevice.WriteOnly)
+            QImage(mime.imageData()).save(device, "PNG")
+            sources.append(bytes(device.data()))
+        x, y = self.screen_to_world(QPointF(self.width() / 2, self.height() / 2))
+        placed = []
+        with self.history.group():      # One paste is one undo step
+            for data in sources:
+                try:
+                    ids = self.insert_asset(data, x, y)
+                except AssetError:
+                    continue        # Not an image or PDF Qt can read
+                if ids:
+                    y = self.board.image(ids[-1]).rect[3] + PAGE_GAP / self.zoom
+                    placed += ids
+        return placed
+
+    def insert_asset(self, data, x, y):
+        """Place image or PDF bytes with their top centre at world (x, y).
+
+        Images come in at their pixel size on screen, PDF pages at their
+        printed size (one point per pixel), stacked downwards, as one undo
+        step. Returns the image ids.
+        """
+        asset_id, meta = self.asset_loader.import_data(data)
+        per_pixel = (PDF_SCALE if meta["kind"] == "pdf" else 1.0) * self.zoom
+        placed = []
+        with self.history.group():
+            for page, (width, height) in enumerate(meta["pages"]):
+                w, h = width / per_pixel, height / per_pixel
+                placed.append(self.history.add_image(asset_id, (x - w / 2, y, x + w / 2, y + h),
+                                                     page))
+                y += h + PAGE_GAP / self.zoom
+        return placed
+
+    def delete_selection(self):
+        with self.history.group():
+            self.history.erase(self.selection)
+            self.history.remove_images(self.selected_images)
+        self.selection = []
+        self.selected_images = []
+        self.update()
+
+    def undo(self):
+        if self.history.undo():
+            self.selection = []
+            self.selected_images = []
+            self.update()
+
+    def redo(self):
+        if self.history.redo():
+            self.selection = []
+            self.selected_images = []
+            self.update()
+
+    # ==========================================================
+    #  Event Handlers
+    # ==========================================================
+    def wheelEvent(self, event):
+        """Zoom around the cursor"""
+        delta = event.angleDelta().y()
+        if delta:
+            self.zoom_at(event.position(), ZOOM_STEP ** delta)
+        event.accept()
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Space and not event.isAutoRepeat():
+            self.space_held = True
+            self.setCursor(Qt.OpenHandCursor)
+        elif event.matches(QKeySequence.Undo):
+            self.undo()
+        elif event.matches(QKeySequence.Redo):
+            self.redo()
+        elif event.matches(QKeySequence.Paste):
+            self.paste()
+        elif event.key() == Qt.Key_F3:
+            self.toggle_hud()
+        elif event.key() in TOOL_KEYS:
+            self.set_tool(TOOL_KEYS[event.key()])
+        elif event.key() in (Qt.Key_Delete, Qt.Key_Backspace):
+            self.delete_selection()
+        else:
+            super().keyPressEvent(event)
+
+    def keyReleaseEvent(self, event):
+        if event.key() == Qt.Key_Space and not event.isAutoRepeat():
+            self.space_held = False
+            self.unsetCursor()
+        else:
+            super().keyReleaseEvent(event)
+
+    def mousePressEvent(self, event):
+        """Middle button or space+left pans; left button uses the active tool"""
+        if (event.button() == Qt.MiddleButton or
+                (event.button() == Qt.LeftButton and self.space_held)):
+            self.pan_anchor = event.position()
+            self.setCursor(Qt.ClosedHandCursor)
+        elif event.button() == Qt.LeftButton:
+            if self.tool in ("eraser", "pixel_eraser"):
+                # One drag of the eraser is one undo step
+                self.erasing = True
+                self.eraser_last = None
+                self.history.begin_group()
+                self.erase_at(event.position())
+            elif self.tool == "lasso":
+                self.lasso_points = [self.screen_to_world(event.position())]
+                self.update()
+            else:
+                # The stroke is drawn by the wet-ink overlay until pen-up
+                self.ink.begin(self.zoom)
+                self.current_stroke = self.ink.output
+                self.stroke_start_time = event.timestamp()
+                self.wet_ink.begin()
+                self._append_point(event)
+        event.accept()
+
+    def mouseMoveEvent(self, event):
+        if self.pan_anchor is not None:
+            delta = event.position() - self.pan_anchor
+            self.pan_anchor = event.position()
+            self.pan_by(delta.x(), delta.y())
+        elif self.current_stroke is not None:
+            self._append_point(event)
+        elif self.erasing:
+            self.erase_at(event.position())
+        elif self.lasso_points is not None:
+            self.lasso_points.append(self.screen_to_world(event.position()))
+            self.update()
+        event.accept()
+
+    def _append_point(self, event):
+        """Feed a pen sample to the ink pipeline; time is seconds since pen-down."""
+        x, y = self.screen_to_world(event.position())
+        self.ink.add(x, y, event.point(0).pressure(),
+                     (event.timestamp() - self.stroke_start_time) / 1000.0)
+        self.wet_ink.add_sample(event.timestamp())
+
+    def mouseReleaseEvent(self, event):
+        if self.pan_anchor is not None:
+            self.pan_anchor = None
+            if self.space_held:
+                self.setCursor(Qt.OpenHandCursor)
+            else:
+                self.unsetCursor()
+        elif self.current_stroke is not None:
+            self.current_stroke = None
+            stroke = self.ink.finish()
+            width = self.pen_width / self.zoom
+            # Committing invalidates just the tiles under the new stroke
+            self.history.add_stroke(np.column_stack((stroke.x, stroke.y)),
+                                    width, self.pen_color, stroke.pressure, stroke.time)
+            if self.render_pool is not None:
+                self.settling.append((stroke.x, stroke.y, width, self.pen_color))
+            self.wet_ink.end()
+        elif self.erasing:
+            self.erasing = False
+            self.history.end_group()
+        elif self.lasso_points is not None:
+            polygon, self.lasso_points = self.lasso_points, None
+            self.selection = self.board.strokes_in_polygon(polygon)
+            self.selected_images = self.board.images_in_polygon(polygon)
+            self.update()
+        event.accept()
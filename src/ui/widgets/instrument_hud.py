@@ -0,0 +1,65 @@
+from PySide6.QtGui import QPainter, QColor, QFont, QFontMetrics
+from PySide6.QtCore import Qt, QTimer, QRect
+from PySide6.QtWidgets import QWidget
+
+from core.instrumentation import CACHE_LOOKUP, COMPOSITE, INPUT, TILE_RENDER, WET_INK, instruments
+
+REFRESH_MS = 500
+MARGIN = 8
+ORDER = (INPUT, CACHE_LOOKUP, TILE_RENDER, COMPOSITE, WET_INK)
+
+
+class InstrumentHud(QWidget):
+    """Transparent overlay listing p50/p95/p99 of the instrumentation timers
+
+    Redraws itself twice a second, not every frame, so it barely shows up
+    in the numbers it reports.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)  # Click-through
+        self.text_font = QFont("monospace", 9)
+        self.text_font.setStyleHint(QFont.Monospace)
+        self.lines = []
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_MS)
+        self.timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        """Re-read the timers and resize to fit them."""
+        summary = instruments.summary()
+        names = [n for n in ORDER if n in summary] + sorted(set(summary) - set(ORDER))
+        self.lines = [f"{'ms':<13}{'p50':>7}{'p95':>7}{'p99':>7}{'n':>7}"]
+        for name in names:
+            s = summary[name]
+            if s["count"]:
+                self.lines.append(f"{name:<13}{s['p50']:7.2f}{s['p95']:7.2f}"
+                                  f"{s['p99']:7.2f}{s['count']:7d}")
+        metrics = QFontMetrics(self.text_font)
+        width = max(metrics.horizontalAdvance(line) for line in self.lines)
+        self.setGeometry(MARGIN, MARGIN, width + 2 * MARGIN,
+                         metrics.height() * len(self.lines) + 2 * MARGIN)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(QColor(0, 0, 0, 170))  # Dark, see-through panel
+        painter.drawRoundedRect(self.rect(), 4, 4)
+        painter.setFont(self.text_font)
+        painter.setPen(QColor(255, 255, 255, 220))
+        line_height = QFontMetrics(self.text_font).height()
+        for i, line in enumerate(self.lines):
+            painter.drawText(QRect(MARGIN, MARGIN + i * line_height, self.width(), line_height),
+                             Qt.AlignLeft | Qt.AlignVCenter, line)
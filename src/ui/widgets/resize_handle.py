@@ -1,5 +1,5 @@
 from PySide6.QtWidgets import QWidget
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QRect
 
 class ResizeHandle(QWidget):
     def __init__(self, parent, position):
@@ -42,6 +42,10 @@ class ResizeHandle(QWidget):
             
     def mouseReleaseEvent(self, event):
         self.mouse_pressed = False
+        scheduler = getattr(self.window(), 'geometry_scheduler', None)
+        if scheduler is not None:
+            scheduler.flush()  # Land the final size without waiting a frame
+            scheduler.settle()
         event.accept()
         
     def handle_resize(self, global_pos):
@@ -76,4 +80,9 @@ class ResizeHandle(QWidget):
                 y = self.window_pos.y() + self.window_size.height() - min_height
                 h = min_height
                 
-        self.window().setGeometry(x, y, w, h)
\ No newline at end of file
+        # Coalesced to one resize per frame when the window has a scheduler
+        scheduler = getattr(self.window(), 'geometry_scheduler', None)
+        if scheduler is not None:
+            scheduler.request_geometry(QRect(x, y, w, h))
+        else:
+            self.window().setGeometry(x, y, w, h)
\ No newline at end of file
@@ -1,28 +1,125 @@
-from PySide6.QtWidgets import QWidget, QGraphicsDropShadowEffect
-from PySide6.QtGui import QColor
-from PySide6.QtCore import Qt
+import numpy as np
+from PySide6.QtWidgets import QWidget
+from PySide6.QtGui import QColor, QImage, QPainter
+from PySide6.QtCore import Qt, QEvent, QRect
+
+from ui.rendering.qimage_utils import image_buffer
+
+DEFAULT_FEATHER = 100
+DEFAULT_COLOR = QColor(0, 0, 0, 180)
+BLUR_PASSES = 3             # Three box blurs are close to a Gaussian
+
+_slices = {}                # (feather, rgba) -> blurred nine-slice source
+
+
+def _box_blur(alpha, width, axis):
+    """Running mean of ``width`` (odd) samples along ``axis``; edges pad with zero."""
+    pad = [(0, 0), (0, 0)]
+    pad[axis] = (width // 2 + 1, width // 2)
+    sums = np.cumsum(np.pad(alpha, pad), axis=axis)
+    upper = sums.take(np.arange(width, sums.shape[axis]), axis=axis)
+    lower = sums.take(np.arange(0, sums.shape[axis] - width), axis=axis)
+    return (upper - lower) / width
+
+
+def shadow_slices(feather, color):
+    """Blurred square shadow to cut nine slices from, made once per feather and color.
+
+    The image is ``4 * feather`` across: a solid ``2 * feather`` square in
+    the middle with the shadow fading out over ``feather`` around it. Its
+    corners are the shadow's corners, and one row or column through the
+    middle stretches into an edge of any length.
+    """
+    key = (feather, color.rgba())
+    image = _slices.get(key)
+    if image is not None:
+        return image
+
+    size = 4 * feather
+    alpha = np.zeros((size, size))
+    alpha[feather:3 * feather, feather:3 * feather] = 1.0
+    # Variance of n box passes of width w is n * (w^2 - 1) / 12; fade out over the feather
+    sigma = feather / 3.0
+    width = int(np.sqrt(12 * sigma * sigma / BLUR_PASSES + 1)) | 1
+    for _ in range(BLUR_PASSES):
+        alpha = _box_blur(_box_blur(alpha, width, 0), width, 1)
+
+    a = alpha * color.alphaF()
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    pixels = image_buffer(image)[:, :size]
+    pixels[:] = ((np.round(a * 255).astype(np.uint32) << 24) |
+                 (np.round(a * color.red()).astype(np.uint32) << 16) |
+                 (np.round(a * color.green()).astype(np.uint32) << 8) |
+                 np.round(a * color.blue()).astype(np.uint32))
+    _slices[key] = image
+    return image
+
 
 class ShadowWindow(QWidget):
-    def __init__(self, feather=100):
+    """Click-through soft shadow drawn around another top-level window
+
+    The shadow is blurred once per feather and color (see
+    ``shadow_slices``) and painted as nine slices, so resizing only
+    stretches images and moving repaints nothing. ``track`` keeps it
+    under a window's frame, hidden while that window is maximized,
+    minimized or hidden.
+    """
+    def __init__(self, feather=DEFAULT_FEATHER, color=DEFAULT_COLOR):
         super().__init__(None)
-        self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool)
+        self.setWindowFlags(Qt.FramelessWindowHint | Qt.Tool |
+                            Qt.WindowTransparentForInput | Qt.WindowDoesNotAcceptFocus)
         self.setAttribute(Qt.WA_TranslucentBackground)
-        self.resize(300, 200)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WA_ShowWithoutActivating)
+        self.feather = feather
+        self.color = QColor(color)
+        self.target = None
 
-        # Inner widget acts as shadow caster
-        self.inner = QWidget(self)
-        self.inner.setStyleSheet("background-color: black; border-radius: 0px;")
-        self.inner.setGeometry(feather, feather,
-                               self.width()-2*feather, self.height()-2*feather)
+    def track(self, window):
+        """Follow ``window``'s geometry and visibility from now on."""
+        if self.target is not None:
+            self.target.removeEventFilter(self)
+        self.target = window
+        window.installEventFilter(self)
+        self._follow()
 
-        effect = QGraphicsDropShadowEffect(self.inner)
-        effect.setBlurRadius(feather)       # feather amount
-        effect.setOffset(0, 0)              # no offset, uniform shadow
-        effect.setColor(QColor(0, 0, 0, 180))
-        self.inner.setGraphicsEffect(effect)
+    def eventFilter(self, watched, event):
+        if watched is self.target and event.type() in (
+                QEvent.Move, QEvent.Resize, QEvent.Show, QEvent.Hide,
+                QEvent.WindowStateChange):
+            self._follow()
+        return False
 
-        self.show()
+    def _follow(self):
+        window = self.target
+        if (not window.isVisible() or window.isMinimized() or window.isMaximized() or
+                window.isFullScreen()):
+            self.hide()
+            return
+        f = self.feather
+        geometry = window.geometry().adjusted(-f, -f, f, f)
+        if geometry != self.geometry():
+            self.setGeometry(geometry)
+        if not self.isVisible():
+            self.show()
+            window.raise_()     # Keep the shadow underneath
 
-    def resizeEvent(self, event):
-        feather = 40  # keep consistent
-        self.inner.setGeometry(feather, feather, self.width()-2*feather, self.height()-2*feather)
\ No newline at end of file
+    def paintEvent(self, event):
+        source = shadow_slices(self.feather, self.color)
+        w, h = self.width(), self.height()
+        c = min(2 * self.feather, w // 2, h // 2)  # Corner size, shrunk for tiny windows
+        s = 2 * self.feather                        # Corner size in the source
+        painter = QPainter(self)
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        # Corners
+        painter.drawImage(QRect(0, 0, c, c), source, QRect(0, 0, s, s))
+        painter.drawImage(QRect(w - c, 0, c, c), source, QRect(s, 0, s, s))
+        painter.drawImage(QRect(0, h - c, c, c), source, QRect(0, s, s, s))
+        painter.drawImage(QRect(w - c, h - c, c, c), source, QRect(s, s, s, s))
+        # Edges: one pixel through the middle of the source, stretched
+        painter.drawImage(QRect(c, 0, w - 2 * c, c), source, QRect(s, 0, 1, s))
+        painter.drawImage(QRect(c, h - c, w - 2 * c, c), source, QRect(s, s, 1, s))
+        painter.drawImage(QRect(0, c, c, h - 2 * c), source, QRect(0, s, s, 1))
+        painter.drawImage(QRect(w - c, c, c, h - 2 * c), source, QRect(s, s, s, 1))
+        # The middle is covered by the window itself
+        painter.end()
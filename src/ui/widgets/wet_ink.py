@@ -0,0 +1,143 @@
+import numpy as np
+from PySide6.QtCore import Qt, QEvent, QPointF, QRectF
+from PySide6.QtGui import QImage, QPainter, QColor, QPen, QPolygonF
+from PySide6.QtWidgets import QWidget
+
+from core.instrumentation import WET_INK, instruments
+from core.latency import LatencyMeter
+
+PREDICTION_HORIZON = 0.016  # Seconds of pen motion to extrapolate (about one frame)
+
+
+def draw_polyline(painter, xs, ys, width, color):
+    """Draw a live (uncommitted) polyline with round caps and joins."""
+    pen = QPen(QColor.fromRgba(color), width)
+    pen.setCapStyle(Qt.RoundCap)
+    pen.setJoinStyle(Qt.RoundJoin)
+    painter.setPen(pen)
+    if len(xs) == 1:
+        painter.drawPoint(QPointF(float(xs[0]), float(ys[0])))
+    else:
+        painter.drawPolyline(QPolygonF([QPointF(x, y)
+                                        for x, y in zip(xs.tolist(), ys.tolist())]))
+
+
+class WetInkOverlay(QWidget):
+    """Transparent, click-through layer that draws the stroke being inked
+
+    While the pen is down only this widget repaints, and only around the
+    newest samples; Qt coalesces the requests into one paint per frame.
+    Smoothed points are baked into a cached layer as they arrive, so a
+    frame costs the new segments, the raw tail and the predicted tip, not
+    the whole stroke. The canvas commits the stroke to the board on pen-up.
+    """
+
+    def __init__(self, canvas):
+        super().__init__(canvas)
+        self.canvas = canvas
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)  # Click-through
+        self.setAttribute(Qt.WA_NoSystemBackground)
+        self.prediction = PREDICTION_HORIZON
+        self.latency = LatencyMeter()
+        self.layer = None           # Baked smoothed output, in widget pixels
+        self._baked = 0             # Output points already in the layer
+        self._view = None           # (offset, zoom) the layer was baked at
+        self._ephemeral = QRectF()  # Tail and prediction drawn last frame
+        self.hide()
+
+    # ==========================================================
+    #  Stroke Lifecycle
+    # ==========================================================
+    def begin(self):
+        """Start showing the canvas's in-progress stroke."""
+        self.layer = None
+        self._baked = 0
+        self._ephemeral = QRectF()
+        self.setGeometry(self.canvas.rect())
+        self.show()
+        self.raise_()
+
+    def add_sample(self, timestamp):
+        """A pen sample stamped ``timestamp`` ms went into the ink pipeline."""
+        self.latency.event(timestamp)
+        ink = self.canvas.ink
+        start = max(self._baked - 1, 0)
+        unbaked = self._screen_bounds(ink.output.x[start:], ink.output.y[start:])
+        previous = self._ephemeral
+        tip = self._tip()
+        self._ephemeral = self._screen_bounds(tip[:, 0], tip[:, 1])
+        # Repaint what changed: new smoothed segments, and the old and new tip
+        self.update(previous.united(self._ephemeral).united(unbaked).toAlignedRect())
+
+    def end(self):
+        """Stop drawing; the stroke now lives on the canvas."""
+        self.latency.discard()
+        self.layer = None
+        self.hide()
+
+    # ==========================================================
+    #  Painting
+    # ==========================================================
+    def event(self, event):
+        if instruments.enabled and event.type() == QEvent.Paint:
+            with instruments.span(WET_INK):
+                return super().event(event)
+        return super().event(event)
+
+    def paintEvent(self, event):
+        ink = self.canvas.ink
+        if ink.output is None:
+            return
+        canvas = self.canvas
+        painter = QPainter(self)
+        self._bake()
+        painter.drawImage(0, 0, self.layer)
+
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.scale(canvas.zoom, canvas.zoom)
+        painter.translate(-canvas.offset)
+        width = canvas.pen_width / canvas.zoom
+        tip = self._tip()
+        if len(tip) > 1:
+            draw_polyline(painter, tip[:, 0], tip[:, 1], width, canvas.pen_color)
+        painter.end()
+        self.latency.painted()
+
+    def _bake(self):
+        """Draw smoothed points the layer has not seen yet into it."""
+        canvas = self.canvas
+        view = (QPointF(canvas.offset), canvas.zoom)
+        if self.layer is None or self.layer.size() != self.size() or view != self._view:
+            self.layer = QImage(self.size(), QImage.Format_ARGB32_Premultiplied)
+            self.layer.fill(0)
+            self._baked = 0
+            self._view = view
+        output = canvas.ink.output
+        if len(output) <= self._baked:
+            return
+        # Overlap one point so consecutive pieces join up
+        start = max(self._baked - 1, 0)
+        painter = QPainter(self.layer)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.scale(canvas.zoom, canvas.zoom)
+        painter.translate(-canvas.offset)
+        draw_polyline(painter, output.x[start:], output.y[start:],
+                      canvas.pen_width / canvas.zoom, canvas.pen_color)
+        painter.end()
+        self._baked = len(output)
+
+    def _tip(self):
+        """(N, 2) raw samples not smoothed yet, followed by the predicted points."""
+        ink = self.canvas.ink
+        points = [p[:2] for p in ink.tail()] + ink.predict(self.prediction)
+        return np.array(points, dtype=np.float64).reshape(-1, 2)
+
+    def _screen_bounds(self, xs, ys):
+        """Widget-space rect around world points, padded for the pen."""
+        if not len(xs):
+            return QRectF()
+        canvas = self.canvas
+        pad = canvas.pen_width / 2 + 2
+        top_left = canvas.world_to_screen(float(np.min(xs)), float(np.min(ys)))
+        bottom_right = canvas.world_to_screen(float(np.max(xs)), float(np.max(ys)))
+        return QRectF(top_left, bottom_right).adjusted(-pad, -pad, pad, pad)